@@ -2,7 +2,11 @@ __author__ = "Tofu Gang"
 __email__ = "tofugangsw@gmail.com"
 
 from intcode_computer.computer import IntcodeComputer
-from typing import Tuple
+from intcode_computer.image import read_program
+from intcode_computer.pool import Job, MachinePool
+from intcode_computer.search import parallel_find
+from intcode_computer.symbolic import SymbolicValueError, solve
+from typing import Optional, Tuple
 
 """
 --- Day 2: 1202 Program Alarm ---
@@ -32,6 +36,9 @@ NOUN_RANGE = 100
 VERB_RANGE = 100
 GRAVITY_ASSIST_GOAL = 19690720
 
+# computer reused by all the runs of _set_and_run
+_POOL = MachinePool()
+
 ################################################################################
 
 def puzzle_1() -> None:
@@ -115,10 +122,8 @@ def puzzle_1() -> None:
     The answer should be 3654868.
     """
 
-    with open("day_02/input.txt", 'r') as f:
-        program = tuple([int(data.strip())
-                         for data in f.read().strip().split(',')])
-        print(_set_and_run(program, NOUN, VERB))
+    program = read_program("day_02/input.txt")
+    print(_set_and_run(program, NOUN, VERB))
 
 ################################################################################
 
@@ -175,16 +180,9 @@ def puzzle_2() -> None:
     The answer should be 7014.
     """
 
-    with open("day_02/input.txt", 'r') as f:
-        program = tuple([int(data.strip())
-                         for data in f.read().strip().split(',')])
-        combination = [
-            (noun, verb)
-            for noun in range(NOUN_RANGE)
-            for verb in range(VERB_RANGE)
-            if _set_and_run(program, noun, verb)
-               == GRAVITY_ASSIST_GOAL][0]
-        print(100 * combination[0] + combination[1])
+    program = read_program("day_02/input.txt")
+    combination = _solve_noun_verb(program)
+    print(100 * combination[0] + combination[1])
 
 ################################################################################
 
@@ -198,12 +196,79 @@ def _set_and_run(program: Tuple[int], noun: int, verb: int) -> int:
     :return: program result
     """
 
+    # some noun and verb combinations point the program out of its memory or
+    # to an invalid opcode; the program just stops there
+    return _POOL.run(Job(
+        program, ((NOUN_INDEX, noun), (VERB_INDEX, verb)),
+        read_addresses=(0,))).data[0]
+
+################################################################################
+
+def _solve_noun_verb(program: Tuple[int], target: int = GRAVITY_ASSIST_GOAL,
+                     noun_range: range = range(NOUN_RANGE),
+                     verb_range: range = range(VERB_RANGE)) \
+        -> Optional[Tuple[int, int]]:
+    """
+    Runs the program once with symbolic noun and verb, so the program result
+    is a polynomial of them, and solves it for the target. Falls back to the
+    concrete search if the program branches on the noun or verb.
+
+    :param program: gravity assist program
+    :param target: desired program result
+    :param noun_range: nouns to try
+    :param verb_range: verbs to try
+    :return: noun and verb, None if no combination produces the target
+    """
+
     computer = IntcodeComputer()
     computer.load_program(program)
-    computer.set_data(NOUN_INDEX, noun)
-    computer.set_data(VERB_INDEX, verb)
-    computer.start()
-    computer.join()
-    return computer.get_data(0)
+    try:
+        result = computer.analyze({NOUN_INDEX: "noun", VERB_INDEX: "verb"})
+        solution = solve(
+            result.memory[0], target, {"noun": noun_range, "verb": verb_range})
+    except SymbolicValueError:
+        return _find_noun_verb(program, target, noun_range, verb_range)
+    if solution is None:
+        return None
+    return solution["noun"], solution["verb"]
+
+################################################################################
+
+def _find_noun_verb(program: Tuple[int], target: int = GRAVITY_ASSIST_GOAL,
+                    noun_range: range = range(NOUN_RANGE),
+                    verb_range: range = range(VERB_RANGE),
+                    max_workers: int = None) -> Optional[Tuple[int, int]]:
+    """
+    Searches the noun and verb grid for a combination producing the target
+    result. The grid is split among worker processes and the search stops as
+    soon as a combination is found.
+
+    :param program: gravity assist program
+    :param target: desired program result
+    :param noun_range: nouns to try
+    :param verb_range: verbs to try
+    :param max_workers: number of worker processes, all CPUs by default
+    :return: noun and verb, None if no combination produces the target
+    """
+
+    return parallel_find(
+        program,
+        [(noun, verb) for noun in noun_range for verb in verb_range],
+        _run_combination,
+        target,
+        max_workers)
+
+################################################################################
+
+def _run_combination(program: Tuple[int], combination: Tuple[int, int]) -> int:
+    """
+    Same as _set_and_run, takes the noun and verb as a pair.
+
+    :param program: gravity assist program
+    :param combination: noun and verb
+    :return: program result
+    """
+
+    return _set_and_run(program, combination[0], combination[1])
 
 ################################################################################
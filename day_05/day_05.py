@@ -2,6 +2,9 @@ __author__ = "Tofu Gang"
 __email__ = "tofugangsw@gmail.com"
 
 from intcode_computer.computer import IntcodeComputer
+from intcode_computer.image import read_program
+from intcode_computer.pool import MachinePool
+from typing import Tuple
 
 """
 --- Day 5: Sunny with a Chance of Asteroids ---
@@ -13,6 +16,14 @@ to support the Thermal Environment Supervision Terminal.
 
 ################################################################################
 
+AIR_CONDITIONER_ID = 1
+THERMAL_RADIATOR_ID = 5
+
+# computer reused by all the runs of _run_diagnostics
+_POOL = MachinePool()
+
+################################################################################
+
 def puzzle_1() -> None:
     """
     --- Part One ---
@@ -112,15 +123,8 @@ def puzzle_1() -> None:
     The answer should be 14522484.
     """
 
-    with open("day_05/input.txt", 'r') as f:
-        program = tuple([int(data.strip())
-                         for data in f.read().strip().split(',')])
-        computer = IntcodeComputer()
-        computer.load_program(program)
-        computer.load_input(1)
-        computer.start()
-        computer.join()
-        print(computer.get_output())
+    program = read_program("day_05/input.txt")
+    print(_run_diagnostics(program, AIR_CONDITIONER_ID))
 
 ################################################################################
 
@@ -196,14 +200,43 @@ def puzzle_2() -> None:
     The answer should be 4655956.
     """
 
-    with open("day_05/input.txt", 'r') as f:
-        program = tuple([int(data.strip())
-                         for data in f.read().strip().split(',')])
-        computer = IntcodeComputer()
-        computer.load_program(program)
-        computer.load_input(5)
-        computer.start()
-        computer.join()
-        print(computer.get_output())
+    program = read_program("day_05/input.txt")
+    print(_run_diagnostics(program, THERMAL_RADIATOR_ID))
+
+################################################################################
+
+def _run_diagnostics(program: Tuple[int], system_id: int) -> int:
+    """
+    Runs the diagnostic program and checks the output values as they are
+    written: the tests output 0 when they pass, the first non-zero value stops
+    the program. It is the diagnostic code if the program halts right after
+    it, otherwise a test failed.
+
+    :param program: diagnostic program
+    :param system_id: ID of the system to test
+    :return: diagnostic code
+    """
+
+    computer = _POOL.acquire()
+    computer.load_program(program)
+    computer.load_input(system_id)
+    diagnostic_codes = []
+
+    def check(output_value: int) -> None:
+        if output_value != 0:
+            diagnostic_codes.append(output_value)
+            computer.stop()
+
+    computer.set_output_sink(check)
+    try:
+        if computer.run_sync() == IntcodeComputer.STATUS_HALTED:
+            raise RuntimeError("no diagnostic code written")
+        if computer.run_until_output() != IntcodeComputer.STATUS_HALTED:
+            raise RuntimeError(
+                "diagnostic test failed with output %d" % diagnostic_codes[0])
+    finally:
+        computer.set_output_sink(None)
+        _POOL.release(computer)
+    return diagnostic_codes[0]
 
 ################################################################################
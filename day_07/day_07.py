@@ -1,9 +1,15 @@
 __author__ = "Tofu Gang"
 __email__ = "tofugangsw@gmail.com"
 
-from intcode_computer.computer import IntcodeComputer, Condition
+from intcode_computer.channel import Channel
+from intcode_computer.computer import IntcodeComputer
+from intcode_computer.image import read_program
+from intcode_computer.pool import Job, MachinePool
+from intcode_computer.scheduler import Scheduler
+from intcode_computer.search import parallel_max_search, \
+    PermutationChainSearch
 from itertools import permutations
-from sys import maxsize
+from typing import Tuple
 
 """
 --- Day 7: Amplification Circuit ---
@@ -21,6 +27,13 @@ PHASE_SETTINGS_FEEDBACK_LOOP = list(permutations(
     range(5, 5 + AMPLIFIERS_COUNT)))
 INPUT_SIGNAL = 0
 
+# computers reused by all the amplifier runs; the amplifiers in series run a
+# dozen instructions each, so they are interpreted, the amplifiers in the
+# feedback loop run their loops long enough to pay for the compilation
+_POOL = MachinePool(AMPLIFIERS_COUNT)
+_FEEDBACK_LOOP_POOL = MachinePool(
+    AMPLIFIERS_COUNT, engine=IntcodeComputer.ENGINE_COMPILER)
+
 ################################################################################
 
 def puzzle_1() -> None:
@@ -100,28 +113,11 @@ def puzzle_1() -> None:
     The answer should be 14902.
     """
 
-    with open("day_07/input.txt", 'r') as f:
-        max_output_signal = -maxsize - 1
-        program = tuple([
-            int(data.strip()) for data in f.read().strip().split(',')])
-
-        for phase_settings in PHASE_SETTINGS:
-            input_signal = INPUT_SIGNAL
-            for setting in phase_settings:
-                computer = IntcodeComputer()
-                computer.load_program(program)
-                computer.load_input(setting)
-                computer.load_input(input_signal)
-                computer.start()
-                computer.join()
-                output_signal = computer.get_output()[-1]
-                input_signal = output_signal
-                max_output_signal \
-                    = output_signal \
-                    if output_signal > max_output_signal \
-                    else max_output_signal
-
-        print(max_output_signal)
+    program = read_program("day_07/input.txt")
+    max_output_signal, _ = PermutationChainSearch(
+        program, range(AMPLIFIERS_COUNT), INPUT_SIGNAL).run()
+
+    print(max_output_signal)
 
 ################################################################################
 
@@ -184,36 +180,58 @@ def puzzle_2() -> None:
     The answer should be 6489132.
     """
 
-    with open("day_07/input.txt", 'r') as f:
-        program = tuple([
-            int(data.strip()) for data in f.read().strip().split(',')])
-        max_output_signal = -maxsize - 1
-        output_condition = Condition()
-
-        for phase_settings in PHASE_SETTINGS_FEEDBACK_LOOP:
-            computers = [
-                IntcodeComputer(output_condition)
-                for _ in range(len(phase_settings))]
-            [computer.load_program(program) for computer in computers]
-            [computers[i].load_input(phase_settings[i])
-             for i in range(len(phase_settings))]
-            [computer.start() for computer in computers]
-
-            input_signal = INPUT_SIGNAL
-
-            while any([computer.is_alive() for computer in computers]):
-                for computer in computers:
-                    with output_condition:
-                        computer.load_input(input_signal)
-                        output_condition.wait()
-                    input_signal = computer.get_output()[-1]
-
-            output_signal = computers[-1].get_output()[-1]
-            max_output_signal \
-                = output_signal \
-                if max_output_signal < output_signal \
-                else max_output_signal
-
-        print(max_output_signal)
+    program = read_program("day_07/input.txt")
+    max_output_signal, _ = parallel_max_search(
+        program, PHASE_SETTINGS_FEEDBACK_LOOP, _amplify_feedback_loop)
+
+    print(max_output_signal)
+
+################################################################################
+
+def _amplify(program: Tuple[int], phase_settings: Tuple[int]) -> int:
+    """
+    Runs the amplifiers in series, every amplifier gets its phase setting and
+    the output signal of the previous amplifier.
+
+    :param program: amplifier controller software
+    :param phase_settings: phase setting of every amplifier
+    :return: signal sent to the thrusters
+    """
+
+    input_signal = INPUT_SIGNAL
+    for setting in phase_settings:
+        input_signal = _POOL.run(
+            Job(program, inputs=(setting, input_signal))).output[-1]
+    return input_signal
+
+################################################################################
+
+def _amplify_feedback_loop(program: Tuple[int],
+                           phase_settings: Tuple[int]) -> int:
+    """
+    Runs the amplifiers connected in a feedback loop until they all halt.
+
+    :param program: amplifier controller software
+    :param phase_settings: phase setting of every amplifier
+    :return: last signal sent to the thrusters
+    """
+
+    computers = [_FEEDBACK_LOOP_POOL.acquire()
+                 for _ in range(len(phase_settings))]
+    try:
+        scheduler = Scheduler()
+        for computer, setting in zip(computers, phase_settings):
+            computer.load_program(program)
+            computer.load_input(setting)
+            scheduler.add_computer(computer)
+        scheduler.connect_ring()
+        thrusters = Channel()
+        scheduler.connect(computers[-1], thrusters)
+        computers[0].load_input(INPUT_SIGNAL)
+        scheduler.run()
+        return thrusters.get_values()[-1]
+    finally:
+        for computer in computers:
+            _FEEDBACK_LOOP_POOL.release(computer)
 
 ################################################################################
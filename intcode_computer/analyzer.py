@@ -0,0 +1,506 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, \
+    Set, Tuple
+
+OPCODE_ADD = 1
+OPCODE_MULTIPLY = 2
+OPCODE_SAVE_INPUT = 3
+OPCODE_WRITE_OUTPUT = 4
+OPCODE_JUMP_IF_TRUE = 5
+OPCODE_JUMP_IF_FALSE = 6
+OPCODE_LESS_THAN = 7
+OPCODE_EQUALS = 8
+OPCODE_EXIT = 99
+
+# opcode -> (input params count, output params count)
+PARAMS_COUNTS = {
+    OPCODE_ADD: (2, 1),
+    OPCODE_MULTIPLY: (2, 1),
+    OPCODE_SAVE_INPUT: (0, 1),
+    OPCODE_WRITE_OUTPUT: (1, 0),
+    OPCODE_JUMP_IF_TRUE: (2, 0),
+    OPCODE_JUMP_IF_FALSE: (2, 0),
+    OPCODE_LESS_THAN: (2, 1),
+    OPCODE_EQUALS: (2, 1),
+    OPCODE_EXIT: (0, 0)
+}
+
+# headings written by the optimizer
+_HEADING_ADD_IMMEDIATE = 1001
+_HEADING_MULTIPLY_IMMEDIATE = 1002
+_HEADING_SET = 1101
+_HEADING_JUMP = 1105
+
+################################################################################
+
+class DecodedInstruction(NamedTuple):
+    """
+    Instruction as the analyzer sees it: opcode, True for every input param in
+    position mode and the operand values.
+    """
+
+    address: int
+    opcode: int
+    positions: Tuple[bool, ...]
+    operands: Tuple[int, ...]
+
+    @property
+    def end(self) -> int:
+        """
+        :return: address after the instruction
+        """
+
+        return self.address + len(self.operands) + 1
+
+################################################################################
+
+class BasicBlock(NamedTuple):
+    """
+    Instructions always run one after another, entered only at the first one.
+    """
+
+    start: int
+    end: int
+    instructions: Tuple[DecodedInstruction, ...]
+    successors: Tuple[int, ...]
+
+################################################################################
+
+class Loop(NamedTuple):
+    """
+    Natural loop of the control-flow graph: its header block and all the
+    blocks of its body (the header included).
+    """
+
+    header: int
+    blocks: Tuple[int, ...]
+
+################################################################################
+
+class ProgramAnalysis(NamedTuple):
+    """
+    Result of the static analysis. Every cell not in written_cells is never
+    written by the program, so it holds its initial value for the whole run.
+    """
+
+    entry: int
+    blocks: Dict[int, BasicBlock]
+    written_cells: FrozenSet[int]
+    read_cells: FrozenSet[int]
+    # written cells holding instructions (the program modifies itself)
+    modified_code_cells: FrozenSet[int]
+    # addresses of jumps whose target is not known before the run
+    dynamic_jumps: Tuple[int, ...]
+    # addresses of instructions referencing cells outside the memory
+    out_of_range_instructions: Tuple[int, ...]
+    # loops, innermost first
+    loops: Tuple[Loop, ...]
+
+    def is_static(self) -> bool:
+        """
+        :return: True if the analysis knows every instruction that may run and
+        every cell it may read or write, so the program can be rewritten
+        """
+
+        return not (self.modified_code_cells or self.dynamic_jumps
+                    or self.out_of_range_instructions)
+
+################################################################################
+
+class OptimizationReport(NamedTuple):
+    """
+    What the optimizer did to the program.
+    """
+
+    analysis: ProgramAnalysis
+    # (start, end) address ranges of the folded instruction chains
+    folded_chains: Tuple[Tuple[int, int], ...]
+    # number of instructions no longer executed when the chains run
+    removed_instructions_count: int
+
+################################################################################
+
+def _decode(memory: Sequence[int], address: int) \
+        -> Optional[DecodedInstruction]:
+    """
+    Decodes the instruction the same way IntcodeComputer does.
+
+    :param memory: memory content
+    :param address: address of the instruction heading
+    :return: decoded instruction, None if the computer would fail on it
+    """
+
+    if not 0 <= address < len(memory) or memory[address] < 0:
+        return None
+    heading = memory[address]
+    opcode = heading % 100
+    if opcode not in PARAMS_COUNTS:
+        return None
+    input_count, output_count = PARAMS_COUNTS[opcode]
+    end = address + input_count + output_count + 1
+    if end > len(memory):
+        return None
+    modes = heading // 100
+    positions = []
+    for _ in range(input_count):
+        positions.append(modes % 10 == 0)
+        modes //= 10
+    return DecodedInstruction(
+        address, opcode, tuple(positions), tuple(memory[address + 1:end]))
+
+################################################################################
+
+def analyze_program(memory: Sequence[int], entry: int = 0) -> ProgramAnalysis:
+    """
+    Finds all the instructions reachable from the entry, splits them in basic
+    blocks linked in a control-flow graph, finds its loops and the cells the
+    program may read and write. The analysis trusts the instructions as they
+    are in memory; if the program writes into them, modified_code_cells says
+    so and the rest of the result is only a guess.
+
+    :param memory: memory content, e.g. a program
+    :param entry: address the run starts (or continues) on
+    :return: analysis of the program
+    """
+
+    # the walk assumes the cells written so far never change; it repeats
+    # until it finds no new written cells, which could change jump targets
+    written = set()  # type: Set[int]
+    while True:
+        instructions, stuck, leaders, targets, conditions, found_written \
+            = _walk(memory, entry, written)
+        if found_written <= written:
+            break
+        written |= found_written
+
+    read = set()  # type: Set[int]
+    out_of_range = []
+    for address, instruction in instructions.items():
+        referenced = [operand for operand, position in zip(
+            instruction.operands, instruction.positions) if position]
+        read.update(referenced)
+        if any([not 0 <= cell < len(memory) for cell in referenced
+                + list(instruction.operands[len(instruction.positions):])]):
+            out_of_range.append(address)
+    code = stuck | {cell
+                    for instruction in instructions.values()
+                    for cell in range(instruction.address, instruction.end)}
+
+    blocks = _split_blocks(instructions, leaders, targets, conditions)
+    return ProgramAnalysis(
+        entry,
+        blocks,
+        frozenset(written),
+        frozenset(read),
+        frozenset(code & written),
+        tuple(sorted([address for address, target in targets.items()
+                      if target is None and conditions[address] is not False])),
+        tuple(sorted(out_of_range)),
+        _find_loops(blocks, entry))
+
+################################################################################
+
+def _walk(memory: Sequence[int], entry: int, written: Set[int]) \
+        -> Tuple[Dict[int, DecodedInstruction], Set[int], Set[int],
+                 Dict[int, Optional[int]], Dict[int, Optional[bool]],
+                 Set[int]]:
+    """
+    Decodes all the instructions reachable from the entry.
+
+    :param memory: memory content
+    :param entry: address the run starts on
+    :param written: cells that may be written, their values are not trusted
+    :return: address -> instruction, reachable addresses holding no valid
+    instruction, addresses starting a block, jump address
+    -> target (None if unknown), jump address -> True/False if the jump is
+    always/never taken, cells the instructions write
+    """
+
+    instructions = {}  # type: Dict[int, DecodedInstruction]
+    leaders = {entry}
+    targets = {}  # type: Dict[int, Optional[int]]
+    conditions = {}  # type: Dict[int, Optional[bool]]
+    found_written = set()  # type: Set[int]
+    stuck = set()  # type: Set[int]
+
+    pending = [entry]
+    while pending:
+        address = pending.pop()
+        if address in instructions:
+            continue
+        instruction = _decode(memory, address)
+        if instruction is None:
+            # the run fails here unless the program writes an instruction here
+            stuck.add(address)
+            continue
+        instructions[address] = instruction
+        found_written.update(
+            instruction.operands[len(instruction.positions):])
+
+        if instruction.opcode == OPCODE_EXIT:
+            continue
+        if instruction.opcode in (OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE):
+            condition = _get_static_value(memory, instruction, 0, written)
+            target = _get_static_value(memory, instruction, 1, written)
+            taken = None if condition is None \
+                else (condition != 0) == (
+                    instruction.opcode == OPCODE_JUMP_IF_TRUE)
+            conditions[address] = taken
+            targets[address] = target
+            if target is not None and taken is not False:
+                leaders.add(target)
+                pending.append(target)
+            if taken is True:
+                continue
+            leaders.add(instruction.end)
+        pending.append(instruction.end)
+    return instructions, stuck, leaders, targets, conditions, found_written
+
+################################################################################
+
+def _get_static_value(memory: Sequence[int], instruction: DecodedInstruction,
+                      index: int, written: Set[int]) -> Optional[int]:
+    """
+    :param memory: memory content
+    :param instruction: decoded instruction
+    :param index: input param index
+    :param written: cells that may be written
+    :return: input param value if it never changes, otherwise None
+    """
+
+    operand = instruction.operands[index]
+    if not instruction.positions[index]:
+        return operand
+    if operand in written or not 0 <= operand < len(memory):
+        return None
+    return memory[operand]
+
+################################################################################
+
+def _split_blocks(instructions: Dict[int, DecodedInstruction],
+                  leaders: Set[int], targets: Dict[int, Optional[int]],
+                  conditions: Dict[int, Optional[bool]]) \
+        -> Dict[int, BasicBlock]:
+    """
+    :param instructions: address -> reachable instruction
+    :param leaders: addresses starting a block
+    :param targets: jump address -> target, None if unknown
+    :param conditions: jump address -> True/False if always/never taken
+    :return: block start -> basic block
+    """
+
+    blocks = {}
+    for start in sorted(leaders):
+        if start not in instructions:
+            continue
+        block = []
+        address = start
+        while True:
+            instruction = instructions[address]
+            block.append(instruction)
+            address = instruction.end
+            if instruction.opcode in (OPCODE_JUMP_IF_TRUE,
+                                      OPCODE_JUMP_IF_FALSE, OPCODE_EXIT) \
+                    or address in leaders or address not in instructions:
+                break
+
+        last = block[-1]
+        successors = []
+        if last.address in targets:
+            if targets[last.address] is not None \
+                    and conditions[last.address] is not False:
+                successors.append(targets[last.address])
+            if conditions[last.address] is not True:
+                successors.append(last.end)
+        elif last.opcode != OPCODE_EXIT:
+            successors.append(last.end)
+        blocks[start] = BasicBlock(
+            start, last.end, tuple(block),
+            tuple([successor for successor in successors
+                   if successor in instructions]))
+    return blocks
+
+################################################################################
+
+def _find_loops(blocks: Dict[int, BasicBlock], entry: int) -> Tuple[Loop, ...]:
+    """
+    Finds the back edges by a depth-first walk and the natural loop of each of
+    them; loops sharing a header are merged.
+
+    :param blocks: block start -> basic block
+    :param entry: address of the entry block
+    :return: loops, innermost (smallest) first
+    """
+
+    if entry not in blocks:
+        return ()
+    back_edges = []
+    on_stack = {entry}
+    visited = {entry}
+    stack = [(entry, iter(blocks[entry].successors))]
+    while stack:
+        start, successors = stack[-1]
+        successor = next(successors, None)
+        if successor is None:
+            on_stack.discard(start)
+            stack.pop()
+        elif successor in on_stack:
+            back_edges.append((start, successor))
+        elif successor not in visited:
+            visited.add(successor)
+            on_stack.add(successor)
+            stack.append((successor, iter(blocks[successor].successors)))
+
+    predecessors = {}  # type: Dict[int, List[int]]
+    for block in blocks.values():
+        for successor in block.successors:
+            predecessors.setdefault(successor, []).append(block.start)
+    bodies = {}  # type: Dict[int, Set[int]]
+    for source, header in back_edges:
+        body = bodies.setdefault(header, {header})
+        pending = [source]
+        while pending:
+            start = pending.pop()
+            if start not in body:
+                body.add(start)
+                pending += predecessors.get(start, [])
+    return tuple(sorted([Loop(header, tuple(sorted(body)))
+                         for header, body in bodies.items()],
+                        key=lambda loop: (len(loop.blocks), loop.header)))
+
+################################################################################
+
+def optimize_program(memory: Sequence[int], entry: int = 0) \
+        -> Tuple[Tuple[int, ...], OptimizationReport]:
+    """
+    Folds chains of additions and multiplications updating one cell with
+    immediate values or never written cells (e.g. x = x * 5; x = x + 3;
+    x = x * 2) into at most two instructions followed by a jump over the rest
+    of the chain. Only static programs (see ProgramAnalysis.is_static) are
+    rewritten, and only chains whose cells the program never reads as data,
+    so the rewritten program reads the same input and writes the same output.
+    Memory content of the folded chains differs after the run.
+
+    :param memory: memory content, e.g. a program
+    :param entry: address the run starts (or continues) on
+    :return: optimized memory content and the report
+    """
+
+    analysis = analyze_program(memory, entry)
+    optimized = list(memory)
+    folded = []
+    removed_count = 0
+    if analysis.is_static():
+        for block in analysis.blocks.values():
+            for chain in _find_chains(memory, block, analysis):
+                replacement = _fold(memory, chain, analysis)
+                if replacement is None:
+                    continue
+                start, end = chain[0].address, chain[-1].end
+                optimized[start:end] = replacement \
+                    + [0] * (end - start - len(replacement))
+                folded.append((start, end))
+                # the jump over the rest of the chain is one instruction too
+                removed_count += len(chain) - len(replacement) // 4 - 1
+    return tuple(optimized), OptimizationReport(
+        analysis, tuple(sorted(folded)), removed_count)
+
+################################################################################
+
+def _find_chains(memory: Sequence[int], block: BasicBlock,
+                 analysis: ProgramAnalysis) \
+        -> List[List[DecodedInstruction]]:
+    """
+    :param memory: memory content
+    :param block: basic block
+    :param analysis: analysis of the program
+    :return: runs of additions and multiplications of the block writing the
+    same cell, whose cells the program never reads as data
+    """
+
+    chains = [[]]
+    for instruction in block.instructions:
+        chain = chains[-1]
+        if instruction.opcode not in (OPCODE_ADD, OPCODE_MULTIPLY) \
+                or _get_affine(memory, instruction, analysis) is None \
+                or any([cell in analysis.read_cells for cell in range(
+                    instruction.address, instruction.end)]):
+            chains.append([])
+        elif chain and chain[-1].operands[2] != instruction.operands[2]:
+            chains.append([instruction])
+        else:
+            chain.append(instruction)
+    return [chain for chain in chains if len(chain) > 2]
+
+################################################################################
+
+def _get_affine(memory: Sequence[int], instruction: DecodedInstruction,
+                analysis: ProgramAnalysis) \
+        -> Optional[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+    Describes the input params of an addition or multiplication as a * x + b,
+    where x is the cell the instruction writes.
+
+    :param memory: memory content
+    :param instruction: decoded instruction
+    :param analysis: analysis of the program
+    :return: (a, b) of both input params, None if a param is neither constant
+    nor the written cell
+    """
+
+    target = instruction.operands[2]
+    params = []
+    for operand, position in zip(instruction.operands,
+                                 instruction.positions):
+        if not position:
+            params.append((0, operand))
+        elif operand == target:
+            params.append((1, 0))
+        elif operand not in analysis.written_cells:
+            params.append((0, memory[operand]))
+        else:
+            return None
+    return params[0], params[1]
+
+################################################################################
+
+def _fold(memory: Sequence[int], chain: List[DecodedInstruction],
+          analysis: ProgramAnalysis) -> Optional[List[int]]:
+    """
+    :param memory: memory content
+    :param chain: additions and multiplications writing the same cell
+    :param analysis: analysis of the program
+    :return: folded instructions with the jump over the rest of the chain,
+    None if folding saves nothing
+    """
+
+    target = chain[0].operands[2]
+    # the cell holds a * x + b, x being its value before the chain
+    a, b = 1, 0
+    for instruction in chain:
+        (a_1, b_1), (a_2, b_2) = [
+            (a_i * a, a_i * b + b_i)
+            for a_i, b_i in _get_affine(memory, instruction, analysis)]
+        if instruction.opcode == OPCODE_ADD:
+            a, b = a_1 + a_2, b_1 + b_2
+        elif a_1 == 0 or a_2 == 0:
+            a, b = a_1 * b_2 + a_2 * b_1, b_1 * b_2
+        else:
+            # x * x does not fold
+            return None
+
+    if a == 0:
+        replacement = [_HEADING_SET, b, 0, target]
+    else:
+        replacement = []
+        if a != 1:
+            replacement += [_HEADING_MULTIPLY_IMMEDIATE, target, a, target]
+        if b != 0:
+            replacement += [_HEADING_ADD_IMMEDIATE, target, b, target]
+    if len(replacement) // 4 + 1 >= len(chain):
+        return None
+    return replacement + [_HEADING_JUMP, 1, chain[-1].end]
+
+################################################################################
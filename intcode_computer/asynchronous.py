@@ -0,0 +1,448 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from asyncio import FIRST_COMPLETED, Future, gather, get_running_loop, run, \
+    sleep, wait
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Tuple, \
+    Union
+from intcode_computer.channel import Channel, ChannelEmpty, ChannelFull
+from intcode_computer.computer import IntcodeComputer
+
+################################################################################
+
+def _wake(future: Future) -> None:
+    """
+    :param future: waiter future, done by now if it was cancelled
+    """
+
+    if not future.done():
+        future.set_result(None)
+
+################################################################################
+
+class AsyncChannel(Channel):
+    """
+    Channel that coroutines can wait on as well. A waiting coroutine does not
+    block its thread, so one event loop can serve any number of channels. The
+    values may still be written and read from other threads, the waiting
+    coroutines are then woken up in their event loop.
+    """
+
+################################################################################
+
+    def __init__(self, values: Iterable[int] = (), capacity: int = None):
+        """
+        Creates the channel.
+
+        :param values: initial values, the oldest first
+        :param capacity: maximum number of values in the channel, None for no
+        limit
+        """
+
+        super().__init__(values, capacity)
+        # futures of the waiting coroutines and what they wait for
+        self._waiters = []  # type: List[Tuple[Future, Callable[[], bool]]]
+
+################################################################################
+
+    def put(self, value: int, block: bool = True,
+            timeout: float = None) -> None:
+        """
+        Writes the value at the end of the channel, waits for space first if
+        the channel is full. Blocks the calling thread, use put_async in a
+        coroutine.
+
+        :param value: value to write
+        :param block: wait for space, raise ChannelFull right away otherwise
+        :param timeout: seconds to wait at most, None for no limit
+        """
+
+        super().put(value, block, timeout)
+        self.notify()
+
+################################################################################
+
+    def get(self, block: bool = True, timeout: float = None) -> int:
+        """
+        Takes the oldest value of the channel, waits for one first if the
+        channel is empty. Blocks the calling thread, use get_async in a
+        coroutine.
+
+        :param block: wait for a value, raise ChannelEmpty right away otherwise
+        :param timeout: seconds to wait at most, None for no limit
+        :return: the value
+        """
+
+        value = super().get(block, timeout)
+        if self._capacity is not None:
+            self.notify()
+        return value
+
+################################################################################
+
+    async def put_async(self, value: int) -> None:
+        """
+        Writes the value at the end of the channel, waits for space first if
+        the channel is full.
+
+        :param value: value to write
+        """
+
+        while True:
+            try:
+                self.put(value, False)
+                return
+            except ChannelFull:
+                await self.wait_until(lambda: not self.is_full())
+
+################################################################################
+
+    async def get_async(self) -> int:
+        """
+        Takes the oldest value of the channel, waits for one first if the
+        channel is empty.
+
+        :return: the value
+        """
+
+        while True:
+            try:
+                return self.get(False)
+            except ChannelEmpty:
+                await self.wait_until(lambda: len(self._values) > 0)
+
+################################################################################
+
+    async def wait_until(self, predicate: Callable[[], bool]) -> None:
+        """
+        Waits until the predicate holds. It is checked whenever the channel
+        changes (or notify is called), the first time right away.
+
+        :param predicate: condition on the channel (or anything else)
+        """
+
+        loop = get_running_loop()
+        while True:
+            future = loop.create_future()
+            with self._condition:
+                if predicate():
+                    return
+                waiter = (future, predicate)
+                self._waiters.append(waiter)
+            try:
+                await future
+            finally:
+                with self._condition:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+################################################################################
+
+    def notify(self) -> None:
+        """
+        Wakes up the coroutines waiting on the channel, so they check their
+        predicates again. Safe to call from any thread.
+        """
+
+        # a coroutine that starts to wait after this sees the change
+        if not self._waiters:
+            return
+        with self._condition:
+            waiters = self._waiters
+            self._waiters = []
+        try:
+            running_loop = get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        for future, _ in waiters:
+            loop = future.get_loop()
+            if loop is running_loop:
+                _wake(future)
+            else:
+                loop.call_soon_threadsafe(_wake, future)
+
+################################################################################
+
+class AsyncIntcodeComputer(IntcodeComputer):
+    """
+    Intcode computer whose program runs as a coroutine: it awaits missing input
+    values and space in a full output channel instead of blocking a thread, so
+    thousands of mostly idle computers can share one event loop. Its channels
+    are AsyncChannels; connect it only to those.
+    """
+
+################################################################################
+
+    def _create_channel(self, values: Tuple[int] = ()) -> AsyncChannel:
+        """
+        Creates the unbounded channel of a loaded program or a restored
+        snapshot.
+
+        :param values: initial values, the oldest first
+        :return: new channel
+        """
+
+        return AsyncChannel(values)
+
+################################################################################
+
+    async def load_input_async(self, input_value: int) -> None:
+        """
+        Loads an input value, waits for space if the input channel is bounded
+        and full.
+
+        :param input_value: input value
+        """
+
+        await self._input_channel.put_async(input_value)
+
+################################################################################
+
+    async def run_async(self, wait: Callable[
+            [AsyncChannel, Callable[[], bool]], Awaitable[None]] = None) \
+            -> str:
+        """
+        Runs the program until it halts (or is stopped, or runs out of its
+        budget or time). It gives way to the other coroutines after every
+        output value and whenever it waits for an input value or for output
+        channel space.
+
+        :param wait: coroutine function taking a channel and a predicate and
+        waiting until the predicate holds, AsyncChannel.wait_until by default
+        :return: STATUS_HALTED, STATUS_STOPPED, STATUS_BUDGET_EXHAUSTED or
+        STATUS_DEADLINE_EXCEEDED
+        """
+
+        while True:
+            status = self._execute(True, False)
+            if status not in (self.STATUS_OUTPUT, self.STATUS_WAITING_INPUT,
+                              self.STATUS_WAITING_OUTPUT):
+                # wake up the readers waiting for the end of the output
+                self._output_channel.notify()
+                return status
+            elif status == self.STATUS_OUTPUT:
+                await sleep(0)
+            elif status == self.STATUS_WAITING_INPUT:
+                channel = self._input_channel
+                await (wait or AsyncChannel.wait_until)(
+                    channel, lambda: len(channel) > 0)
+            else:
+                channel = self._output_channel
+                await (wait or AsyncChannel.wait_until)(
+                    channel, lambda: not channel.is_full())
+
+################################################################################
+
+class AsyncScheduler(object):
+    """
+    Runs a network of async intcode computers (a ring, a mesh, a fan-in or a
+    fan-out) in one event loop. Every computer runs as its own coroutine and
+    the output values of a connected computer are forwarded by another one, so
+    a computer only runs while it has something to do. The network must be
+    closed: values written into it from outside are not expected, a network in
+    which every computer waits for something no one will write is reported as
+    deadlocked.
+    """
+
+################################################################################
+
+    def __init__(self):
+        """
+        Creates an empty network.
+        """
+
+        self._computers = []  # type: List[AsyncIntcodeComputer]
+        self._destinations = {} \
+            # type: Dict[AsyncIntcodeComputer, List[AsyncChannel]]
+        # computers and forwarders not finished yet, the waiting ones and what
+        # they wait for
+        self._running_count = 0
+        self._waiting = set() \
+            # type: Set[Tuple[AsyncChannel, Callable[[], bool]]]
+        # number of waits that ended, a deadlock check is void if it changed
+        self._resumed_count = 0
+        # computers that do not run any more
+        self._finished = set()  # type: Set[AsyncIntcodeComputer]
+        self._deadlock = None  # type: Future
+
+################################################################################
+
+    def add_computer(self, computer: AsyncIntcodeComputer) -> None:
+        """
+        Adds a computer with a loaded program to the network.
+
+        :param computer: async intcode computer
+        """
+
+        self._computers.append(computer)
+        self._destinations[computer] = []
+
+################################################################################
+
+    def connect(self, source: AsyncIntcodeComputer,
+                destination: Union[AsyncIntcodeComputer, AsyncChannel]) \
+            -> None:
+        """
+        Forwards all output values the source computer writes from now on to
+        the input of the destination computer, or into the destination channel
+        (e.g. to collect the output of the network). A computer may feed more
+        destinations, every one gets every value, and may be fed by more
+        computers.
+
+        :param source: computer writing the output values
+        :param destination: computer reading them as input values, or channel
+        """
+
+        if isinstance(destination, IntcodeComputer):
+            destination = destination.get_input_channel()
+        self._destinations[source].append(destination)
+
+################################################################################
+
+    def connect_ring(self) -> None:
+        """
+        Connects the computers in a ring in the order they were added, the last
+        one feeds the first one.
+        """
+
+        for i in range(len(self._computers)):
+            self.connect(
+                self._computers[i],
+                self._computers[(i + 1) % len(self._computers)])
+
+################################################################################
+
+    def run(self) -> None:
+        """
+        Runs the network in a new event loop until all the computers halt (or
+        are stopped, or run out of their budgets or time). Raises RuntimeError
+        if the network is deadlocked.
+        """
+
+        run(self.run_async())
+
+################################################################################
+
+    async def run_async(self) -> None:
+        """
+        Runs the network in the running event loop until all the computers
+        halt (or are stopped, or run out of their budgets or time). Raises
+        RuntimeError if the network is deadlocked.
+        """
+
+        loop = get_running_loop()
+        self._deadlock = loop.create_future()
+        self._finished = set()
+        tasks = [loop.create_task(self._run_computer(computer))
+                 for computer in self._computers]
+        tasks += [loop.create_task(self._forward(computer))
+                  for computer in self._computers
+                  if self._destinations[computer]]
+        self._running_count = len(tasks)
+        finished = gather(*tasks)
+        try:
+            done, _ = await wait([finished, self._deadlock],
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        finally:
+            # stops the computers and forwarders of a deadlocked network
+            finished.cancel()
+            await gather(finished, return_exceptions=True)
+
+################################################################################
+
+    async def _run_computer(self, computer: AsyncIntcodeComputer) -> None:
+        """
+        :param computer: computer to run until it halts
+        """
+
+        try:
+            await computer.run_async(self._wait)
+        finally:
+            self._finished.add(computer)
+            computer.get_output_channel().notify()
+            self._running_count -= 1
+            get_running_loop().call_soon(
+                self._check_deadlock, self._resumed_count)
+
+################################################################################
+
+    async def _forward(self, source: AsyncIntcodeComputer) -> None:
+        """
+        Forwards the output values of the computer to its destinations until it
+        finishes.
+
+        :param source: computer writing the output values
+        """
+
+        channel = source.get_output_channel()
+        try:
+            while True:
+                if not channel:
+                    if source in self._finished:
+                        return
+                    await self._wait(
+                        channel,
+                        lambda: len(channel) > 0 or source in self._finished)
+                    continue
+                value = channel.get(False)
+                for destination in self._destinations[source]:
+                    while destination.is_full():
+                        await self._wait(
+                            destination, lambda: not destination.is_full())
+                    destination.put(value, False)
+        finally:
+            self._running_count -= 1
+            get_running_loop().call_soon(
+                self._check_deadlock, self._resumed_count)
+
+################################################################################
+
+    async def _wait(self, channel: AsyncChannel,
+                    predicate: Callable[[], bool]) -> None:
+        """
+        Waits on the channel until the predicate holds, checks for a deadlock
+        once the caller is waiting.
+
+        :param channel: channel to wait on
+        :param predicate: condition to wait for
+        """
+
+        waiter = (channel, predicate)
+        self._waiting.add(waiter)
+        get_running_loop().call_soon(
+            self._check_deadlock, self._resumed_count)
+        try:
+            await channel.wait_until(predicate)
+        finally:
+            self._waiting.discard(waiter)
+            self._resumed_count += 1
+
+################################################################################
+
+    def _check_deadlock(self, resumed_count: int,
+                        deferred: bool = False) -> None:
+        """
+        Reports a deadlock if every running computer and forwarder waits for
+        something that does not hold.
+
+        :param resumed_count: number of waits that ended when the check was
+        scheduled, the waiter that resumed since then will check again
+        :param deferred: the check was already put behind the waiters woken up
+        before it
+        """
+
+        if self._deadlock.done() or self._running_count == 0 \
+                or self._resumed_count != resumed_count \
+                or len(self._waiting) < self._running_count:
+            return
+        if not deferred:
+            # let the woken up waiters run first, they are scheduled already
+            get_running_loop().call_soon(
+                self._check_deadlock, resumed_count, True)
+        elif not any(predicate() for _, predicate in self._waiting):
+            self._deadlock.set_exception(
+                RuntimeError("intcode network is deadlocked"))
+
+################################################################################
@@ -0,0 +1,326 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from collections import deque
+from operator import add, mul
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+################################################################################
+
+class BatchComputer(object):
+    """
+    Runs many instances (lanes) of one program in lockstep. All lanes share
+    one instruction pointer vector and one halted mask; lanes whose instruction
+    pointers and instruction headings are the same are run together: the
+    instruction is decoded once per group of lanes, its operands are gathered
+    from all the lanes into lists, the operation is mapped over them and the
+    results are scattered back. Lanes that branch differently simply form
+    more groups.
+    """
+
+    OPCODE_ADD = 1
+    OPCODE_MULTIPLY = 2
+    OPCODE_SAVE_INPUT = 3
+    OPCODE_WRITE_OUTPUT = 4
+    OPCODE_JUMP_IF_TRUE = 5
+    OPCODE_JUMP_IF_FALSE = 6
+    OPCODE_LESS_THAN = 7
+    OPCODE_EQUALS = 8
+    OPCODE_EXIT = 99
+
+    MODE_POSITION = '0'
+
+    # opcode -> (input params count, output params count)
+    PARAMS_COUNTS = {
+        OPCODE_ADD: (2, 1),
+        OPCODE_MULTIPLY: (2, 1),
+        OPCODE_SAVE_INPUT: (0, 1),
+        OPCODE_WRITE_OUTPUT: (1, 0),
+        OPCODE_JUMP_IF_TRUE: (2, 0),
+        OPCODE_JUMP_IF_FALSE: (2, 0),
+        OPCODE_LESS_THAN: (2, 1),
+        OPCODE_EQUALS: (2, 1),
+        OPCODE_EXIT: (0, 0)
+    }
+
+    OPERATIONS = {
+        OPCODE_ADD: add,
+        OPCODE_MULTIPLY: mul,
+        OPCODE_LESS_THAN: lambda a, b: 1 if a < b else 0,
+        OPCODE_EQUALS: lambda a, b: 1 if a == b else 0
+    }  # type: Dict[int, Callable[[int, int], int]]
+
+################################################################################
+
+    def __init__(self):
+        """
+        Creates the batch computer with no lanes.
+        """
+
+        self._memory = []  # type: List[List[int]]
+        self._instruction_pointers = []  # type: List[int]
+        self._halted = []  # type: List[bool]
+        self._errors = []  # type: List[Optional[Exception]]
+        self._input_values = []  # type: List[Deque[int]]
+        self._output_values = []  # type: List[List[int]]
+        # heading -> (opcode, input param modes, operands count)
+        self._decoded = {}  # type: Dict[int, Tuple[int, str, int]]
+        self._sweeps_count = 0
+
+################################################################################
+
+    def load_program(self, program: Tuple[int], lanes_count: int) -> None:
+        """
+        Loads the given program in the memory of all the lanes.
+
+        :param program: tuple of integers
+        :param lanes_count: number of program instances
+        """
+
+        self._memory = [list(program) for _ in range(lanes_count)]
+        self._instruction_pointers = [0] * lanes_count
+        self._halted = [False] * lanes_count
+        self._errors = [None] * lanes_count
+        self._input_values = [deque() for _ in range(lanes_count)]
+        self._output_values = [[] for _ in range(lanes_count)]
+        self._sweeps_count = 0
+
+################################################################################
+
+    def set_data(self, address: int, data: Sequence[int]) -> None:
+        """
+        Manually sets data in the memory of all the lanes.
+
+        :param address: desired address
+        :param data: desired data for every lane
+        """
+
+        for memory, value in zip(self._memory, data):
+            memory[address] = value
+
+################################################################################
+
+    def get_data(self, address: int) -> List[int]:
+        """
+        :param address: desired address
+        :return: data on the given address in every lane
+        """
+
+        return [memory[address] for memory in self._memory]
+
+################################################################################
+
+    def load_input(self, lane: int, input_value: int) -> None:
+        """
+        Loads an input value for the program running in the given lane.
+
+        :param lane: lane index
+        :param input_value: input value
+        """
+
+        self._input_values[lane].append(input_value)
+
+################################################################################
+
+    def get_output(self, lane: int) -> List[int]:
+        """
+        :param lane: lane index
+        :return: all output values written in the given lane
+        """
+
+        return self._output_values[lane]
+
+################################################################################
+
+    def get_errors(self) -> List[Optional[Exception]]:
+        """
+        Lanes stop when their program fails (e.g. points out of its memory or
+        reads an input value that was not loaded); the other lanes run on.
+
+        :return: error that stopped the lane or None, for every lane
+        """
+
+        return self._errors
+
+################################################################################
+
+    def get_sweeps_count(self) -> int:
+        """
+        :return: number of lockstep sweeps the last run needed
+        """
+
+        return self._sweeps_count
+
+################################################################################
+
+    def run(self) -> None:
+        """
+        Runs all the lanes until every one halts or fails. Every sweep runs one
+        instruction in every running lane.
+        """
+
+        while True:
+            groups = {}  # type: Dict[Tuple[int, int], List[int]]
+            for lane, instruction_pointer in enumerate(
+                    self._instruction_pointers):
+                if not self._halted[lane]:
+                    try:
+                        heading = self._memory[lane][instruction_pointer]
+                    except IndexError as error:
+                        self._stop(lane, error)
+                        continue
+                    groups.setdefault(
+                        (instruction_pointer, heading), []).append(lane)
+
+            if not groups:
+                break
+            self._sweeps_count += 1
+            for (instruction_pointer, heading), lanes in groups.items():
+                try:
+                    decoded = self._decode(heading)
+                except KeyError as error:
+                    for lane in lanes:
+                        self._stop(lane, error)
+                    continue
+                self._run_group(instruction_pointer, decoded, lanes)
+
+################################################################################
+
+    def _decode(self, heading: int) -> Tuple[int, str, int]:
+        """
+        Decodes the instruction heading the same way IntcodeComputer does.
+
+        :param heading: instruction heading
+        :return: opcode, modes of the input params and operands count
+        """
+
+        if heading not in self._decoded:
+            text = str(heading)
+            opcode = int(text[-2:])
+            input_count, output_count = self.PARAMS_COUNTS[opcode]
+            text = self.MODE_POSITION * (2 + input_count - len(text)) + text
+            modes = ''.join(reversed(text[:-2]))[:input_count]
+            self._decoded[heading] = (
+                opcode, modes, input_count + output_count)
+        return self._decoded[heading]
+
+################################################################################
+
+    def _run_group(self, instruction_pointer: int,
+                   decoded: Tuple[int, str, int], lanes: List[int]) -> None:
+        """
+        Runs one instruction in all the given lanes at once. If it fails in
+        any lane, it is run lane by lane instead, so only the failing lanes
+        stop.
+
+        :param instruction_pointer: instruction pointer shared by the lanes
+        :param decoded: opcode, modes of the input params and operands count
+        :param lanes: lane indexes
+        """
+
+        opcode, modes, operands_count = decoded
+        if opcode in (self.OPCODE_SAVE_INPUT, self.OPCODE_EXIT):
+            for lane in lanes:
+                self._run_lane(instruction_pointer, decoded, lane)
+            return
+
+        memories = [self._memory[lane] for lane in lanes]
+        try:
+            # one list of values per input param, one value per lane
+            values = []
+            for i, mode in enumerate(modes):
+                operands = [memory[instruction_pointer + i + 1]
+                            for memory in memories]
+                if mode == self.MODE_POSITION:
+                    operands = [memory[operand]
+                                for memory, operand in zip(memories, operands)]
+                values.append(operands)
+            if opcode in self.OPERATIONS:
+                addresses = [memory[instruction_pointer + 3]
+                             for memory in memories]
+                # negative addresses count from the memory end, like list
+                # indexes do in _run_lane and in the computer list memory
+                length = min(map(len, memories))
+                if min(addresses) < -length or max(addresses) >= length:
+                    raise IndexError("lane writes out of its memory")
+        except IndexError:
+            for lane in lanes:
+                self._run_lane(instruction_pointer, decoded, lane)
+            return
+
+        instruction_pointers = self._instruction_pointers
+        next_address = instruction_pointer + operands_count + 1
+        if opcode in self.OPERATIONS:
+            for memory, address, result in zip(
+                    memories, addresses,
+                    map(self.OPERATIONS[opcode], values[0], values[1])):
+                memory[address] = result
+        elif opcode == self.OPCODE_WRITE_OUTPUT:
+            for lane, value in zip(lanes, values[0]):
+                self._output_values[lane].append(value)
+        elif opcode in (self.OPCODE_JUMP_IF_TRUE, self.OPCODE_JUMP_IF_FALSE):
+            jump_if = opcode == self.OPCODE_JUMP_IF_TRUE
+            for lane, condition, target in zip(lanes, values[0], values[1]):
+                instruction_pointers[lane] \
+                    = target if (condition != 0) == jump_if else next_address
+            return
+        for lane in lanes:
+            instruction_pointers[lane] = next_address
+
+################################################################################
+
+    def _run_lane(self, instruction_pointer: int,
+                  decoded: Tuple[int, str, int], lane: int) -> None:
+        """
+        Runs one instruction in the given lane.
+
+        :param instruction_pointer: instruction pointer of the lane
+        :param decoded: opcode, modes of the input params and operands count
+        :param lane: lane index
+        """
+
+        opcode, modes, operands_count = decoded
+        memory = self._memory[lane]
+        try:
+            values = [memory[memory[instruction_pointer + i + 1]]
+                      if mode == self.MODE_POSITION
+                      else memory[instruction_pointer + i + 1]
+                      for i, mode in enumerate(modes)]
+            if opcode in self.OPERATIONS:
+                memory[memory[instruction_pointer + 3]] \
+                    = self.OPERATIONS[opcode](values[0], values[1])
+            elif opcode == self.OPCODE_JUMP_IF_TRUE and values[0] != 0 \
+                    or opcode == self.OPCODE_JUMP_IF_FALSE \
+                    and values[0] == 0:
+                self._instruction_pointers[lane] = values[1]
+                return
+            elif opcode == self.OPCODE_SAVE_INPUT:
+                if not self._input_values[lane]:
+                    raise RuntimeError(
+                        "program waits for an input value at address %d"
+                        % instruction_pointer)
+                memory[memory[instruction_pointer + 1]] \
+                    = self._input_values[lane].popleft()
+            elif opcode == self.OPCODE_WRITE_OUTPUT:
+                self._output_values[lane].append(values[0])
+            elif opcode == self.OPCODE_EXIT:
+                self._halted[lane] = True
+            self._instruction_pointers[lane] \
+                = instruction_pointer + operands_count + 1
+        except (IndexError, RuntimeError) as error:
+            self._stop(lane, error)
+
+################################################################################
+
+    def _stop(self, lane: int, error: Exception) -> None:
+        """
+        Stops the failed lane.
+
+        :param lane: lane index
+        :param error: error that stopped the lane
+        """
+
+        self._halted[lane] = True
+        self._errors[lane] = error
+
+################################################################################
@@ -0,0 +1,554 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from argparse import ArgumentParser
+from json import dump, load
+from os.path import join
+from time import perf_counter
+from tracemalloc import get_traced_memory, is_tracing, reset_peak, start, \
+    stop
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from intcode_computer.channel import Channel
+from intcode_computer.computer import IntcodeComputer
+from intcode_computer.image import read_program
+
+"""
+Throughput benchmarks of the intcode computer: synthetic long-running programs
+and the Day 2, 5 and 7 puzzle inputs, run by every engine. The results can be
+saved as a JSON baseline and later runs compared with it:
+
+python -m intcode_computer.benchmark --save baseline.json
+python -m intcode_computer.benchmark --compare baseline.json --threshold 0.1
+"""
+
+RESULTS_VERSION = 1
+DEFAULT_ITERATIONS = 50000
+DEFAULT_REPEAT = 10
+DEFAULT_THRESHOLD = 0.1
+
+ENGINES = [IntcodeComputer.ENGINE_INTERPRETER, IntcodeComputer.ENGINE_COMPILER,
+           IntcodeComputer.ENGINE_FUSED]
+
+# metric -> True if a higher value is better
+COMPARED_METRICS = {
+    "instructions_per_second": True,
+    "latency_p50": False,
+    "peak_memory": False
+}
+
+################################################################################
+
+class BenchmarkResult(NamedTuple):
+    """
+    Measurements of one case run by one engine: the number of runs, the
+    instructions of one run, their rate, the run latency percentiles in
+    seconds and the peak of the memory allocated by one run in bytes.
+    """
+
+    case: str
+    engine: str
+    memory: str
+    runs: int
+    instructions: int
+    instructions_per_second: float
+    latency_p50: float
+    latency_p90: float
+    latency_p99: float
+    peak_memory: int
+
+    @property
+    def key(self) -> str:
+        """
+        :return: identification of the measurement in the baseline
+        """
+
+        return "%s/%s/%s" % (self.case, self.engine, self.memory)
+
+################################################################################
+
+class Regression(NamedTuple):
+    """
+    Metric of a measurement that got worse than in the baseline by more than
+    the threshold; the change is relative, positive means worse.
+    """
+
+    key: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+
+    def __str__(self) -> str:
+        """
+        :return: regression as one line of a report
+        """
+
+        return "%s %s: %.6g -> %.6g (%+.1f%%)" % (
+            self.key, self.metric, self.baseline, self.current,
+            100 * self.change)
+
+################################################################################
+
+# a case prepares its computers for the given engine and memory type and
+# returns the function doing one run, which returns the instructions it ran
+# (only the interpreter runs are counted, see count_instructions)
+Case = Callable[[str, str], Callable[[], int]]
+
+################################################################################
+
+def _create_computer(engine: str, memory: str) -> IntcodeComputer:
+    """
+    :param engine: engine of the computer
+    :param memory: memory type of the computer
+    :return: new intcode computer
+    """
+
+    return IntcodeComputer(engine=engine, memory=memory)
+
+################################################################################
+
+def create_loop_program(iterations: int) -> Tuple[int]:
+    """
+    :param iterations: number of loop iterations
+    :return: program counting down in a tight loop of two instructions
+    """
+
+    return 1001, 9, -1, 9, 1005, 9, 0, 99, 0, iterations
+
+################################################################################
+
+def create_io_program(iterations: int) -> Tuple[int]:
+    """
+    :param iterations: number of input values
+    :return: program writing every input value back as an output value
+    """
+
+    return 3, 12, 4, 12, 1001, 13, -1, 13, 1005, 13, 0, 99, 0, iterations
+
+################################################################################
+
+def create_self_modifying_program(iterations: int) -> Tuple[int]:
+    """
+    :param iterations: number of loop iterations
+    :return: program changing an operand of its own first instruction in
+    every iteration
+    """
+
+    return (1101, 0, 0, 20, 1001, 2, 1, 2, 1001, 21, -1, 21, 1005, 21, 0, 99,
+            0, 0, 0, 0, 0, iterations)
+
+################################################################################
+
+def _create_program_case(program: Tuple[int],
+                         inputs: Sequence[int] = ()) -> Case:
+    """
+    :param program: program run to its end
+    :param inputs: input values of the program
+    :return: case running the program on a reused computer
+    """
+
+    def prepare(engine: str, memory: str) -> Callable[[], int]:
+        computer = _create_computer(engine, memory)
+
+        def run() -> int:
+            computer.load_program(program)
+            for input_value in inputs:
+                computer.load_input(input_value)
+            computer.run_sync()
+            return computer.get_steps_count()
+
+        return run
+
+    return prepare
+
+################################################################################
+
+def _create_day_02_case(program: Tuple[int]) -> Case:
+    """
+    :param program: Day 2 program
+    :return: case running it with the noun 12 and the verb 2
+    """
+
+    def prepare(engine: str, memory: str) -> Callable[[], int]:
+        computer = _create_computer(engine, memory)
+
+        def run() -> int:
+            computer.load_program(program)
+            computer.set_data(1, 12)
+            computer.set_data(2, 2)
+            computer.run_sync()
+            return computer.get_steps_count()
+
+        return run
+
+    return prepare
+
+################################################################################
+
+def _create_day_05_case(program: Tuple[int]) -> Case:
+    """
+    :param program: Day 5 program
+    :return: case running the diagnostics of both systems
+    """
+
+    def prepare(engine: str, memory: str) -> Callable[[], int]:
+        computer = _create_computer(engine, memory)
+
+        def run() -> int:
+            steps_count = 0
+            for system_id in (1, 5):
+                computer.load_program(program)
+                computer.load_input(system_id)
+                computer.run_sync()
+                steps_count += computer.get_steps_count()
+            return steps_count
+
+        return run
+
+    return prepare
+
+################################################################################
+
+def _create_day_07_case(program: Tuple[int]) -> Case:
+    """
+    :param program: Day 7 program
+    :return: case running one chain of five amplifiers one after another
+    """
+
+    def prepare(engine: str, memory: str) -> Callable[[], int]:
+        computers = [_create_computer(engine, memory) for _ in range(5)]
+
+        def run() -> int:
+            signal = 0
+            steps_count = 0
+            for computer, phase_setting in zip(computers, (4, 3, 2, 1, 0)):
+                computer.load_program(program)
+                computer.load_input(phase_setting)
+                computer.load_input(signal)
+                computer.run_sync()
+                signal = computer.get_output()[-1]
+                steps_count += computer.get_steps_count()
+            return steps_count
+
+        return run
+
+    return prepare
+
+################################################################################
+
+def _create_day_07_threads_case(program: Tuple[int]) -> Case:
+    """
+    :param program: Day 7 program
+    :return: case running the feedback loop of five amplifiers in their own
+    threads, handing the signal over through channels; a run includes the
+    thread starts
+    """
+
+    def prepare(engine: str, memory: str) -> Callable[[], int]:
+        def run() -> int:
+            channels = [Channel([phase_setting])
+                        for phase_setting in (9, 8, 7, 6, 5)]
+            channels[0].put(0)
+            computers = []
+            for i in range(len(channels)):
+                computer = _create_computer(engine, memory)
+                computer.load_program(program)
+                computer.set_input_channel(channels[i])
+                computer.set_output_channel(
+                    channels[(i + 1) % len(channels)])
+                computers.append(computer)
+            [computer.start() for computer in computers]
+            [computer.join() for computer in computers]
+            return sum([computer.get_steps_count() for computer in computers])
+
+        return run
+
+    return prepare
+
+################################################################################
+
+def create_cases(root: str = ".", iterations: int = DEFAULT_ITERATIONS) \
+        -> Dict[str, Case]:
+    """
+    Creates all the benchmark cases.
+
+    :param root: directory holding the day_02, day_05 and day_07 inputs
+    :param iterations: loop iterations of the synthetic programs
+    :return: case name -> case
+    """
+
+    day_02 = read_program(join(root, "day_02", "input.txt"))
+    day_05 = read_program(join(root, "day_05", "input.txt"))
+    day_07 = read_program(join(root, "day_07", "input.txt"))
+    return {
+        "loop": _create_program_case(create_loop_program(iterations)),
+        "io": _create_program_case(
+            create_io_program(iterations // 10),
+            range(iterations // 10)),
+        "self_modifying": _create_program_case(
+            create_self_modifying_program(iterations // 10)),
+        "day_02": _create_day_02_case(day_02),
+        "day_05": _create_day_05_case(day_05),
+        "day_07": _create_day_07_case(day_07),
+        "day_07_threads": _create_day_07_threads_case(day_07)
+    }
+
+################################################################################
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    """
+    :param values: sorted values
+    :param fraction: percentile as a fraction, e.g. 0.9
+    :return: the nearest-rank percentile of the values
+    """
+
+    return values[min(len(values) - 1, max(0, round(fraction * len(values))
+                                            - 1))]
+
+################################################################################
+
+def _measure_peak_memory(run: Callable[[], int]) -> int:
+    """
+    :param run: function doing one run
+    :return: peak of the memory allocated during the run in bytes
+    """
+
+    tracing = is_tracing()
+    if not tracing:
+        start()
+    try:
+        reset_peak()
+        baseline, _ = get_traced_memory()
+        run()
+        _, peak = get_traced_memory()
+    finally:
+        if not tracing:
+            stop()
+    return peak - baseline
+
+################################################################################
+
+def count_instructions(case: Case,
+                       memory: str = IntcodeComputer.MEMORY_LIST) -> int:
+    """
+    Counts the instructions of one run of the case by the interpreter, the
+    reference all the engines are rated by.
+
+    :param case: case to run
+    :param memory: memory type of the computers
+    :return: number of instructions of one run
+    """
+
+    return case(IntcodeComputer.ENGINE_INTERPRETER, memory)()
+
+################################################################################
+
+def run_case(name: str, case: Case, engine: str,
+             memory: str = IntcodeComputer.MEMORY_LIST,
+             repeat: int = DEFAULT_REPEAT,
+             instructions: Optional[int] = None) -> BenchmarkResult:
+    """
+    Runs the case repeatedly after one warm-up run, then once more with
+    tracemalloc to measure its memory (tracing slows it down, so that run is
+    not timed).
+
+    :param name: case name
+    :param case: case to run
+    :param engine: engine of the computers
+    :param memory: memory type of the computers
+    :param repeat: number of timed runs
+    :param instructions: instructions of one run (see count_instructions),
+    counted by the interpreter if None
+    :return: measurements
+    """
+
+    if instructions is None:
+        instructions = count_instructions(case, memory)
+    run = case(engine, memory)
+    run()
+    latencies = []
+    for _ in range(repeat):
+        start_time = perf_counter()
+        run()
+        latencies.append(perf_counter() - start_time)
+    latencies.sort()
+    return BenchmarkResult(
+        name, engine, memory, repeat, instructions,
+        instructions * repeat / sum(latencies),
+        _percentile(latencies, 0.5), _percentile(latencies, 0.9),
+        _percentile(latencies, 0.99), _measure_peak_memory(run))
+
+################################################################################
+
+def run_benchmarks(cases: Dict[str, Case], engines: Sequence[str] = None,
+                   memory: str = IntcodeComputer.MEMORY_LIST,
+                   repeat: int = DEFAULT_REPEAT,
+                   report: Callable[[BenchmarkResult], None] = None) \
+        -> List[BenchmarkResult]:
+    """
+    Runs every case with every engine.
+
+    :param cases: case name -> case (see create_cases)
+    :param engines: engines to run, all by default
+    :param memory: memory type of the computers
+    :param repeat: number of timed runs of every case
+    :param report: called with every result as soon as it is measured
+    :return: measurements
+    """
+
+    results = []
+    for name, case in cases.items():
+        instructions = count_instructions(case, memory)
+        for engine in engines or ENGINES:
+            result = run_case(
+                name, case, engine, memory, repeat, instructions)
+            if report is not None:
+                report(result)
+            results.append(result)
+    return results
+
+################################################################################
+
+def format_result(result: BenchmarkResult) -> str:
+    """
+    :param result: measurements
+    :return: measurements as one line of a report
+    """
+
+    return "%-16s %-11s %-6s %12.0f instr/s  p50 %9.3f ms  p90 %9.3f ms  " \
+           "p99 %9.3f ms  peak %8d B" % (
+               result.case, result.engine, result.memory,
+               result.instructions_per_second, 1000 * result.latency_p50,
+               1000 * result.latency_p90, 1000 * result.latency_p99,
+               result.peak_memory)
+
+################################################################################
+
+def save_results(results: Sequence[BenchmarkResult], path: str) -> None:
+    """
+    Saves the results as a JSON baseline.
+
+    :param results: measurements
+    :param path: baseline file path
+    """
+
+    with open(path, 'w') as f:
+        dump({"version": RESULTS_VERSION,
+              "results": {result.key: result._asdict()
+                          for result in results}},
+             f, indent=2)
+
+################################################################################
+
+def load_results(path: str) -> List[BenchmarkResult]:
+    """
+    Loads a JSON baseline saved by save_results. Raises ValueError if its
+    version is not supported.
+
+    :param path: baseline file path
+    :return: measurements
+    """
+
+    with open(path, 'r') as f:
+        baseline = load(f)
+    if baseline.get("version") != RESULTS_VERSION:
+        raise ValueError("%s has unsupported baseline version %s"
+                         % (path, baseline.get("version")))
+    return [BenchmarkResult(**result)
+            for result in baseline["results"].values()]
+
+################################################################################
+
+def compare_results(baseline: Sequence[BenchmarkResult],
+                    results: Sequence[BenchmarkResult],
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Regression]:
+    """
+    Compares the results with the baseline measured on the same machine. The
+    instruction rate, the median latency and the peak memory are compared;
+    measurements missing in either of them are skipped.
+
+    :param baseline: baseline measurements
+    :param results: new measurements
+    :param threshold: relative change tolerated, e.g. 0.1 for 10 %
+    :return: metrics that got worse by more than the threshold
+    """
+
+    baseline_results = {result.key: result for result in baseline}
+    regressions = []
+    for result in results:
+        baseline_result = baseline_results.get(result.key)
+        if baseline_result is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            baseline_value = getattr(baseline_result, metric)
+            value = getattr(result, metric)
+            if baseline_value <= 0:
+                continue
+            change = (value - baseline_value) / baseline_value
+            if higher_is_better:
+                change = -change
+            if change > threshold:
+                regressions.append(Regression(
+                    result.key, metric, baseline_value, value, change))
+    return regressions
+
+################################################################################
+
+def main(arguments: Optional[Sequence[str]] = None) -> int:
+    """
+    Runs the benchmarks from the command line.
+
+    :param arguments: command line arguments, sys.argv by default
+    :return: exit status, 1 if a regression was found
+    """
+
+    parser = ArgumentParser(
+        prog="python -m intcode_computer.benchmark",
+        description="Measures the throughput of the intcode engines.")
+    parser.add_argument("--cases", nargs='+',
+                        help="cases to run, all by default")
+    parser.add_argument("--engines", nargs='+', choices=ENGINES,
+                        help="engines to run, all by default")
+    parser.add_argument("--memory", default=IntcodeComputer.MEMORY_LIST,
+                        choices=[IntcodeComputer.MEMORY_LIST,
+                                 IntcodeComputer.MEMORY_PAGED,
+                                 IntcodeComputer.MEMORY_ARRAY])
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help="loop iterations of the synthetic programs")
+    parser.add_argument("--root", default=".",
+                        help="directory holding the puzzle inputs")
+    parser.add_argument("--save", metavar="PATH",
+                        help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH",
+                        help="compare the results with a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change reported as a regression")
+    options = parser.parse_args(arguments)
+
+    cases = create_cases(options.root, options.iterations)
+    if options.cases:
+        unknown = set(options.cases) - set(cases)
+        if unknown:
+            parser.error("unknown cases: %s" % ', '.join(sorted(unknown)))
+        cases = {name: cases[name] for name in options.cases}
+    results = run_benchmarks(
+        cases, options.engines, options.memory, options.repeat,
+        lambda result: print(format_result(result)))
+    if options.save:
+        save_results(results, options.save)
+    if options.compare:
+        regressions = compare_results(
+            load_results(options.compare), results, options.threshold)
+        for regression in regressions:
+            print("REGRESSION " + str(regression))
+        if regressions:
+            return 1
+    return 0
+
+################################################################################
+
+if __name__ == "__main__":
+    exit(main())
+
+################################################################################
@@ -0,0 +1,203 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha256
+from shelve import open as open_shelf
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+from intcode_computer.computer import IntcodeComputer
+
+################################################################################
+
+class RunResult(NamedTuple):
+    """
+    Result of a finished program run.
+    """
+
+    patches: Tuple[Tuple[int, int], ...]
+    memory_digest: str
+    output_values: Tuple[int, ...]
+
+################################################################################
+
+def _digest(values: Iterable[int]) -> str:
+    """
+    :param values: integers
+    :return: SHA-256 hex digest of the integers written as comma-separated text
+    """
+
+    return sha256(','.join([str(value) for value in values]).encode()) \
+        .hexdigest()
+
+################################################################################
+
+@lru_cache(maxsize=64)
+def _program_digest(program: Tuple[int]) -> str:
+    """
+    Same as _digest, remembered for the last few programs.
+
+    :param program: tuple of integers
+    :return: SHA-256 hex digest of the program
+    """
+
+    return _digest(program)
+
+################################################################################
+
+class RunCache(object):
+    """
+    Remembers results of program runs, so a program run again with the same
+    patched cells and the same input values does not have to execute. The last
+    results are kept in memory, all results can also be kept in a file.
+    """
+
+    DEFAULT_MAX_SIZE = 1024
+
+################################################################################
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, path: str = None):
+        """
+        Creates the cache.
+
+        :param max_size: number of results kept in memory
+        :param path: file the results are also kept in, None for none
+        """
+
+        self._max_size = max_size
+        self._results = OrderedDict()  # type: Dict[str, RunResult]
+        self._shelf = open_shelf(path) if path is not None else None
+        self._hits_count = 0
+        self._misses_count = 0
+
+################################################################################
+
+    def run(self, program: Tuple[int], input_values: Sequence[int] = (),
+            patches: Dict[int, int] = None) -> RunResult:
+        """
+        Returns the result of the program run. The program runs only if there
+        is no result for the same program, patches and input values yet.
+
+        :param program: tuple of integers
+        :param input_values: all input values the program reads
+        :param patches: address -> data set in memory before the run
+        :return: run result
+        """
+
+        patches = tuple(sorted((patches or {}).items()))
+        key = self._get_key(program, patches, input_values)
+        result = self._get(key)
+
+        if result is None:
+            self._misses_count += 1
+            computer = IntcodeComputer()
+            computer.load_program(program)
+            for address, data in patches:
+                computer.set_data(address, data)
+            for input_value in input_values:
+                computer.load_input(input_value)
+            computer.run_sync()
+            result = RunResult(
+                patches,
+                _digest(computer.snapshot().memory),
+                tuple(computer.get_output()))
+            self._put(key, result)
+        else:
+            self._hits_count += 1
+        return result
+
+################################################################################
+
+    def get_hits_count(self) -> int:
+        """
+        :return: number of runs answered from the cache
+        """
+
+        return self._hits_count
+
+################################################################################
+
+    def get_misses_count(self) -> int:
+        """
+        :return: number of runs that had to execute
+        """
+
+        return self._misses_count
+
+################################################################################
+
+    def close(self) -> None:
+        """
+        Closes the file the results are kept in.
+        """
+
+        if self._shelf is not None:
+            self._shelf.close()
+            self._shelf = None
+
+################################################################################
+
+    def _get_key(self, program: Tuple[int],
+                 patches: Tuple[Tuple[int, int], ...],
+                 input_values: Sequence[int]) -> str:
+        """
+        :param program: tuple of integers
+        :param patches: sorted (address, data) pairs
+        :param input_values: input values
+        :return: key of the run
+        """
+
+        return "%s/%s/%s" % (
+            _program_digest(program),
+            _digest([value for patch in patches for value in patch]),
+            _digest(input_values))
+
+################################################################################
+
+    def _get(self, key: str) -> Optional[RunResult]:
+        """
+        Looks the result up in memory, then in the file.
+
+        :param key: key of the run
+        :return: run result or None
+        """
+
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+        elif self._shelf is not None:
+            result = self._shelf.get(key)
+            if result is not None:
+                self._remember(key, result)
+        return result
+
+################################################################################
+
+    def _put(self, key: str, result: RunResult) -> None:
+        """
+        Saves the result in memory and in the file.
+
+        :param key: key of the run
+        :param result: run result
+        """
+
+        self._remember(key, result)
+        if self._shelf is not None:
+            self._shelf[key] = result
+
+################################################################################
+
+    def _remember(self, key: str, result: RunResult) -> None:
+        """
+        Saves the result in memory, drops the least recently used one if there
+        are too many.
+
+        :param key: key of the run
+        :param result: run result
+        """
+
+        self._results[key] = result
+        if len(self._results) > self._max_size:
+            self._results.popitem(last=False)
+
+################################################################################
@@ -0,0 +1,174 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from collections import deque
+from threading import Condition
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Type
+
+################################################################################
+
+class ChannelEmpty(Exception):
+    """
+    Raised by a non-blocking (or timed out) read of an empty channel.
+    """
+
+################################################################################
+
+class ChannelFull(Exception):
+    """
+    Raised by a non-blocking (or timed out) write to a full channel.
+    """
+
+################################################################################
+
+class Channel(object):
+    """
+    FIFO of intcode values between a producer and a consumer, e.g. the output
+    of one computer and the input of another one. Writers block while a bounded
+    channel is full (backpressure), readers block while it is empty; both can
+    also fail right away or after a timeout instead. Safe to share among
+    threads. Reads, and writes to an unbounded channel, take no lock unless a
+    thread waits on the channel.
+    """
+
+################################################################################
+
+    def __init__(self, values: Iterable[int] = (), capacity: int = None):
+        """
+        Creates the channel.
+
+        :param values: initial values, the oldest first
+        :param capacity: maximum number of values in the channel, None for no
+        limit
+        """
+
+        self._values = deque(values)  # type: Deque[int]
+        self._capacity = capacity
+        self._condition = Condition()
+        # number of threads waiting for a value or for space
+        self._waiting_count = 0
+
+################################################################################
+
+    def __len__(self) -> int:
+        """
+        :return: number of values in the channel
+        """
+
+        return len(self._values)
+
+################################################################################
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        :return: iterator over a copy of the values in the channel, the oldest
+        first
+        """
+
+        return iter(self.get_values())
+
+################################################################################
+
+    def get_capacity(self) -> int:
+        """
+        :return: maximum number of values in the channel, None for no limit
+        """
+
+        return self._capacity
+
+################################################################################
+
+    def get_values(self) -> List[int]:
+        """
+        :return: copy of the values in the channel, the oldest first
+        """
+
+        with self._condition:
+            return list(self._values)
+
+################################################################################
+
+    def is_full(self) -> bool:
+        """
+        :return: True if a write would block
+        """
+
+        return self._capacity is not None \
+               and len(self._values) >= self._capacity
+
+################################################################################
+
+    def put(self, value: int, block: bool = True,
+            timeout: float = None) -> None:
+        """
+        Writes the value at the end of the channel, waits for space first if
+        the channel is full.
+
+        :param value: value to write
+        :param block: wait for space, raise ChannelFull right away otherwise
+        :param timeout: seconds to wait at most, None for no limit
+        """
+
+        if self._capacity is None:
+            # deque appends are atomic, a reader that starts to wait after this
+            # sees the value, one that waits already is counted
+            self._values.append(value)
+        else:
+            with self._condition:
+                if self.is_full():
+                    self._wait(lambda: not self.is_full(), block, timeout,
+                               ChannelFull)
+                self._values.append(value)
+        if self._waiting_count:
+            with self._condition:
+                self._condition.notify_all()
+
+################################################################################
+
+    def get(self, block: bool = True, timeout: float = None) -> int:
+        """
+        Takes the oldest value of the channel, waits for one first if the
+        channel is empty.
+
+        :param block: wait for a value, raise ChannelEmpty right away otherwise
+        :param timeout: seconds to wait at most, None for no limit
+        :return: the value
+        """
+
+        try:
+            value = self._values.popleft()
+        except IndexError:
+            with self._condition:
+                # another reader may take the value first
+                while not self._values:
+                    self._wait(lambda: self._values, block, timeout,
+                               ChannelEmpty)
+                value = self._values.popleft()
+        if self._waiting_count:
+            with self._condition:
+                self._condition.notify_all()
+        return value
+
+################################################################################
+
+    def _wait(self, predicate: Callable[[], bool], block: bool,
+              timeout: Optional[float], error: Type[Exception]) -> None:
+        """
+        Waits until the predicate holds, the condition must be acquired.
+
+        :param predicate: condition on the channel
+        :param block: wait, raise the error right away otherwise
+        :param timeout: seconds to wait at most, None for no limit
+        :param error: exception class raised if the predicate does not hold
+        """
+
+        if not block:
+            raise error()
+        self._waiting_count += 1
+        try:
+            if not self._condition.wait_for(predicate, timeout):
+                raise error()
+        finally:
+            self._waiting_count -= 1
+
+################################################################################
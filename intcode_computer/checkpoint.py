@@ -0,0 +1,315 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from array import array
+from io import BytesIO
+from os import fsync, replace
+from struct import Struct, error as StructError
+from sys import byteorder
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple, Union
+from zlib import compress, crc32, decompress, error as ZlibError
+from intcode_computer.computer import IntcodeComputer, Snapshot
+from intcode_computer.memory import ARRAY_TYPE_CODE, PagedMemory
+
+"""
+Checkpoint files: an 8-byte header (the magic, the format version and the
+page shift) followed by records, each one a compressed computer state with its
+length and checksum. The first record is full, the following ones hold only
+the memory pages that changed since the record before. Reading replays the
+records; a record cut short by a crash is ignored, so the state of the last
+complete checkpoint is restored.
+"""
+
+CHECKPOINT_MAGIC = b"INCK"
+CHECKPOINT_VERSION = 1
+
+# magic, version, page shift
+_FILE_HEADER = Struct("<4sHH")
+# compressed record length, record checksum
+_RECORD_HEADER = Struct("<II")
+# full record flag, exit flag, pages count, instruction pointer, memory length
+_STATE = Struct("<BBxxIqQ")
+# values encoding, values count (or text length)
+_VALUES_HEADER = Struct("<BQ")
+_PAGE_INDEX = Struct("<Q")
+
+# little-endian 64-bit integers, or comma separated decimal text if a value
+# does not fit
+_ENCODING_INT64 = 0
+_ENCODING_TEXT = 1
+
+################################################################################
+
+def _write_values(stream: BinaryIO, values: Sequence[int]) -> None:
+    """
+    :param stream: record payload
+    :param values: values to write
+    """
+
+    try:
+        cells = array(ARRAY_TYPE_CODE, values)
+    except OverflowError:
+        text = ','.join([str(value) for value in values]).encode()
+        stream.write(_VALUES_HEADER.pack(_ENCODING_TEXT, len(text)))
+        stream.write(text)
+        return
+    if byteorder != "little":
+        cells.byteswap()
+    stream.write(_VALUES_HEADER.pack(_ENCODING_INT64, len(cells)))
+    stream.write(cells.tobytes())
+
+################################################################################
+
+def _read_values(stream: BinaryIO) -> List[int]:
+    """
+    :param stream: record payload
+    :return: values read
+    """
+
+    encoding, count = _VALUES_HEADER.unpack(stream.read(_VALUES_HEADER.size))
+    if encoding == _ENCODING_TEXT:
+        text = stream.read(count).decode()
+        return [int(value) for value in text.split(',')] if text else []
+    cells = array(ARRAY_TYPE_CODE)
+    cells.frombytes(stream.read(count * cells.itemsize))
+    if byteorder != "little":
+        cells.byteswap()
+    return cells.tolist()
+
+################################################################################
+
+def _get_pages(memory: Union[Tuple[int], PagedMemory]) \
+        -> Dict[int, Sequence[int]]:
+    """
+    :param memory: memory of a snapshot
+    :return: page index -> page of PagedMemory.PAGE_SIZE cells, the last one
+    may be shorter; the pages never written are not in it
+    """
+
+    if isinstance(memory, PagedMemory):
+        return memory.get_pages()
+    size = PagedMemory.PAGE_SIZE
+    return {i >> PagedMemory.PAGE_SHIFT: memory[i:i + size]
+            for i in range(0, len(memory), size)}
+
+################################################################################
+
+def _get_changed_pages(pages: Dict[int, Sequence[int]],
+                       last_pages: Dict[int, Sequence[int]]) -> List[int]:
+    """
+    :param pages: pages of the memory now
+    :param last_pages: pages of the memory at the last checkpoint
+    :return: indexes of the pages that differ, including the pages that are
+    gone
+    """
+
+    # a written paged memory page is a new list since the last snapshot,
+    # the identity check is enough; sliced pages are compared by value
+    changed = [index for index, page in pages.items()
+               if page is not last_pages.get(index)
+               and page != last_pages.get(index)]
+    changed += [index for index in last_pages if index not in pages]
+    return sorted(changed)
+
+################################################################################
+
+class Checkpointer(object):
+    """
+    Saves the state of a computer (its memory, instruction pointer, pending
+    input values, output values and exit flag) to a checkpoint file whenever
+    asked. Every checkpoint after the first one only appends the memory pages
+    that changed since the checkpoint before, so frequent checkpoints stay
+    cheap; every max_increments checkpoints the file is rewritten with one full
+    record to keep it short. Paged memory tells the changed pages right away,
+    list and array memory are compared page by page with the last checkpoint,
+    so large memories checkpoint faster paged. Checkpoint between runs, e.g.
+    after a run that ran out of its budget (see IntcodeComputer.set_budget),
+    never while the program runs in its thread. Read the file by
+    read_checkpoint.
+    """
+
+    DEFAULT_MAX_INCREMENTS = 64
+
+################################################################################
+
+    def __init__(self, computer: IntcodeComputer, path: str,
+                 max_increments: int = DEFAULT_MAX_INCREMENTS,
+                 sync: bool = False):
+        """
+        Creates the checkpointer, the file is created by the first checkpoint.
+
+        :param computer: computer whose state is saved
+        :param path: checkpoint file path
+        :param max_increments: number of incremental records after which the
+        file is rewritten with a full record
+        :param sync: flush every checkpoint to the disk (fsync), so it survives
+        a system crash as well
+        """
+
+        self._computer = computer
+        self._path = path
+        self._max_increments = max_increments
+        self._sync = sync
+        # snapshot of the last checkpoint, the pages are compared with it
+        self._last_snapshot = None  # type: Optional[Snapshot]
+        self._last_pages = {}  # type: Dict[int, Sequence[int]]
+        self._increments_count = 0
+        self._checkpoints_count = 0
+
+################################################################################
+
+    def checkpoint(self) -> int:
+        """
+        Saves the current state of the computer.
+
+        :return: number of memory pages written
+        """
+
+        snapshot = self._computer.snapshot()
+        pages = _get_pages(snapshot.memory)
+        last = self._last_snapshot
+        full = last is None or snapshot.program is not last.program \
+            or self._increments_count >= self._max_increments \
+            or len(snapshot.memory) < len(last.memory)
+        if not full:
+            changed = _get_changed_pages(pages, self._last_pages)
+            # a page dropped by a restore cannot be written as a change
+            full = any([index not in pages for index in changed])
+        if full:
+            changed = sorted(pages)
+
+        payload = BytesIO()
+        payload.write(_STATE.pack(
+            full, snapshot.exit_flag, len(changed),
+            snapshot.instruction_pointer, len(snapshot.memory)))
+        if full:
+            _write_values(payload, snapshot.program)
+        _write_values(payload, snapshot.input_values)
+        _write_values(payload, snapshot.output_values)
+        for index in changed:
+            payload.write(_PAGE_INDEX.pack(index))
+            _write_values(payload, pages[index])
+        record = compress(payload.getvalue(), 1)
+        record = _RECORD_HEADER.pack(len(record), crc32(record)) + record
+
+        if full:
+            # the old file stays whole until the new one replaces it
+            temporary_path = self._path + ".tmp"
+            with open(temporary_path, 'wb') as f:
+                f.write(_FILE_HEADER.pack(
+                    CHECKPOINT_MAGIC, CHECKPOINT_VERSION,
+                    PagedMemory.PAGE_SHIFT))
+                f.write(record)
+                self._flush(f)
+            replace(temporary_path, self._path)
+            self._increments_count = 0
+        else:
+            with open(self._path, 'ab') as f:
+                f.write(record)
+                self._flush(f)
+            self._increments_count += 1
+
+        self._last_snapshot = snapshot
+        self._last_pages = pages
+        self._checkpoints_count += 1
+        return len(changed)
+
+################################################################################
+
+    def get_checkpoints_count(self) -> int:
+        """
+        :return: number of checkpoints saved
+        """
+
+        return self._checkpoints_count
+
+################################################################################
+
+    def _flush(self, f: BinaryIO) -> None:
+        """
+        :param f: checkpoint file written
+        """
+
+        if self._sync:
+            f.flush()
+            fsync(f.fileno())
+
+################################################################################
+
+def read_checkpoint(path: str) -> Snapshot:
+    """
+    Reads the state saved by the last complete checkpoint of the file. Restore
+    it in any computer by IntcodeComputer.restore; the program then continues
+    exactly where it was. Raises ValueError if the file is not a checkpoint
+    file or holds no complete checkpoint.
+
+    :param path: checkpoint file path
+    :return: snapshot of the computer state
+    """
+
+    with open(path, 'rb') as f:
+        header = f.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size:
+            raise ValueError("%s is not an intcode checkpoint" % path)
+        magic, version, page_shift = _FILE_HEADER.unpack(header)
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError("%s is not an intcode checkpoint" % path)
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(
+                "%s has unsupported checkpoint version %d" % (path, version))
+
+        state = None
+        program = None
+        pages = {}  # type: Dict[int, List[int]]
+        while True:
+            record_header = f.read(_RECORD_HEADER.size)
+            if len(record_header) < _RECORD_HEADER.size:
+                break
+            length, checksum = _RECORD_HEADER.unpack(record_header)
+            record = f.read(length)
+            if len(record) < length or crc32(record) != checksum:
+                # written only partly
+                break
+            try:
+                payload = BytesIO(decompress(record))
+                full, exit_flag, pages_count, instruction_pointer, \
+                    memory_length = _STATE.unpack(payload.read(_STATE.size))
+                if full:
+                    program = tuple(_read_values(payload))
+                    pages = {}
+                input_values = tuple(_read_values(payload))
+                output_values = tuple(_read_values(payload))
+                for _ in range(pages_count):
+                    index, = _PAGE_INDEX.unpack(payload.read(_PAGE_INDEX.size))
+                    pages[index] = _read_values(payload)
+            except (StructError, ZlibError) as error:
+                raise ValueError("%s is corrupted" % path) from error
+            state = (exit_flag, instruction_pointer, memory_length,
+                     input_values, output_values)
+    if state is None or program is None:
+        raise ValueError("%s holds no complete checkpoint" % path)
+    exit_flag, instruction_pointer, memory_length, input_values, \
+        output_values = state
+
+    page_size = 1 << page_shift
+    # pages behind the end of a memory that shrank before a full record
+    pages = {index: page for index, page in pages.items()
+             if index * page_size < memory_length}
+    if page_size == PagedMemory.PAGE_SIZE:
+        # a page sliced from the end of a list memory is shorter
+        memory = PagedMemory.from_pages(
+            {index: page + [0] * (page_size - len(page))
+             for index, page in pages.items()},
+            memory_length)
+    else:
+        memory = PagedMemory()
+        for index, page in pages.items():
+            for offset, value in enumerate(page):
+                if value:
+                    memory[index * page_size + offset] = value
+        if memory_length:
+            memory[memory_length - 1] = memory[memory_length - 1]
+    return Snapshot(program, memory, instruction_pointer, input_values,
+                    output_values, bool(exit_flag))
+
+################################################################################
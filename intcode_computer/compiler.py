@@ -0,0 +1,450 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from collections import OrderedDict
+from functools import lru_cache
+from types import CodeType, FunctionType
+from typing import Callable, Dict, List, MutableSequence, NamedTuple, \
+    Optional, Set, Tuple
+
+################################################################################
+
+class Block(NamedTuple):
+    """
+    Basic block translated to Python. The function runs all the instructions of
+    the block and returns the address of the next instruction to run.
+    """
+
+    function: Callable[[], int]
+    start: int
+    end: int
+    instructions_count: int
+    reads_input: bool
+    writes_output: bool
+
+################################################################################
+
+class Translation(NamedTuple):
+    """
+    Machine independent result of a block translation, it can be bound to the
+    memory of any machine whose block cells hold the same values.
+    """
+
+    code: CodeType
+    end: int
+    instructions_count: int
+    reads_input: bool
+    writes_output: bool
+
+################################################################################
+
+# program id -> (program, block start address -> translation of the block
+# as it is in the loaded program)
+_PROGRAM_TRANSLATIONS = OrderedDict()
+_PROGRAM_TRANSLATIONS_SIZE = 64
+
+################################################################################
+
+@lru_cache(maxsize=4096)
+def _compile_source(source: str) -> CodeType:
+    """
+    Compiles the generated block source. Machines running the same program
+    generate the same sources, so the code objects are shared among them.
+
+    :param source: generated Python source of a block
+    :return: code object of the block function
+    """
+
+    module = compile(source, "<intcode block>", "exec")
+    return [const for const in module.co_consts
+            if isinstance(const, CodeType)][0]
+
+################################################################################
+
+def _get_program_translations(program: Tuple[int]) -> Dict[int, Translation]:
+    """
+    Returns the translations shared by all machines that loaded the given
+    program. Only the last few programs are kept.
+
+    :param program: loaded program
+    :return: block start address -> translation
+    """
+
+    key = id(program)
+    entry = _PROGRAM_TRANSLATIONS.get(key)
+    if entry is None or entry[0] is not program:
+        entry = (program, {})
+        _PROGRAM_TRANSLATIONS[key] = entry
+        if len(_PROGRAM_TRANSLATIONS) > _PROGRAM_TRANSLATIONS_SIZE:
+            _PROGRAM_TRANSLATIONS.popitem(last=False)
+    else:
+        _PROGRAM_TRANSLATIONS.move_to_end(key)
+    return entry[1]
+
+################################################################################
+
+class BlockCompiler(object):
+    OPCODE_ADD = 1
+    OPCODE_MULTIPLY = 2
+    OPCODE_SAVE_INPUT = 3
+    OPCODE_WRITE_OUTPUT = 4
+    OPCODE_JUMP_IF_TRUE = 5
+    OPCODE_JUMP_IF_FALSE = 6
+    OPCODE_LESS_THAN = 7
+    OPCODE_EQUALS = 8
+    OPCODE_EXIT = 99
+
+    MODE_POSITION = '0'
+
+    FUNCTION_NAME = "block"
+    INDENT = "    "
+
+    # a block is compiled when the execution reaches it this many times during
+    # a run, the code run only once is cheaper to interpret
+    COMPILE_VISITS_COUNT = 2
+    # a block dropped this many times during a run is not compiled anymore,
+    # the program keeps modifying it and each translation would run once
+    MAX_DROPS_COUNT = 3
+
+################################################################################
+
+    def __init__(self, program: Tuple[int], memory: MutableSequence[int],
+                 decode: Callable,
+                 read_input: Callable[[], int],
+                 write_output: Callable[[int], None],
+                 halt: Callable[[], None],
+                 invalidate: Callable[[int], None],
+                 overflow: Callable[[int, int], None]):
+        """
+        Creates the compiler for the given memory. Blocks are translated lazily
+        the first time the execution reaches their first address; blocks still
+        holding the loaded program share their translation with all the other
+        machines that loaded the same program. A block is compiled only when
+        the execution reaches it the second time in a run, the code run once
+        is interpreted.
+
+        :param program: loaded program
+        :param memory: memory of the intcode computer
+        :param decode: function decoding an instruction heading on an address
+        :param read_input: function returning the next input value
+        :param write_output: function taking an output value
+        :param halt: function halting the intcode computer
+        :param invalidate: function called when a compiled block writes into a
+        cell that belongs to a compiled block
+        :param overflow: function storing a value that does not fit in the
+        memory
+        """
+
+        self._program = program
+        self._translations = _get_program_translations(program)
+        self._memory = memory
+        self._decode = decode
+        self.blocks = {}  # type: Dict[int, Block]
+        # start addresses of the compiled blocks translated from the loaded
+        # program, they are kept when the program is loaded again
+        self._loaded_starts = set()  # type: Set[int]
+        # cell address -> start addresses of the blocks the cell belongs to
+        self._owners = {}  # type: Dict[int, List[int]]
+        # address -> number of times the execution reached it during the
+        # current run with no block compiled there
+        self._visits_counts = {}  # type: Dict[int, int]
+        # block start address -> number of times the block was dropped by a
+        # write into its cells during the current run
+        self._drops_counts = {}  # type: Dict[int, int]
+        # number of instructions run by the last block if it returned early,
+        # zero otherwise; the caller resets it
+        self.ran_count = [0]
+        self._namespace = {
+            'm': memory,
+            'read': read_input,
+            'write': write_output,
+            'halt': halt,
+            'owners': self._owners,
+            'ran': self.ran_count,
+            'invalidate': invalidate,
+            'overflow': overflow
+        }
+
+################################################################################
+
+    def get(self, address: int) -> Optional[Block]:
+        """
+        Returns the block starting on the given address, translates it first if
+        it is not compiled yet. Returns None if the execution reached the
+        address for the first time in this run (see COMPILE_VISITS_COUNT) or
+        if the program keeps modifying the block (see MAX_DROPS_COUNT), the
+        instruction there is to be interpreted then.
+
+        :param address: address of the first instruction of the block
+        :return: compiled block, or None
+        """
+
+        block = self.blocks.get(address)
+        if block is not None:
+            return block
+        visits_count = self._visits_counts.get(address, 0) + 1
+        self._visits_counts[address] = visits_count
+        if visits_count < self.COMPILE_VISITS_COUNT \
+                or self._drops_counts.get(address, 0) >= self.MAX_DROPS_COUNT:
+            return None
+        return self._compile(address)
+
+################################################################################
+
+    def get_program(self) -> Tuple[int]:
+        """
+        :return: loaded program
+        """
+
+        return self._program
+
+################################################################################
+
+    def reset(self, memory: MutableSequence[int]) -> None:
+        """
+        Prepares the compiler for the loaded program loaded again into the
+        given memory. The compiled blocks translated from the loaded program
+        are kept: a write into any of their cells would have dropped them, so
+        they still match the program and run in the next run without being
+        bound again. The blocks translated from modified code are dropped.
+
+        :param memory: new memory of the intcode computer holding the program
+        """
+
+        for start in [start for start in self.blocks
+                      if start not in self._loaded_starts]:
+            self._drop(start)
+        self._visits_counts.clear()
+        self._drops_counts.clear()
+        self.ran_count[0] = 0
+        self.set_memory(memory)
+
+################################################################################
+
+    def set_memory(self, memory: MutableSequence[int]) -> None:
+        """
+        Replaces the memory holding the same cells, e.g. when the memory is
+        converted to another type. Compiled blocks look the memory up every time
+        they run, so they keep working.
+
+        :param memory: new memory of the intcode computer
+        """
+
+        self._memory = memory
+        self._namespace['m'] = memory
+
+################################################################################
+
+    def invalidate(self, address: int) -> None:
+        """
+        Drops all compiled blocks the given cell belongs to. They are compiled
+        again the next time the execution reaches them.
+
+        :param address: address of the written cell
+        """
+
+        for start in self._owners.pop(address, ()):
+            self._drop(start)
+            self._drops_counts[start] = self._drops_counts.get(start, 0) + 1
+
+################################################################################
+
+    def _drop(self, start: int) -> None:
+        """
+        Drops the compiled block starting on the given address, if any.
+
+        :param start: address of the first instruction of the block
+        """
+
+        block = self.blocks.pop(start, None)
+        self._loaded_starts.discard(start)
+        if block is not None:
+            for cell in range(block.start, block.end):
+                starts = self._owners.get(cell)
+                if starts is not None and start in starts:
+                    starts.remove(start)
+                    if not starts:
+                        del self._owners[cell]
+
+################################################################################
+
+    def _compile(self, address: int) -> Block:
+        """
+        Binds the translation of the block starting on the given address to the
+        memory of this machine. The shared translation is used if the block
+        cells still hold the loaded program.
+
+        :param address: address of the first instruction of the block
+        :return: compiled block
+        """
+
+        translation = self._translations.get(address)
+        loaded = translation is not None \
+            and self._is_loaded(address, translation.end)
+        if not loaded:
+            translation = self._translate(address)
+            loaded = self._is_loaded(address, translation.end)
+            if loaded:
+                self._translations[address] = translation
+        if loaded:
+            self._loaded_starts.add(address)
+
+        block = Block(
+            FunctionType(translation.code, self._namespace),
+            address,
+            translation.end,
+            translation.instructions_count,
+            translation.reads_input,
+            translation.writes_output)
+        self.blocks[address] = block
+        for cell in range(address, translation.end):
+            self._owners.setdefault(cell, []).append(address)
+        return block
+
+################################################################################
+
+    def _is_loaded(self, start: int, end: int) -> bool:
+        """
+        Checks that the cells still hold the loaded program.
+
+        :param start: first address
+        :param end: address after the last one
+        :return: True if no cell differs from the loaded program
+        """
+
+        return self._program[start:end] \
+               == tuple([self._memory[address]
+                         for address in range(start, end)])
+
+################################################################################
+
+    def _translate(self, address: int) -> Translation:
+        """
+        Translates the basic block starting on the given address. The block
+        ends after an output, jump or exit instruction, or before an input
+        instruction (so every input instruction starts its own block). Mode
+        resolution and operand fetches are fixed in the generated source; the
+        block is dropped when a write lands inside it.
+
+        :param address: address of the first instruction of the block
+        :return: block translation
+        """
+
+        lines = []
+        instruction_pointer = address
+        instructions_count = 0
+        reads_input = False
+        writes_output = False
+
+        while True:
+            try:
+                instruction = self._decode(instruction_pointer)
+                operands = [
+                    self._memory[address]
+                    for address in range(
+                        instruction_pointer + 1,
+                        instruction_pointer + instruction.operands_count + 1)]
+            except (IndexError, KeyError):
+                if instructions_count == 0:
+                    # nothing to run, the interpreter would fail here as well
+                    raise
+                lines.append("return %d" % instruction_pointer)
+                break
+
+            opcode = instruction.opcode
+            if opcode == self.OPCODE_SAVE_INPUT and instructions_count > 0:
+                lines.append("return %d" % instruction_pointer)
+                break
+
+            params = [
+                "m[%d]" % operands[i]
+                if instruction.modes[i] == self.MODE_POSITION
+                else "%d" % operands[i]
+                for i in range(len(instruction.modes))]
+            next_address = instruction_pointer + instruction.operands_count + 1
+            instructions_count += 1
+            instruction_pointer = next_address
+
+            if opcode == self.OPCODE_ADD:
+                lines += self._store(
+                    operands[2], "%s + %s" % tuple(params), next_address,
+                    instructions_count)
+            elif opcode == self.OPCODE_MULTIPLY:
+                lines += self._store(
+                    operands[2], "%s * %s" % tuple(params), next_address,
+                    instructions_count)
+            elif opcode == self.OPCODE_LESS_THAN:
+                lines += self._store(
+                    operands[2], "1 if %s < %s else 0" % tuple(params),
+                    next_address, instructions_count)
+            elif opcode == self.OPCODE_EQUALS:
+                lines += self._store(
+                    operands[2], "1 if %s == %s else 0" % tuple(params),
+                    next_address, instructions_count)
+            elif opcode == self.OPCODE_SAVE_INPUT:
+                reads_input = True
+                lines += self._store(operands[0], "read()", next_address,
+                                     instructions_count)
+            elif opcode == self.OPCODE_WRITE_OUTPUT:
+                writes_output = True
+                lines.append("write(%s)" % params[0])
+                lines.append("return %d" % next_address)
+                break
+            elif opcode == self.OPCODE_JUMP_IF_TRUE:
+                lines.append("if %s != 0:" % params[0])
+                lines.append(self.INDENT + "return %s" % params[1])
+                lines.append("return %d" % next_address)
+                break
+            elif opcode == self.OPCODE_JUMP_IF_FALSE:
+                lines.append("if %s == 0:" % params[0])
+                lines.append(self.INDENT + "return %s" % params[1])
+                lines.append("return %d" % next_address)
+                break
+            elif opcode == self.OPCODE_EXIT:
+                lines.append("halt()")
+                lines.append("return %d" % next_address)
+                break
+
+        source = "def %s():\n%s\n" % (
+            self.FUNCTION_NAME,
+            '\n'.join([self.INDENT + line for line in lines]))
+        return Translation(
+            _compile_source(source),
+            instruction_pointer,
+            instructions_count,
+            reads_input,
+            writes_output)
+
+################################################################################
+
+    def _store(self, address: int, expression: str, next_address: int,
+               ran_count: int) -> List[str]:
+        """
+        Generates the source storing the expression on the given address. If
+        the value does not fit in the memory (array memory holds 64-bit
+        integers only), the overflow function stores it instead. If the
+        address belongs to a compiled block, the block is dropped and the
+        current block returns right away, so the modified code is translated
+        again before it runs; it then tells the caller how many of its
+        instructions ran (see ran_count).
+
+        :param address: output address
+        :param expression: source of the stored value
+        :param next_address: address of the next instruction
+        :param ran_count: number of instructions of the block run after the
+        store
+        :return: generated source lines
+        """
+
+        return [
+            "value = %s" % expression,
+            "try:",
+            self.INDENT + "m[%d] = value" % address,
+            "except OverflowError:",
+            self.INDENT + "overflow(%d, value)" % address,
+            "if %d in owners:" % address,
+            self.INDENT + "invalidate(%d)" % address,
+            self.INDENT + "ran[0] = %d" % ran_count,
+            self.INDENT + "return %d" % next_address]
+
+################################################################################
@@ -1,8 +1,50 @@
 __author__ = "Tofu Gang"
 __email__ = "tofugangsw@gmail.com"
 
-from typing import List, Tuple
+from typing import Dict, Generator, List, Tuple, Callable, NamedTuple, \
+    Optional, Union
+from types import GeneratorType
+from sys import maxsize
 from threading import Thread, Condition
+from time import perf_counter
+from intcode_computer.analyzer import OptimizationReport, optimize_program
+from intcode_computer.channel import Channel, ChannelEmpty, ChannelFull
+from intcode_computer.compiler import BlockCompiler
+from intcode_computer.fusion import Fuser, FusionReport
+from intcode_computer.profiler import Profiler
+from intcode_computer.tracer import Tracer
+from intcode_computer.memory import PagedMemory, get_program_image, \
+    copy_program_image, create_array_memory
+from intcode_computer.symbolic import SymbolicExecutor, SymbolicResult
+
+################################################################################
+
+class Instruction(NamedTuple):
+    """
+    Decoded instruction heading. The opcode, the modes of the input params and
+    the handler depend only on the heading cell, so the record stays valid
+    until something writes into that cell.
+    """
+
+    opcode: int
+    modes: str
+    operands_count: int
+    handler: Callable[[], None]
+
+################################################################################
+
+class Snapshot(NamedTuple):
+    """
+    Captured state of an intcode computer, it can be restored in any number of
+    computers.
+    """
+
+    program: Tuple[int]
+    memory: Union[Tuple[int], PagedMemory]
+    instruction_pointer: int
+    input_values: Tuple[int]
+    output_values: Tuple[int]
+    exit_flag: bool
 
 ################################################################################
 
@@ -24,13 +66,56 @@ class IntcodeComputer(Thread):
     MODE_POSITION = '0'
     MODE_IMMEDIATE = '1'
 
+    ENGINE_INTERPRETER = "interpreter"
+    ENGINE_COMPILER = "compiler"
+    ENGINE_FUSED = "fused"
+
+    MEMORY_LIST = "list"
+    MEMORY_PAGED = "paged"
+    MEMORY_ARRAY = "array"
+
+    STATUS_HALTED = "halted"
+    STATUS_OUTPUT = "output"
+    STATUS_WAITING_INPUT = "waiting_input"
+    STATUS_WAITING_OUTPUT = "waiting_output"
+    STATUS_STOPPED = "stopped"
+    STATUS_BUDGET_EXHAUSTED = "budget_exhausted"
+    STATUS_DEADLINE_EXCEEDED = "deadline_exceeded"
+
+    # instructions run between two deadline checks
+    DEADLINE_CHECK_INTERVAL = 4096
+    # seconds a thread waits on its channel before it checks for a stop or the
+    # deadline
+    WAIT_SLICE = 0.05
+
+    # opcodes that may have to wait for their channel
+    IO_OPCODES = frozenset([OPCODE_SAVE_INPUT, OPCODE_WRITE_OUTPUT])
+
 ################################################################################
 
-    def __init__(self, output_condition=None):
+    def __init__(self, output_condition=None, engine=ENGINE_INTERPRETER,
+                 memory=MEMORY_LIST):
         """
         Creates the intcode computer instance with undefined memory, instruction
         pointer, input/output memories and jump/exit flag. Maps the correct
         methods to given opcodes.
+
+        :param output_condition: condition notified on every output value, the
+        values stay in the output channel (see set_output_sink for streaming
+        them instead)
+        :param engine: ENGINE_INTERPRETER runs the program instruction by
+        instruction, ENGINE_COMPILER translates its basic blocks to Python
+        functions once the execution reaches them the second time in a run (it
+        pays off on programs running loops, short programs run as fast
+        interpreted), ENGINE_FUSED interprets the program but dispatches
+        runs of arithmetic, comparison and jump instructions as single
+        superinstructions
+        :param memory: MEMORY_LIST keeps the memory in a list, MEMORY_PAGED
+        splits it in pages allocated on the first write (so the program can use
+        addresses behind its end) and shared copy-on-write with snapshots and
+        forks,
+        MEMORY_ARRAY keeps it in an array of 64-bit integers until a value does
+        not fit
         """
 
         super().__init__()
@@ -83,14 +168,41 @@ class IntcodeComputer(Thread):
             }
         }
 
+        self._program = None
         self._memory = None
-        self._input_values = None
-        self._output_values = None
+        self._decoded = None
+        # heading -> decoded instruction, valid for any program, so it stays
+        # warm when the computer loads another one
+        self._headings = {}  # type: Dict[int, Instruction]
+        self._compiler = None
+        self._fuser = None
+        self._engine = engine
+        self._memory_type = memory
+        self._input_channel = None
+        self._output_channel = None
         self._instruction_pointer = None
         self._exit_flag = None
         self._auto_jump_flag = None
         self._output_condition = output_condition
-        self._condition = Condition()
+        # function taking every output value instead of the output channel
+        self._output_sink = None  # type: Optional[Callable[[int], None]]
+        if output_condition is not None:
+            self._output_sink = self._write_and_notify
+        # number of output values written, also when the channel is read
+        self._outputs_count = 0
+        self._stop_flag = False
+        # the program runs in one of the engines
+        self._running = False
+        # instructions run since the program was loaded, the count the budget
+        # ends on and the perf_counter time the deadline passes, None for none
+        self._steps_count = 0
+        self._steps_limit = None  # type: Optional[int]
+        self._deadline = None  # type: Optional[float]
+        # the thread waits on a channel, number of such waits
+        self._waiting = False
+        self._waits_count = 0
+        self._profiler = None
+        self._tracer = None
 
 ################################################################################
 
@@ -101,44 +213,829 @@ class IntcodeComputer(Thread):
         :param program: tuple of integers
         """
 
-        self._memory = list(program)
+        self._set_memory(program, program)
         self._instruction_pointer = 0
         self._exit_flag = False
         self._auto_jump_flag = True
-        self._input_values = []
-        self._output_values = []
+        self._reset_limits()
+        self._input_channel = self._create_channel()
+        self._output_channel = self._create_channel()
+
+################################################################################
+
+    def snapshot(self) -> Snapshot:
+        """
+        Captures the memory, the instruction pointer and the input/output
+        values of the computer. The program can then run on and the snapshot can
+        be restored later, also in other computers. Paged memory is not copied,
+        its pages are shared copy-on-write.
+
+        :return: snapshot of the computer state
+        """
+
+        if isinstance(self._memory, PagedMemory):
+            memory = self._memory.snapshot()
+        else:
+            memory = tuple(self._memory)
+        return Snapshot(
+            self._program,
+            memory,
+            self._instruction_pointer,
+            tuple(self._input_channel),
+            tuple(self._output_channel),
+            self._exit_flag)
+
+################################################################################
+
+    def restore(self, snapshot: Snapshot) -> None:
+        """
+        Restores the captured state. The program then continues where it was
+        when the snapshot was taken.
+
+        :param snapshot: snapshot of a computer state
+        """
+
+        self._set_memory(snapshot.program, snapshot.memory)
+        self._instruction_pointer = snapshot.instruction_pointer
+        self._exit_flag = snapshot.exit_flag
+        self._auto_jump_flag = True
+        self._reset_limits()
+        self._input_channel = self._create_channel(snapshot.input_values)
+        self._output_channel = self._create_channel(snapshot.output_values)
+
+################################################################################
+
+    def fork(self) -> "IntcodeComputer":
+        """
+        Creates a new computer with the same settings and state as this one.
+        Both computers can then run independently.
+
+        :return: new intcode computer
+        """
+
+        computer = type(self)(
+            self._output_condition, self._engine, self._memory_type)
+        computer.restore(self.snapshot())
+        return computer
 
 ################################################################################
 
     def load_input(self, input_value: int) -> None:
         """
         Loads an input value and saves it for later to be used by the program.
+        Waits for space if the input channel is bounded and full.
 
         :param input_value: input value
         """
 
-        with self._condition:
-            self._input_values.append(input_value)
-            self._condition.notify()
+        self._input_channel.put(input_value)
+
+################################################################################
+
+    def _create_channel(self, values: Tuple[int] = ()) -> Channel:
+        """
+        Creates the unbounded channel of a loaded program or a restored
+        snapshot.
+
+        :param values: initial values, the oldest first
+        :return: new channel
+        """
+
+        return Channel(values)
+
+################################################################################
+
+    def get_input_channel(self) -> Channel:
+        """
+        :return: channel the program reads its input values from
+        """
+
+        return self._input_channel
+
+################################################################################
+
+    def set_input_channel(self, channel: Channel) -> None:
+        """
+        Makes the program read its input values from the given channel, e.g.
+        the output channel of another computer. Loading a program or restoring
+        a snapshot creates a new unbounded channel, so connect the channels
+        after that.
+
+        :param channel: input channel
+        """
+
+        self._input_channel = channel
+
+################################################################################
+
+    def get_output_channel(self) -> Channel:
+        """
+        :return: channel the program writes its output values to
+        """
+
+        return self._output_channel
+
+################################################################################
+
+    def set_output_channel(self, channel: Channel) -> None:
+        """
+        Makes the program write its output values to the given channel, e.g.
+        a bounded one, so a long running program does not keep all its output
+        values, or the input channel of another computer. Loading a program or
+        restoring a snapshot creates a new unbounded channel, so connect the
+        channels after that.
+
+        :param channel: output channel
+        """
+
+        self._output_channel = channel
+
+################################################################################
+
+    def set_output_sink(self, sink: Union[
+            Callable[[int], None], Generator[None, int, None], Channel, None]) \
+            -> None:
+        """
+        Streams the output values to the sink as they are written, instead of
+        keeping them in the output channel. The sink is a function taking the
+        value, a generator receiving the values by send (it is started here;
+        when it returns, the program stops, see stop) or a channel (the same
+        as set_output_channel). The sink may call stop to end the run early,
+        e.g. once it got the value it waited for. Forks do not share the sink.
+
+        :param sink: function, generator or channel, None to keep the values in
+        the output channel again (notifying the output condition, if any)
+        """
+
+        if sink is None or isinstance(sink, Channel):
+            if sink is not None:
+                self.set_output_channel(sink)
+            self._output_sink = None
+            if self._output_condition is not None:
+                self._output_sink = self._write_and_notify
+        elif isinstance(sink, GeneratorType):
+            next(sink)
+
+            def send(value: int) -> None:
+                try:
+                    sink.send(value)
+                except StopIteration:
+                    self.stop()
+
+            self._output_sink = send
+        else:
+            self._output_sink = sink
+
+################################################################################
+
+    def stop(self) -> None:
+        """
+        Stops the program after the current instruction (meant to be called by
+        the output sink, or by another thread); the run then returns
+        STATUS_STOPPED. Running the program again resumes it. Called between
+        runs, it stops the next run before its first instruction.
+        """
+
+        self._stop_flag = True
+        if self._running:
+            # the engines stop on the exit flag, set only during a run so an
+            # idle program is not reported halted
+            self._exit_flag = True
+
+################################################################################
+
+    def set_budget(self, instructions: Optional[int]) -> None:
+        """
+        Lets the program run at most the given number of instructions more;
+        the run then returns STATUS_BUDGET_EXHAUSTED before the instruction
+        over the budget. The compiled and fused engines run whole blocks, so
+        they may stop a few instructions earlier (the count of the instructions
+        run is exact in every engine). Set a new budget to resume.
+        Loading a program or restoring a snapshot clears the budget.
+
+        :param instructions: number of instructions, None for no limit
+        """
+
+        self._steps_limit = None if instructions is None \
+            else self._steps_count + instructions
+
+################################################################################
+
+    def set_deadline(self, seconds: Optional[float]) -> None:
+        """
+        Lets the program run for at most the given wall time from now; the run
+        then returns STATUS_DEADLINE_EXCEEDED, also if its thread waits for an
+        input value or for output channel space. The time is checked every
+        DEADLINE_CHECK_INTERVAL instructions. Set a new deadline to resume.
+        Loading a program or restoring a snapshot clears the deadline.
+
+        :param seconds: wall time, None for no limit
+        """
+
+        self._deadline = None if seconds is None else perf_counter() + seconds
+
+################################################################################
+
+    def get_steps_count(self) -> int:
+        """
+        :return: number of instructions run since the program was loaded (or
+        the snapshot restored)
+        """
+
+        return self._steps_count
+
+################################################################################
+
+    def is_waiting(self) -> bool:
+        """
+        :return: True while the thread of the computer waits for an input value
+        or for output channel space
+        """
+
+        return self._waiting
+
+################################################################################
+
+    def get_waits_count(self) -> int:
+        """
+        :return: number of times the thread of the computer waited for an input
+        value or for output channel space
+        """
+
+        return self._waits_count
 
 ################################################################################
 
     def run(self) -> None:
         """
-        Runs the program loaded in the computer.
+        Runs the program loaded in the computer. Meant to be run in its own
+        thread (started by start()), it waits for input values loaded from
+        other threads.
+        """
+
+        self._execute(False, True)
+
+################################################################################
+
+    def run_sync(self) -> str:
+        """
+        Runs the program in the calling thread until it halts (or is stopped,
+        or runs out of its budget or time). All the input values the program
+        reads must be loaded beforehand and its output channel must have space
+        for all the output values.
+
+        :return: STATUS_HALTED, STATUS_STOPPED, STATUS_BUDGET_EXHAUSTED or
+        STATUS_DEADLINE_EXCEEDED
+        """
+
+        status = self._execute(False, False)
+        if status == self.STATUS_WAITING_INPUT:
+            raise RuntimeError(
+                "program waits for an input value at address %d"
+                % self._instruction_pointer)
+        elif status == self.STATUS_WAITING_OUTPUT:
+            raise RuntimeError(
+                "program waits for output channel space at address %d"
+                % self._instruction_pointer)
+        return status
+
+################################################################################
+
+    def run_until_output(self) -> str:
+        """
+        Runs the program in the calling thread until it writes an output value,
+        needs an input value that is not loaded yet (or output channel space)
+        or halts. Calling it again resumes the program.
+
+        :return: STATUS_OUTPUT, STATUS_WAITING_INPUT, STATUS_WAITING_OUTPUT,
+        STATUS_STOPPED, STATUS_BUDGET_EXHAUSTED, STATUS_DEADLINE_EXCEEDED or
+        STATUS_HALTED
+        """
+
+        return self._execute(True, False)
+
+################################################################################
+
+    def run_until_input(self) -> str:
+        """
+        Runs the program in the calling thread until it needs an input value
+        that is not loaded yet (or output channel space) or halts. Load the
+        input (or read the output channel) and call it again to resume the
+        program.
+
+        :return: STATUS_WAITING_INPUT, STATUS_WAITING_OUTPUT, STATUS_STOPPED,
+        STATUS_BUDGET_EXHAUSTED, STATUS_DEADLINE_EXCEEDED or STATUS_HALTED
         """
 
+        return self._execute(False, False)
+
+################################################################################
+
+    def is_halted(self) -> bool:
+        """
+        :return: True if the program reached the exit instruction
+        """
+
+        return self._exit_flag
+
+################################################################################
+
+    def _reset_limits(self) -> None:
+        """
+        Clears the instruction count, the budget, the deadline and a stop
+        requested after the last run of a loaded program or a restored
+        snapshot.
+        """
+
+        self._steps_count = 0
+        self._steps_limit = None
+        self._deadline = None
+        self._stop_flag = False
+
+################################################################################
+
+    def _get_checkpoint(self, steps: int) -> int:
+        """
+        :param steps: number of instructions run so far
+        :return: instruction count the engine checks the limits at
+        """
+
+        checkpoint = maxsize
+        if self._deadline is not None:
+            checkpoint = steps + self.DEADLINE_CHECK_INTERVAL
+        if self._steps_limit is not None:
+            checkpoint = min(checkpoint, self._steps_limit)
+        return checkpoint
+
+################################################################################
+
+    def _check_limits(self, steps: int, count: int) -> Optional[str]:
+        """
+        :param steps: number of instructions run so far
+        :param count: number of instructions about to run
+        :return: STATUS_BUDGET_EXHAUSTED if they do not fit in the budget,
+        STATUS_DEADLINE_EXCEEDED if the deadline passed, otherwise None
+        """
+
+        if self._steps_limit is not None and steps + count > self._steps_limit:
+            return self.STATUS_BUDGET_EXHAUSTED
+        if self._deadline is not None and perf_counter() >= self._deadline:
+            return self.STATUS_DEADLINE_EXCEEDED
+        return None
+
+################################################################################
+
+    def _execute(self, stop_on_output: bool, wait_for_io: bool) -> str:
+        """
+        Runs the program with the engine chosen for this computer.
+
+        :param stop_on_output: return right after an output value is written
+        :param wait_for_io: wait for an input value loaded (or for output
+        channel space made) by another thread instead of returning
+        STATUS_WAITING_INPUT (or STATUS_WAITING_OUTPUT)
+        :return: execution status
+        """
+
+        self._running = True
+        if self._stop_flag:
+            if self._exit_flag:
+                # the program halted, a stop requested since comes too late
+                self._stop_flag = False
+            else:
+                # a stop requested between the runs
+                self._exit_flag = True
+        try:
+            if self._tracer is not None:
+                status = self._run_traced(stop_on_output, wait_for_io)
+            elif self._profiler is not None:
+                status = self._run_profiled(stop_on_output, wait_for_io)
+            elif self._engine == self.ENGINE_COMPILER:
+                status = self._run_compiled(stop_on_output, wait_for_io)
+            elif self._engine == self.ENGINE_FUSED:
+                status = self._run_fused(stop_on_output, wait_for_io)
+            else:
+                status = self._run_interpreted(stop_on_output, wait_for_io)
+        except (ChannelEmpty, ChannelFull):
+            # a channel wait gave up, the instruction did not run
+            if self._stop_flag:
+                status = self.STATUS_STOPPED
+            else:
+                status = self.STATUS_DEADLINE_EXCEEDED
+        finally:
+            self._running = False
+
+        if self._stop_flag:
+            # the engines stop on the exit flag, the program did not halt
+            self._stop_flag = False
+            self._exit_flag = False
+            return self.STATUS_STOPPED
+        return status
+
+################################################################################
+
+    def _run_interpreted(self, stop_on_output: bool,
+                         wait_for_io: bool) -> str:
+        """
+        Runs the program instruction by instruction.
+
+        :param stop_on_output: return right after an output value is written
+        :param wait_for_io: wait for missing input values and for space in a
+        full output channel
+        :return: execution status
+        """
+
+        decoded = self._decoded
+        steps = self._steps_count
+        checkpoint = self._get_checkpoint(steps)
+        try:
+            while not self._exit_flag:
+                if steps >= checkpoint:
+                    status = self._check_limits(steps, 1)
+                    if status is not None:
+                        return status
+                    checkpoint = self._get_checkpoint(steps)
+                instruction = decoded.get(self._instruction_pointer) \
+                              or self._decode(self._instruction_pointer)
+                if instruction.opcode in self.IO_OPCODES and not wait_for_io:
+                    status = self._get_channel_status(instruction.opcode)
+                    if status is not None:
+                        return status
+                instruction.handler()
+                steps += 1
+                if self._auto_jump_flag:
+                    self._instruction_pointer += instruction.operands_count + 1
+                else:
+                    self._auto_jump_flag = True
+                if stop_on_output \
+                        and instruction.opcode == self.OPCODE_WRITE_OUTPUT:
+                    return self.STATUS_OUTPUT
+            return self.STATUS_HALTED
+        finally:
+            self._steps_count = steps
+
+################################################################################
+
+    def _run_compiled(self, stop_on_output: bool, wait_for_io: bool) -> str:
+        """
+        Runs the program block by block, every block is translated to a Python
+        function the first time the execution reaches it. The code the program
+        keeps modifying is interpreted instead.
+
+        :param stop_on_output: return right after an output value is written
+        :param wait_for_io: wait for missing input values and for space in a
+        full output channel
+        :return: execution status
+        """
+
+        compiler = self._compiler
+        blocks = compiler.blocks
+        ran_count = compiler.ran_count
+        steps = self._steps_count
+        checkpoint = self._get_checkpoint(steps)
+        try:
+            while not self._exit_flag:
+                block = blocks.get(self._instruction_pointer) \
+                        or compiler.get(self._instruction_pointer)
+                if block is None:
+                    # the program keeps modifying the code here, recompiling
+                    # it would cost more than interpreting it
+                    if steps >= checkpoint:
+                        status = self._check_limits(steps, 1)
+                        if status is not None:
+                            return status
+                        checkpoint = self._get_checkpoint(steps)
+                    instruction = self._decode(self._instruction_pointer)
+                    if instruction.opcode in self.IO_OPCODES \
+                            and not wait_for_io:
+                        status = self._get_channel_status(instruction.opcode)
+                        if status is not None:
+                            return status
+                    instruction.handler()
+                    steps += 1
+                    if self._auto_jump_flag:
+                        self._instruction_pointer \
+                            += instruction.operands_count + 1
+                    else:
+                        self._auto_jump_flag = True
+                    if stop_on_output \
+                            and instruction.opcode == self.OPCODE_WRITE_OUTPUT:
+                        return self.STATUS_OUTPUT
+                    continue
+                if steps + block.instructions_count > checkpoint:
+                    status = self._check_limits(
+                        steps, block.instructions_count)
+                    if status is not None:
+                        return status
+                    checkpoint = self._get_checkpoint(steps)
+                # input instructions always start a block, output instructions
+                # always end one, so the block either runs whole or not at all
+                if (block.reads_input or block.writes_output) \
+                        and not wait_for_io:
+                    status = None
+                    if block.reads_input:
+                        status = self._get_channel_status(
+                            self.OPCODE_SAVE_INPUT)
+                    if status is None and block.writes_output:
+                        status = self._get_channel_status(
+                            self.OPCODE_WRITE_OUTPUT)
+                    if status is not None:
+                        return status
+                outputs_count = self._outputs_count
+                self._instruction_pointer = block.function()
+                # a write into the block itself ends it early
+                if ran_count[0]:
+                    steps += ran_count[0]
+                    ran_count[0] = 0
+                else:
+                    steps += block.instructions_count
+                if stop_on_output and self._outputs_count != outputs_count:
+                    return self.STATUS_OUTPUT
+            return self.STATUS_HALTED
+        finally:
+            self._steps_count = steps
+
+################################################################################
+
+    def _run_fused(self, stop_on_output: bool, wait_for_io: bool) -> str:
+        """
+        Runs the program instruction by instruction, except for the instruction
+        sequences fused in superinstructions, which run at once.
+
+        :param stop_on_output: return right after an output value is written
+        :param wait_for_io: wait for missing input values and for space in a
+        full output channel
+        :return: execution status
+        """
+
+        fuser = self._fuser
+        superinstructions = fuser.superinstructions
+        ran_count = fuser.ran_count
+        decoded = self._decoded
+        steps = self._steps_count
+        checkpoint = self._get_checkpoint(steps)
+        try:
+            while not self._exit_flag:
+                instruction_pointer = self._instruction_pointer
+                superinstruction = superinstructions.get(instruction_pointer)
+                if superinstruction is None:
+                    superinstruction = fuser.get(instruction_pointer)
+                if superinstruction:
+                    count = superinstruction.instructions_count
+                    if steps + count > checkpoint:
+                        status = self._check_limits(steps, count)
+                        if status is not None:
+                            return status
+                        checkpoint = self._get_checkpoint(steps)
+                    superinstruction.fires[0] += 1
+                    self._instruction_pointer \
+                        = superinstruction.handler(self._memory)
+                    # a write into its own cells ends it early
+                    if ran_count[0]:
+                        steps += ran_count[0]
+                        ran_count[0] = 0
+                    else:
+                        steps += count
+                    continue
+
+                if steps >= checkpoint:
+                    status = self._check_limits(steps, 1)
+                    if status is not None:
+                        return status
+                    checkpoint = self._get_checkpoint(steps)
+                instruction = decoded.get(instruction_pointer) \
+                              or self._decode(instruction_pointer)
+                if instruction.opcode in self.IO_OPCODES and not wait_for_io:
+                    status = self._get_channel_status(instruction.opcode)
+                    if status is not None:
+                        return status
+                instruction.handler()
+                steps += 1
+                if self._auto_jump_flag:
+                    self._instruction_pointer += instruction.operands_count + 1
+                else:
+                    self._auto_jump_flag = True
+                if stop_on_output \
+                        and instruction.opcode == self.OPCODE_WRITE_OUTPUT:
+                    return self.STATUS_OUTPUT
+            return self.STATUS_HALTED
+        finally:
+            self._steps_count = steps
+
+################################################################################
+
+    def _run_profiled(self, stop_on_output: bool,
+                      wait_for_io: bool) -> str:
+        """
+        Runs the program instruction by instruction (whatever the engine) and
+        records every instruction in the profiler.
+
+        :param stop_on_output: return right after an output value is written
+        :param wait_for_io: wait for missing input values and for space in a
+        full output channel
+        :return: execution status
+        """
+
+        profiler = self._profiler
+        decoded = self._decoded
         while not self._exit_flag:
-            opcode = int(str(self._memory[self._instruction_pointer])[-2:])
-            instruction = self._instructions[opcode]
-            instruction[self.KEY_RUN_FUNCTION]()
+            status = self._check_limits(self._steps_count, 1)
+            if status is not None:
+                return status
+            instruction_pointer = self._instruction_pointer
+            instruction = decoded.get(instruction_pointer) \
+                          or self._decode(instruction_pointer)
+            opcode = instruction.opcode
+            if opcode in self.IO_OPCODES and not wait_for_io:
+                status = self._get_channel_status(opcode)
+                if status is not None:
+                    return status
+            if opcode == self.OPCODE_SAVE_INPUT:
+                waited = profiler.get_input_wait().time
+                start = perf_counter()
+                instruction.handler()
+                # the wait is recorded on its own
+                time = perf_counter() - start \
+                       - (profiler.get_input_wait().time - waited)
+            else:
+                start = perf_counter()
+                instruction.handler()
+                time = perf_counter() - start
+            self._steps_count += 1
+            profiler.record(
+                instruction_pointer, opcode, instruction.modes, time)
+            if self._auto_jump_flag:
+                self._instruction_pointer += instruction.operands_count + 1
+            else:
+                self._auto_jump_flag = True
+            if stop_on_output and opcode == self.OPCODE_WRITE_OUTPUT:
+                return self.STATUS_OUTPUT
+        return self.STATUS_HALTED
+
+################################################################################
+
+    def _run_traced(self, stop_on_output: bool, wait_for_io: bool) -> str:
+        """
+        Runs the program instruction by instruction (whatever the engine) and
+        records every instruction in the tracer.
+
+        :param stop_on_output: return right after an output value is written
+        :param wait_for_io: wait for missing input values and for space in a
+        full output channel
+        :return: execution status
+        """
+
+        tracer = self._tracer
+        decoded = self._decoded
+        while not self._exit_flag:
+            status = self._check_limits(self._steps_count, 1)
+            if status is not None:
+                return status
+            instruction_pointer = self._instruction_pointer
+            try:
+                instruction = decoded.get(instruction_pointer) \
+                              or self._decode(instruction_pointer)
+                opcode = instruction.opcode
+                if opcode in self.IO_OPCODES and not wait_for_io:
+                    status = self._get_channel_status(opcode)
+                    if status is not None:
+                        return status
+                # read before the instruction runs, it may overwrite itself
+                heading = self._memory[instruction_pointer]
+                operands = [self._memory[address] for address in range(
+                    instruction_pointer + 1,
+                    instruction_pointer + instruction.operands_count + 1)]
+                instruction.handler()
+            except (ChannelEmpty, ChannelFull):
+                # a channel wait gave up, not an error of the program
+                raise
+            except Exception as error:
+                tracer.on_error(error, instruction_pointer)
+                raise
+            self._steps_count += 1
+            if self._instructions[opcode][self.KEY_OUTPUT_PARAMS_COUNT]:
+                write = (operands[-1], self._memory[operands[-1]])
+            else:
+                write = None
+            tracer.record(instruction_pointer, heading, operands, write)
             if self._auto_jump_flag:
-                jump = instruction[self.KEY_INPUT_PARAMS_COUNT] \
-                       + instruction[self.KEY_OUTPUT_PARAMS_COUNT] \
-                       + 1
-                self._instruction_pointer += jump
+                self._instruction_pointer += instruction.operands_count + 1
             else:
                 self._auto_jump_flag = True
+            if stop_on_output and opcode == self.OPCODE_WRITE_OUTPUT:
+                return self.STATUS_OUTPUT
+        tracer.on_halt()
+        return self.STATUS_HALTED
+
+################################################################################
+
+    def analyze(self, symbols: Dict[int, str]) -> SymbolicResult:
+        """
+        Runs the program once from the current state of the computer (its
+        memory, instruction pointer and pending input values, i.e. from the
+        start of a freshly loaded program) with symbols in the given cells
+        instead of their data and returns every memory cell and output value
+        as a polynomial of the symbols (see intcode_computer.symbolic.solve).
+        Raises SymbolicValueError if the program branches on a symbolic value
+        or cannot go on (an address out of the memory, a missing input
+        value); use concrete runs then. The state of the computer does not
+        change.
+
+        :param symbols: address -> name of the symbol placed in the cell
+        :return: symbolic memory and output values
+        """
+
+        return SymbolicExecutor(
+            self._memory, symbols, self._input_channel,
+            self._instruction_pointer).run()
+
+################################################################################
+
+    def optimize(self) -> OptimizationReport:
+        """
+        Analyzes the program from the current instruction pointer and folds its
+        arithmetic chains (see intcode_computer.analyzer.optimize_program). The
+        program then reads the same input and writes the same output in fewer
+        instructions. Useful before taking a snapshot restored many times.
+
+        :return: optimization report
+        """
+
+        optimized, report = optimize_program(
+            list(self._memory), self._instruction_pointer)
+        if report.folded_chains:
+            self._set_memory(self._program, optimized)
+        return report
+
+################################################################################
+
+    def get_fusion_report(self) -> FusionReport:
+        """
+        Returns which superinstructions ran since the program was loaded (or a
+        snapshot restored) and how many dispatches they saved. Only the
+        ENGINE_FUSED engine runs superinstructions.
+
+        :return: fusion report
+        """
+
+        if self._fuser is None:
+            return FusionReport({}, 0)
+        return self._fuser.get_report()
+
+################################################################################
+
+    def enable_profiling(self, profiler: Profiler = None) -> Profiler:
+        """
+        Makes the following runs record every instruction in the profiler. They
+        run instruction by instruction whatever the engine, which is slower;
+        without a profiler, the runs are not instrumented at all.
+
+        :param profiler: profiler to record in, a new one by default
+        :return: the profiler
+        """
+
+        self._profiler = profiler if profiler is not None else Profiler()
+        return self._profiler
+
+################################################################################
+
+    def disable_profiling(self) -> Profiler:
+        """
+        Makes the following runs use the engine of the computer again.
+
+        :return: the profiler that was recording, None if none
+        """
+
+        profiler = self._profiler
+        self._profiler = None
+        return profiler
+
+################################################################################
+
+    def enable_tracing(self, tracer: Tracer = None) -> Tracer:
+        """
+        Makes the following runs record every instruction in the tracer. Like
+        profiled runs, they run instruction by instruction whatever the engine;
+        tracing takes precedence over profiling.
+
+        :param tracer: tracer to record in, a new one by default
+        :return: the tracer
+        """
+
+        self._tracer = tracer if tracer is not None else Tracer()
+        return self._tracer
+
+################################################################################
+
+    def disable_tracing(self) -> Tracer:
+        """
+        Makes the following runs use the engine of the computer again.
+
+        :return: the tracer that was recording, None if none
+        """
+
+        tracer = self._tracer
+        self._tracer = None
+        return tracer
 
 ################################################################################
 
@@ -162,18 +1059,170 @@ class IntcodeComputer(Thread):
         :param data: desired data
         """
 
-        self._memory[address] = data
+        try:
+            self._memory[address] = data
+        except OverflowError:
+            self._overflow(address, data)
+        self._invalidate(address)
 
 ################################################################################
 
     def get_output(self) -> List[int]:
         """
-        Returns all output values that were written by the program.
+        Returns the output values written by the program that are still in its
+        output channel; all of them unless someone reads the channel.
+
+        :return: list of output values
+        """
+
+        return self._output_channel.get_values()
+
+################################################################################
+
+    def _set_memory(self, program: Tuple[int],
+                    cells: Union[Tuple[int], PagedMemory]) -> None:
+        """
+        Creates the memory of the chosen type holding the given cells and drops
+        everything decoded or compiled from the previous memory.
+
+        :param program: loaded program the cells come from
+        :param cells: memory content
+        """
+
+        self._program = program
+        if self._memory_type == self.MEMORY_PAGED:
+            if isinstance(cells, PagedMemory):
+                self._memory = cells.snapshot()
+            else:
+                self._memory = PagedMemory(cells)
+        elif self._memory_type == self.MEMORY_ARRAY:
+            image = get_program_image(program) if cells is program else None
+            if image is not None:
+                self._memory = copy_program_image(image)
+            else:
+                self._memory = create_array_memory(cells)
+        else:
+            self._memory = list(cells)
+        self._decoded = {}
+        if self._engine == self.ENGINE_COMPILER:
+            if cells is program and self._compiler is not None \
+                    and self._compiler.get_program() is program:
+                # the blocks compiled by the previous run of the program
+                # are bound to this computer already
+                self._compiler.reset(self._memory)
+                return
+            self._compiler = BlockCompiler(
+                program, self._memory, self._decode_heading, self._read_input,
+                self._emit_output, self._exit, self._invalidate,
+                self._overflow)
+        elif self._engine == self.ENGINE_FUSED:
+            self._fuser = Fuser(
+                self._memory, self._decode_heading, self._invalidate,
+                self._overflow)
+
+################################################################################
 
-        :return: list of all output values
+    def _decode(self, address: int) -> Instruction:
         """
+        Decodes the instruction heading on the given address and caches the
+        result, so the heading is parsed only once until the cell is written.
 
-        return self._output_values
+        :param address: address of the instruction heading
+        :return: decoded instruction
+        """
+
+        decoded = self._decode_heading(address)
+        self._decoded[address] = decoded
+        return decoded
+
+################################################################################
+
+    def _decode_heading(self, address: int) -> Instruction:
+        """
+        Decodes the instruction heading on the given address without caching
+        it by the address. The compiler and the fuser decode with it: they
+        watch the cells of their own blocks only, a decoded instruction they
+        do not run could stay cached after a write.
+
+        :param address: address of the instruction heading
+        :return: decoded instruction
+        """
+
+        # instruction from the memory
+        heading_value = self._memory[address]
+        decoded = self._headings.get(heading_value)
+        if decoded is None:
+            heading = str(heading_value)
+            opcode = int(heading[-2:])
+            instruction = self._instructions[opcode]
+            params_count = instruction[self.KEY_INPUT_PARAMS_COUNT]
+            # prepend it with possible missing position modes
+            heading = self.MODE_POSITION \
+                      * (2 + params_count - len(heading)) + heading
+            # number of modes and their order is the same as number and order
+            # of input params
+            modes = ''.join(reversed(heading[:-2]))[:params_count]
+            decoded = Instruction(
+                opcode,
+                modes,
+                params_count + instruction[self.KEY_OUTPUT_PARAMS_COUNT],
+                instruction[self.KEY_RUN_FUNCTION])
+            self._headings[heading_value] = decoded
+        return decoded
+
+################################################################################
+
+    def _store(self, address: int, data: int) -> None:
+        """
+        Writes data in memory and drops everything decoded or compiled from
+        that address, so self-modifying programs stay correct.
+
+        :param address: desired address
+        :param data: desired data
+        """
+
+        try:
+            self._memory[address] = data
+        except OverflowError:
+            self._overflow(address, data)
+        self._decoded.pop(address, None)
+        if self._compiler is not None:
+            self._compiler.invalidate(address)
+        if self._fuser is not None:
+            self._fuser.invalidate(address)
+
+################################################################################
+
+    def _overflow(self, address: int, data: int) -> None:
+        """
+        Converts the array memory to a list of arbitrary precision integers when
+        a value does not fit in it and then writes the value.
+
+        :param address: desired address
+        :param data: desired data
+        """
+
+        self._memory = list(self._memory)
+        if self._compiler is not None:
+            self._compiler.set_memory(self._memory)
+        if self._fuser is not None:
+            self._fuser.set_memory(self._memory)
+        self._memory[address] = data
+
+################################################################################
+
+    def _invalidate(self, address: int) -> None:
+        """
+        Drops everything decoded or compiled from the given cell.
+
+        :param address: address of the written cell
+        """
+
+        self._decoded.pop(address, None)
+        if self._compiler is not None:
+            self._compiler.invalidate(address)
+        if self._fuser is not None:
+            self._fuser.invalidate(address)
 
 ################################################################################
 
@@ -186,22 +1235,15 @@ class IntcodeComputer(Thread):
         :return: instruction input param values
         """
 
-        # instruction from the memory
-        heading = str(self._memory[self._instruction_pointer])
-        opcode = int(heading[-2:])
-        instruction = self._instructions[opcode]
-        params_count = instruction[self.KEY_INPUT_PARAMS_COUNT]
-        # prepend it with possible missing position modes
-        heading = self.MODE_POSITION \
-                  * (2 + params_count - len(heading)) + heading
-        # number of modes and their order is the same as number and order of
-        # input params
-        modes = ''.join(reversed(heading[:-2]))
-        return tuple([self._memory[
-                          self._memory[self._instruction_pointer + i + 1]
+        memory = self._memory
+        instruction_pointer = self._instruction_pointer
+        modes = (self._decoded.get(instruction_pointer)
+                 or self._decode(instruction_pointer)).modes
+        return tuple([memory[
+                          memory[instruction_pointer + i + 1]
                           if modes[i] == self.MODE_POSITION
                           else
-                          self._instruction_pointer + i + 1]
+                          instruction_pointer + i + 1]
                       for i in range(len(modes))])
 
 ################################################################################
@@ -217,7 +1259,7 @@ class IntcodeComputer(Thread):
 
         params = self._get_instruction_params()
         output_address = self._memory[self._instruction_pointer + 3]
-        self._memory[output_address] = params[0] + params[1]
+        self._store(output_address, params[0] + params[1])
 
 ################################################################################
 
@@ -230,7 +1272,7 @@ class IntcodeComputer(Thread):
 
         params = self._get_instruction_params()
         output_address = self._memory[self._instruction_pointer + 3]
-        self._memory[output_address] = params[0] * params[1]
+        self._store(output_address, params[0] * params[1])
 
 ################################################################################
 
@@ -241,11 +1283,72 @@ class IntcodeComputer(Thread):
         """
 
         output_address = self._memory[self._instruction_pointer + 1]
-        with self._condition:
-            if len(self._input_values) == 0:
-                self._condition.wait()
-        self._memory[output_address] = self._input_values[0]
-        del self._input_values[0]
+        self._store(output_address, self._read_input())
+
+################################################################################
+
+    def _get_channel_status(self, opcode: int) -> Optional[str]:
+        """
+        Checks that the input or output instruction can run without waiting.
+
+        :param opcode: opcode of the instruction
+        :return: STATUS_WAITING_INPUT if the input channel is empty,
+        STATUS_WAITING_OUTPUT if the output channel is full, otherwise None
+        """
+
+        if opcode == self.OPCODE_SAVE_INPUT and not self._input_channel:
+            return self.STATUS_WAITING_INPUT
+        if opcode == self.OPCODE_WRITE_OUTPUT \
+                and self._output_channel.is_full():
+            return self.STATUS_WAITING_OUTPUT
+        return None
+
+################################################################################
+
+    def _read_input(self) -> int:
+        """
+        Takes the oldest loaded input value, waits for one if there is none.
+
+        :return: input value
+        """
+
+        channel = self._input_channel
+        if channel:
+            return channel.get()
+        if self._profiler is None:
+            return self._wait(channel.get)
+        start = perf_counter()
+        input_value = self._wait(channel.get)
+        self._profiler.record_input_wait(perf_counter() - start)
+        return input_value
+
+################################################################################
+
+    def _wait(self, transfer: Callable[[bool, Optional[float]], int]) -> int:
+        """
+        Reads or writes a channel that is not ready, waits in slices so a stop
+        or the deadline ends the wait. Raises ChannelEmpty or ChannelFull then,
+        the instruction does not run.
+
+        :param transfer: channel get or put taking block and timeout
+        :return: result of the transfer
+        """
+
+        self._waiting = True
+        self._waits_count += 1
+        try:
+            while True:
+                timeout = self.WAIT_SLICE
+                if self._deadline is not None:
+                    timeout = min(timeout, self._deadline - perf_counter())
+                try:
+                    return transfer(True, max(0.0, timeout))
+                except (ChannelEmpty, ChannelFull):
+                    if self._stop_flag or self._deadline is not None \
+                            and perf_counter() >= self._deadline:
+                        raise
+        finally:
+            self._waiting = False
 
 ################################################################################
 
@@ -254,14 +1357,42 @@ class IntcodeComputer(Thread):
         Opcode 4 outputs the value of its only parameter.
         """
 
-        param = self._get_instruction_params()[0]
-        self._output_values.append(param)
+        self._emit_output(self._get_instruction_params()[0])
 
-        try:
-            with self._output_condition:
-                self._output_condition.notify()
-        except AttributeError:
-            pass
+################################################################################
+
+    def _emit_output(self, output_value: int) -> None:
+        """
+        Passes the output value to the output sink, or writes it to the output
+        channel if there is none.
+
+        :param output_value: output value
+        """
+
+        if self._output_sink is None:
+            channel = self._output_channel
+            if channel.is_full():
+                self._wait(lambda block, timeout: channel.put(
+                    output_value, block, timeout))
+            else:
+                channel.put(output_value)
+        else:
+            self._output_sink(output_value)
+        self._outputs_count += 1
+
+################################################################################
+
+    def _write_and_notify(self, output_value: int) -> None:
+        """
+        Output sink of a computer with an output condition: writes the value to
+        the output channel and notifies the condition.
+
+        :param output_value: output value
+        """
+
+        self._output_channel.put(output_value)
+        with self._output_condition:
+            self._output_condition.notify()
 
 ################################################################################
 
@@ -308,9 +1439,9 @@ class IntcodeComputer(Thread):
         output_address = self._memory[self._instruction_pointer + 3]
 
         if params[0] < params[1]:
-            self._memory[output_address] = 1
+            self._store(output_address, 1)
         else:
-            self._memory[output_address] = 0
+            self._store(output_address, 0)
 
 ################################################################################
 
@@ -325,9 +1456,9 @@ class IntcodeComputer(Thread):
         output_address = self._memory[self._instruction_pointer + 3]
 
         if params[0] == params[1]:
-            self._memory[output_address] = 1
+            self._store(output_address, 1)
         else:
-            self._memory[output_address] = 0
+            self._store(output_address, 0)
 
 ################################################################################
 
@@ -338,5 +1469,7 @@ class IntcodeComputer(Thread):
         """
 
         self._exit_flag = True
+        # the program halted, a stop requested meanwhile comes too late
+        self._stop_flag = False
 
 ################################################################################
\ No newline at end of file
@@ -0,0 +1,298 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from functools import lru_cache
+from typing import Callable, Dict, List, MutableSequence, NamedTuple, \
+    Tuple, Union
+
+################################################################################
+
+class Superinstruction(NamedTuple):
+    """
+    Sequence of instructions dispatched at once. The handler takes the memory,
+    runs all the instructions and returns the address of the next instruction
+    to run.
+    """
+
+    handler: Callable[[MutableSequence[int]], int]
+    start: int
+    end: int
+    opcodes: Tuple[int, ...]
+    # one-element counter of the handler runs
+    fires: List[int]
+    instructions_count: int
+
+# superinstruction, False if none starts on the address
+Entry = Union[Superinstruction, bool]
+
+################################################################################
+
+class FusionReport(NamedTuple):
+    """
+    Superinstructions run since the program was loaded: opcode sequence ->
+    number of runs, and the number of dispatches they saved.
+    """
+
+    fires: Dict[Tuple[int, ...], int]
+    saved_dispatches_count: int
+
+################################################################################
+
+OPCODE_ADD = 1
+OPCODE_MULTIPLY = 2
+OPCODE_JUMP_IF_TRUE = 5
+OPCODE_JUMP_IF_FALSE = 6
+OPCODE_LESS_THAN = 7
+OPCODE_EQUALS = 8
+
+MODE_POSITION = '0'
+
+# opcode -> source of the value the instruction stores
+_EXPRESSIONS = {
+    OPCODE_ADD: "m[a%d] + m[b%d]",
+    OPCODE_MULTIPLY: "m[a%d] * m[b%d]",
+    OPCODE_LESS_THAN: "1 if m[a%d] < m[b%d] else 0",
+    OPCODE_EQUALS: "1 if m[a%d] == m[b%d] else 0"
+}
+
+# opcode -> condition of the jump
+_CONDITIONS = {
+    OPCODE_JUMP_IF_TRUE: "m[a%d] != 0",
+    OPCODE_JUMP_IF_FALSE: "m[a%d] == 0"
+}
+
+INDENT = "    "
+
+################################################################################
+
+@lru_cache(maxsize=256)
+def _get_factory(opcodes: Tuple[int, ...]) -> Callable:
+    """
+    Generates and compiles the handler factory of the given opcode sequence.
+    Operand addresses are factory arguments, so one compiled factory serves
+    every place of every program where the sequence occurs. Immediate params
+    are read from their own cell (their "address" is the operand cell), so the
+    handler does not depend on the modes.
+
+    :param opcodes: opcodes of the fused instructions
+    :return: function taking the operand addresses, the addresses after every
+    instruction, the owners dict, the invalidate and overflow functions and the
+    ran count list (see Fuser.ran_count) and returning the handler
+    """
+
+    names = []
+    lines = []
+    for i, opcode in enumerate(opcodes):
+        if opcode in _EXPRESSIONS:
+            names += ["a%d" % i, "b%d" % i, "t%d" % i]
+            lines += [
+                "value = %s" % (_EXPRESSIONS[opcode] % (i, i)),
+                "try:",
+                INDENT + "m[t%d] = value" % i,
+                "except OverflowError:",
+                # the memory was replaced, the handler cannot go on
+                INDENT + "overflow(t%d, value)" % i,
+                INDENT + "if t%d in owners:" % i,
+                INDENT * 2 + "invalidate(t%d)" % i,
+                INDENT + "ran[0] = %d" % (i + 1),
+                INDENT + "return n%d" % i,
+                "if t%d in owners:" % i,
+                INDENT + "invalidate(t%d)" % i,
+                INDENT + "ran[0] = %d" % (i + 1),
+                INDENT + "return n%d" % i]
+        else:
+            names += ["a%d" % i, "b%d" % i]
+            lines += [
+                "if %s:" % (_CONDITIONS[opcode] % i),
+                INDENT + "return m[b%d]" % i]
+    lines.append("return n%d" % (len(opcodes) - 1))
+    names += ["n%d" % i for i in range(len(opcodes))]
+
+    source = "def factory(%s, owners, invalidate, overflow, ran):\n" \
+             "%sdef handler(m):\n%s\n%sreturn handler\n" % (
+                 ', '.join(names),
+                 INDENT,
+                 '\n'.join([INDENT * 2 + line for line in lines]),
+                 INDENT)
+    namespace = {}
+    exec(compile(source, "<intcode superinstruction>", "exec"), namespace)
+    return namespace["factory"]
+
+################################################################################
+
+class Fuser(object):
+    """
+    Fuses runs of arithmetic and comparison instructions, optionally ended by a
+    jump (e.g. the 1001/1007/1005 counter-compare-and-branch of a loop), into
+    superinstructions with pre-resolved operand addresses. Sequences are
+    detected the first time the execution reaches them; a superinstruction is
+    dropped when a write lands in its cells, and detected again the next time.
+    """
+
+    MAX_LENGTH = 4
+
+################################################################################
+
+    def __init__(self, memory: MutableSequence[int], decode: Callable,
+                 invalidate: Callable[[int], None],
+                 overflow: Callable[[int, int], None]):
+        """
+        Creates the fuser for the given memory.
+
+        :param memory: memory of the intcode computer
+        :param decode: function decoding an instruction heading on an address
+        :param invalidate: function called when a superinstruction writes into
+        a cell that belongs to a superinstruction
+        :param overflow: function storing a value that does not fit in the
+        memory
+        """
+
+        self._memory = memory
+        self._decode = decode
+        self._invalidate = invalidate
+        self._overflow = overflow
+        # address -> superinstruction, False if none starts there
+        self.superinstructions = {}  # type: Dict[int, Entry]
+        # cell address -> start addresses of the sequences the cell belongs to
+        self.owners = {}  # type: Dict[int, List[int]]
+        # fires of the dropped superinstructions
+        self._fires = {}  # type: Dict[Tuple[int, ...], int]
+        # number of instructions run by the last superinstruction if it
+        # returned early (a write into its own cells), zero otherwise; the
+        # caller resets it
+        self.ran_count = [0]
+
+################################################################################
+
+    def get(self, address: int) -> Entry:
+        """
+        Returns the superinstruction starting on the given address, detects it
+        first if the address was not reached yet.
+
+        :param address: address of an instruction
+        :return: superinstruction, False if the instruction does not start one
+        """
+
+        superinstruction = self.superinstructions.get(address)
+        if superinstruction is None:
+            superinstruction = self._fuse(address)
+        return superinstruction
+
+################################################################################
+
+    def set_memory(self, memory: MutableSequence[int]) -> None:
+        """
+        Replaces the memory holding the same cells, e.g. when the memory is
+        converted to another type.
+
+        :param memory: new memory of the intcode computer
+        """
+
+        self._memory = memory
+
+################################################################################
+
+    def invalidate(self, address: int) -> None:
+        """
+        Drops all sequences the given cell belongs to. They are detected again
+        the next time the execution reaches them.
+
+        :param address: address of the written cell
+        """
+
+        for start in self.owners.pop(address, ()):
+            superinstruction = self.superinstructions.pop(start, None)
+            if superinstruction:
+                self._fires[superinstruction.opcodes] = self._fires.get(
+                    superinstruction.opcodes, 0) + superinstruction.fires[0]
+                for cell in range(superinstruction.start,
+                                  superinstruction.end):
+                    starts = self.owners.get(cell)
+                    if starts is not None and start in starts:
+                        starts.remove(start)
+                        if not starts:
+                            del self.owners[cell]
+
+################################################################################
+
+    def get_report(self) -> FusionReport:
+        """
+        :return: superinstructions run since the fuser was created
+        """
+
+        fires = dict(self._fires)
+        for superinstruction in self.superinstructions.values():
+            if superinstruction and superinstruction.fires[0]:
+                fires[superinstruction.opcodes] = fires.get(
+                    superinstruction.opcodes, 0) + superinstruction.fires[0]
+        return FusionReport(
+            fires,
+            sum([count * (len(opcodes) - 1)
+                 for opcodes, count in fires.items()]))
+
+################################################################################
+
+    def _fuse(self, address: int) -> Entry:
+        """
+        Detects the sequence starting on the given address and builds its
+        superinstruction.
+
+        :param address: address of the first instruction
+        :return: superinstruction, False if fewer than two instructions fuse
+        """
+
+        memory = self._memory
+        opcodes = []
+        operands = []
+        next_addresses = []
+        targets = []
+        instruction_pointer = address
+        while len(opcodes) < self.MAX_LENGTH:
+            try:
+                instruction = self._decode(instruction_pointer)
+                end = instruction_pointer + instruction.operands_count + 1
+                cells = [memory[cell]
+                         for cell in range(instruction_pointer + 1, end)]
+            except (IndexError, KeyError):
+                break
+            opcode = instruction.opcode
+            if opcode not in _EXPRESSIONS and opcode not in _CONDITIONS \
+                    or any([address <= target < end for target in targets]):
+                break
+
+            opcodes.append(opcode)
+            operands += [
+                cells[i] if instruction.modes[i] == MODE_POSITION
+                else instruction_pointer + i + 1
+                for i in range(len(instruction.modes))]
+            if opcode in _EXPRESSIONS:
+                operands.append(cells[2])
+                targets.append(cells[2])
+            next_addresses.append(end)
+            instruction_pointer = end
+            if opcode in _CONDITIONS:
+                break
+
+        # a single instruction (or none) runs in the interpreter as usual
+        if len(opcodes) < 2:
+            superinstruction = False
+            end = address + 1
+        else:
+            opcodes = tuple(opcodes)
+            end = next_addresses[-1]
+            superinstruction = Superinstruction(
+                _get_factory(opcodes)(
+                    *(operands + next_addresses),
+                    self.owners, self._invalidate, self._overflow,
+                    self.ran_count),
+                address,
+                end,
+                opcodes,
+                [0],
+                len(opcodes))
+        self.superinstructions[address] = superinstruction
+        for cell in range(address, end):
+            self.owners.setdefault(cell, []).append(address)
+        return superinstruction
+
+################################################################################
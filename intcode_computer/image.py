@@ -0,0 +1,251 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from array import array
+from mmap import ACCESS_READ, mmap
+from os import stat
+from os.path import abspath
+from struct import Struct
+from sys import argv, byteorder
+from typing import Dict, Tuple, Union
+from intcode_computer.memory import ARRAY_TYPE_CODE, register_program_image
+
+"""
+Binary program images: a 16-byte header (the magic, the format version, two
+reserved bytes and the number of cells) followed by the cells as little-endian
+64-bit signed integers. An image is mapped read-only, so all the computers and
+processes loading it share its pages and nothing is parsed.
+"""
+
+IMAGE_MAGIC = b"INTC"
+IMAGE_VERSION = 1
+# magic, version, reserved, number of cells; the size keeps the cells aligned
+_HEADER = Struct("<4sHHQ")
+_CELL_SIZE = 8
+
+# path -> (file modification time and size, image)
+_IMAGES = {}  # type: Dict[str, Tuple[Tuple[int, int], "ProgramImage"]]
+# path -> (file modification time and size, program)
+_PROGRAMS = {}  # type: Dict[str, Tuple[Tuple[int, int], Tuple[int]]]
+
+################################################################################
+
+def parse_program(text: str) -> Tuple[int]:
+    """
+    :param text: program in the text format, comma separated integers
+    :return: tuple of integers
+    """
+
+    return tuple([int(data.strip()) for data in text.strip().split(',')])
+
+################################################################################
+
+def write_image(program: Tuple[int], path: str) -> None:
+    """
+    Writes the program as a binary image. Raises OverflowError if a value does
+    not fit in 64 bits.
+
+    :param program: tuple of integers
+    :param path: path of the image file
+    """
+
+    cells = array(ARRAY_TYPE_CODE, program)
+    if byteorder != "little":
+        cells.byteswap()
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(IMAGE_MAGIC, IMAGE_VERSION, 0, len(cells)))
+        cells.tofile(f)
+
+################################################################################
+
+def convert_text_to_image(text_path: str, image_path: str) -> int:
+    """
+    Converts a program in the text format to a binary image.
+
+    :param text_path: path of the text program
+    :param image_path: path of the image file to write
+    :return: number of cells of the program
+    """
+
+    with open(text_path, 'r') as f:
+        program = parse_program(f.read())
+    write_image(program, image_path)
+    return len(program)
+
+################################################################################
+
+class ProgramImage(object):
+    """
+    Binary program image mapped read-only in memory. The cells are a view of
+    the mapping, array memory copies them in a single buffer copy when a
+    computer loads the program. Use open_image to share one mapping among all
+    the users in a process; pickled images are mapped again by path, so worker
+    processes share the pages of the file instead of receiving the program.
+    """
+
+################################################################################
+
+    def __init__(self, path: str):
+        """
+        Maps the image file. Raises ValueError if it is not a valid image.
+
+        :param path: path of the image file
+        """
+
+        self._path = path
+        with open(path, 'rb') as f:
+            self._mapping = mmap(f.fileno(), 0, access=ACCESS_READ)
+        if len(self._mapping) < _HEADER.size:
+            raise ValueError("%s is not an intcode program image" % path)
+        magic, version, _, cells_count = _HEADER.unpack_from(self._mapping)
+        if magic != IMAGE_MAGIC:
+            raise ValueError("%s is not an intcode program image" % path)
+        if version != IMAGE_VERSION:
+            raise ValueError(
+                "%s has unsupported image version %d" % (path, version))
+        end = _HEADER.size + cells_count * _CELL_SIZE
+        if len(self._mapping) < end:
+            raise ValueError("%s is truncated" % path)
+        self._bytes = memoryview(self._mapping)[_HEADER.size:end]
+        if byteorder == "little":
+            self._cells = self._bytes.cast(ARRAY_TYPE_CODE)
+        else:
+            # the cells have to be swapped, the copy is private
+            cells = array(ARRAY_TYPE_CODE)
+            cells.frombytes(self._bytes)
+            cells.byteswap()
+            self._bytes = memoryview(cells).cast('B')
+            self._cells = memoryview(cells)
+        self._program = None
+
+################################################################################
+
+    def __len__(self) -> int:
+        """
+        :return: number of cells of the program
+        """
+
+        return len(self._cells)
+
+################################################################################
+
+    def __reduce__(self):
+        """
+        :return: instructions to map the image again by path when unpickled
+        """
+
+        return open_image, (self._path,)
+
+################################################################################
+
+    def get_path(self) -> str:
+        """
+        :return: path of the image file
+        """
+
+        return self._path
+
+################################################################################
+
+    def get_cells(self) -> memoryview:
+        """
+        :return: read-only view of the cells as 64-bit integers
+        """
+
+        return self._cells
+
+################################################################################
+
+    def get_program(self) -> Tuple[int]:
+        """
+        Returns the program as a tuple of integers, the form computers load.
+        The tuple is created on the first call only, so all the computers
+        loading it share their program caches, and registered, so array memory
+        copies the cells straight from the mapping.
+
+        :return: tuple of integers
+        """
+
+        if self._program is None:
+            self._program = tuple(self._cells.tolist())
+            register_program_image(self._program, self._bytes)
+        return self._program
+
+################################################################################
+
+def _get_file_version(path: str) -> Tuple[int, int]:
+    """
+    :param path: path of a file
+    :return: modification time and size of the file
+    """
+
+    status = stat(path)
+    return status.st_mtime_ns, status.st_size
+
+################################################################################
+
+def open_image(path: str) -> ProgramImage:
+    """
+    Returns the image mapped from the file, the same one for all the callers
+    until the file changes.
+
+    :param path: path of the image file
+    :return: program image
+    """
+
+    key = abspath(path)
+    version = _get_file_version(key)
+    entry = _IMAGES.get(key)
+    if entry is None or entry[0] != version:
+        entry = (version, ProgramImage(key))
+        _IMAGES[key] = entry
+    return entry[1]
+
+################################################################################
+
+def is_image(path: str) -> bool:
+    """
+    :param path: path of a program file
+    :return: True if it is a binary image, False if it is a text program
+    """
+
+    with open(path, 'rb') as f:
+        return f.read(len(IMAGE_MAGIC)) == IMAGE_MAGIC
+
+################################################################################
+
+def read_program(path: Union[str, ProgramImage]) -> Tuple[int]:
+    """
+    Reads a program from a binary image or from a text file. The file is read
+    once, all the callers get the same tuple until the file changes.
+
+    :param path: path of the program file, or a program image
+    :return: tuple of integers
+    """
+
+    if isinstance(path, ProgramImage):
+        return path.get_program()
+    key = abspath(path)
+    version = _get_file_version(key)
+    entry = _PROGRAMS.get(key)
+    if entry is None or entry[0] != version:
+        if is_image(key):
+            program = open_image(key).get_program()
+        else:
+            with open(key, 'r') as f:
+                program = parse_program(f.read())
+        entry = (version, program)
+        _PROGRAMS[key] = entry
+    return entry[1]
+
+################################################################################
+
+if __name__ == "__main__":
+    # python -m intcode_computer.image input.txt input.bin
+    if len(argv) != 3:
+        print("usage: python -m intcode_computer.image TEXT_PATH IMAGE_PATH")
+        exit(1)
+    print("%d cells written" % convert_text_to_image(argv[1], argv[2]))
+    exit(0)
+
+################################################################################
@@ -0,0 +1,276 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from array import array
+from collections import OrderedDict
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, MutableSequence, \
+    Optional, Set, Tuple, Union
+
+# type code of 64-bit signed integers
+ARRAY_TYPE_CODE = 'q'
+
+# program id -> (program, its array image, the bytes of its mapped image file,
+# or None if it does not fit)
+_PROGRAM_IMAGES = OrderedDict()
+_PROGRAM_IMAGES_SIZE = 64
+
+################################################################################
+
+def get_program_image(program: Tuple[int]) \
+        -> Optional[Union[array, memoryview]]:
+    """
+    Returns the program as an array of 64-bit integers shared by all the
+    computers that load it, or as the bytes of its registered image file. The
+    image must not be modified, computers copy it in a single buffer copy (see
+    copy_program_image). Only the last few images are kept.
+
+    :param program: tuple of integers
+    :return: read-only program image, None if a value does not fit in 64 bits
+    """
+
+    key = id(program)
+    entry = _PROGRAM_IMAGES.get(key)
+    if entry is None or entry[0] is not program:
+        try:
+            image = array(ARRAY_TYPE_CODE, program)
+        except OverflowError:
+            image = None
+        entry = (program, image)
+        _PROGRAM_IMAGES[key] = entry
+        if len(_PROGRAM_IMAGES) > _PROGRAM_IMAGES_SIZE:
+            _PROGRAM_IMAGES.popitem(last=False)
+    else:
+        _PROGRAM_IMAGES.move_to_end(key)
+    return entry[1]
+
+################################################################################
+
+def register_program_image(program: Tuple[int], image: memoryview) -> None:
+    """
+    Registers the bytes of the native-endian 64-bit cells of the program, e.g.
+    of its mapped image file, as its image.
+
+    :param program: tuple of integers
+    :param image: read-only bytes of the cells
+    """
+
+    _PROGRAM_IMAGES[id(program)] = (program, image)
+    _PROGRAM_IMAGES.move_to_end(id(program))
+    if len(_PROGRAM_IMAGES) > _PROGRAM_IMAGES_SIZE:
+        _PROGRAM_IMAGES.popitem(last=False)
+
+################################################################################
+
+def copy_program_image(image: Union[array, memoryview]) -> array:
+    """
+    :param image: program image returned by get_program_image
+    :return: array memory holding a copy of the image
+    """
+
+    if isinstance(image, array):
+        return image[:]
+    memory = array(ARRAY_TYPE_CODE)
+    memory.frombytes(image)
+    return memory
+
+################################################################################
+
+def create_array_memory(cells: Iterable[int]) -> MutableSequence[int]:
+    """
+    Creates compact memory holding the given cells, an array of 64-bit integers
+    or a list of arbitrary precision integers if some value does not fit.
+
+    :param cells: memory content
+    :return: array or list
+    """
+
+    cells = list(cells)
+    try:
+        return array(ARRAY_TYPE_CODE, cells)
+    except OverflowError:
+        return cells
+
+################################################################################
+
+class PagedMemory(object):
+    """
+    Intcode computer memory split in fixed size pages. Pages are allocated on
+    the first write, reading a cell of a page that was never written returns
+    zero, so the memory has no upper bound. Snapshots share the pages with the
+    memory they were taken from; a shared page is copied only when one of the
+    sides writes into it (copy-on-write).
+    """
+
+    PAGE_SHIFT = 8
+    PAGE_SIZE = 1 << PAGE_SHIFT
+    PAGE_MASK = PAGE_SIZE - 1
+
+################################################################################
+
+    def __init__(self, cells: Iterable[int] = ()):
+        """
+        Creates the memory holding the given cells.
+
+        :param cells: initial memory content, e.g. a program
+        """
+
+        cells = list(cells)
+        self._length = len(cells)
+        # the last page is padded with zeros, all pages have the same size
+        cells += [0] * (-len(cells) % self.PAGE_SIZE)
+        # page index -> page, only the allocated pages are in it, so a write
+        # far behind the end costs one page
+        self._pages = {}  # type: Dict[int, List[int]]
+        for i in range(0, len(cells), self.PAGE_SIZE):
+            self._pages[i >> self.PAGE_SHIFT] = cells[i:i + self.PAGE_SIZE]
+        # indexes of the pages not shared with a snapshot, the other ones have
+        # to be copied before they are written
+        self._owned = set(self._pages)  # type: Set[int]
+
+################################################################################
+
+    def __len__(self) -> int:
+        """
+        :return: address after the highest cell loaded or written
+        """
+
+        return self._length
+
+################################################################################
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        :return: iterator over the memory cells up to the highest cell loaded
+        or written
+        """
+
+        empty_page = [0] * self.PAGE_SIZE
+        pages_count = (self._length + self.PAGE_MASK) >> self.PAGE_SHIFT
+        return islice(
+            chain.from_iterable([self._pages.get(index, empty_page)
+                                 for index in range(pages_count)]),
+            self._length)
+
+################################################################################
+
+    def __eq__(self, other) -> bool:
+        """
+        Memory equals to other memory or list with the same content.
+
+        :param other: other memory
+        :return: True if the content is the same
+        """
+
+        return list(self) == list(other)
+
+################################################################################
+
+    def __getitem__(self, address: int) -> int:
+        """
+        :param address: desired address
+        :return: data on the given address, zero if it was never written
+        """
+
+        if address < 0:
+            raise IndexError(address)
+        page = self._pages.get(address >> self.PAGE_SHIFT)
+        if page is None:
+            # the page is not allocated
+            return 0
+        return page[address & self.PAGE_MASK]
+
+################################################################################
+
+    def __setitem__(self, address: int, data: int) -> None:
+        """
+        Sets data on the given address. Allocates the page first if it was
+        never written, copies it first if it is shared.
+
+        :param address: desired address
+        :param data: desired data
+        """
+
+        if address < 0:
+            raise IndexError(address)
+        page_index = address >> self.PAGE_SHIFT
+        if page_index not in self._owned:
+            page = self._pages.get(page_index)
+            page = [0] * self.PAGE_SIZE if page is None else list(page)
+            self._pages[page_index] = page
+            self._owned.add(page_index)
+        else:
+            page = self._pages[page_index]
+        page[address & self.PAGE_MASK] = data
+        if address >= self._length:
+            self._length = address + 1
+
+################################################################################
+
+    def snapshot(self) -> "PagedMemory":
+        """
+        Returns a copy of the memory sharing all the pages with this one.
+
+        :return: copy-on-write copy of the memory
+        """
+
+        copy = PagedMemory()
+        copy._length = self._length
+        copy._pages = dict(self._pages)
+        self._owned = set()
+        return copy
+
+################################################################################
+
+    def get_pages(self) -> Dict[int, List[int]]:
+        """
+        Returns the allocated pages of the memory, the pages never written are
+        not in it. The pages are shared with the memory and must not be
+        modified; a page written after a snapshot is a new list, so comparing
+        the pages of two snapshots by identity tells which pages changed in
+        between.
+
+        :return: page index -> page of PAGE_SIZE cells
+        """
+
+        return dict(self._pages)
+
+################################################################################
+
+    @staticmethod
+    def from_pages(pages: Dict[int, List[int]], length: int) -> "PagedMemory":
+        """
+        Creates the memory holding the given pages. The pages are shared, the
+        memory copies a page before its first write into it.
+
+        :param pages: page index -> page of PAGE_SIZE cells, for the pages
+        ever written
+        :param length: address after the highest cell loaded or written
+        :return: new memory sharing the pages
+        """
+
+        memory = PagedMemory()
+        memory._pages = dict(pages)
+        memory._length = length
+        return memory
+
+################################################################################
+
+    def get_owned_pages_count(self) -> int:
+        """
+        :return: number of allocated pages this memory does not share with any
+        snapshot
+        """
+
+        return len(self._owned)
+
+################################################################################
+
+    def get_resident_pages_count(self) -> int:
+        """
+        :return: number of allocated pages
+        """
+
+        return len(self._pages)
+
+################################################################################
@@ -0,0 +1,161 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from queue import LifoQueue
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from intcode_computer.computer import IntcodeComputer
+
+################################################################################
+
+class Job(NamedTuple):
+    """
+    One program run: the program, the (address, value) patches applied to its
+    memory before it runs, its input values, the addresses read after it
+    halts, and the number of instructions and the wall time in seconds it may
+    take at most (None for no limit).
+    """
+
+    program: Tuple[int]
+    patches: Tuple[Tuple[int, int], ...] = ()
+    inputs: Tuple[int, ...] = ()
+    read_addresses: Tuple[int, ...] = ()
+    budget: Optional[int] = None
+    timeout: Optional[float] = None
+
+################################################################################
+
+class JobResult(NamedTuple):
+    """
+    Outcome of a job: the run status (None if the program failed, see
+    IntcodeComputer.run_sync for the others), the output values, the data on
+    the read addresses and the error that stopped the program, if any.
+    """
+
+    status: Optional[str]
+    output: Tuple[int, ...]
+    data: Tuple[int, ...]
+    error: Optional[Exception]
+
+################################################################################
+
+class MachinePool(object):
+    """
+    Fixed set of intcode computers created once and reused for any number of
+    program runs, every run resets its computer by loading the program. A run
+    costs neither the computer construction nor a thread start. The pool may
+    be shared by several threads, every thread runs its jobs on a computer it
+    does not share; in CPython only one of them computes at a time, so use
+    intcode_computer.search (worker processes) to run jobs in parallel.
+    """
+
+################################################################################
+
+    def __init__(self, size: int = 1,
+                 engine: str = IntcodeComputer.ENGINE_INTERPRETER,
+                 memory: str = IntcodeComputer.MEMORY_LIST):
+        """
+        Creates the pool and its computers.
+
+        :param size: number of computers, i.e. of jobs running at once
+        :param engine: engine of the computers (see IntcodeComputer)
+        :param memory: memory type of the computers (see IntcodeComputer)
+        """
+
+        self._size = size
+        # the most recently used computer is taken first, it is the warmest
+        self._computers = LifoQueue()
+        for _ in range(size):
+            self._computers.put(IntcodeComputer(engine=engine, memory=memory))
+
+################################################################################
+
+    def get_size(self) -> int:
+        """
+        :return: number of computers of the pool
+        """
+
+        return self._size
+
+################################################################################
+
+    def acquire(self) -> IntcodeComputer:
+        """
+        Takes a computer out of the pool, waits for one if all are taken. Load
+        a program before running it and give the computer back by release.
+
+        :return: intcode computer
+        """
+
+        return self._computers.get()
+
+################################################################################
+
+    def release(self, computer: IntcodeComputer) -> None:
+        """
+        Gives the computer taken by acquire back to the pool.
+
+        :param computer: intcode computer
+        """
+
+        self._computers.put(computer)
+
+################################################################################
+
+    def run(self, job: Job) -> JobResult:
+        """
+        Runs one job on a computer of the pool.
+
+        :param job: job to run
+        :return: job result
+        """
+
+        return self.run_batch([job])[0]
+
+################################################################################
+
+    def run_batch(self, jobs: Iterable[Job]) -> List[JobResult]:
+        """
+        Runs the jobs one after another on one computer of the pool, in the
+        calling thread. A job whose program fails (points out of its memory,
+        hits an invalid opcode or misses an input value) does not stop the
+        batch, its result holds the error.
+
+        :param jobs: jobs to run
+        :return: results in the order of the jobs
+        """
+
+        computer = self.acquire()
+        try:
+            return [_run_job(computer, job) for job in jobs]
+        finally:
+            self.release(computer)
+
+################################################################################
+
+def _run_job(computer: IntcodeComputer, job: Job) -> JobResult:
+    """
+    :param computer: computer to run the job on
+    :param job: job to run
+    :return: job result
+    """
+
+    computer.load_program(job.program)
+    for address, value in job.patches:
+        computer.set_data(address, value)
+    for input_value in job.inputs:
+        computer.load_input(input_value)
+    computer.set_budget(job.budget)
+    computer.set_deadline(job.timeout)
+    try:
+        status = computer.run_sync()
+        error = None
+    except (IndexError, KeyError, RuntimeError) as job_error:
+        status = None
+        error = job_error
+    return JobResult(
+        status,
+        tuple(computer.get_output()),
+        tuple([computer.get_data(address) for address in job.read_addresses]),
+        error)
+
+################################################################################
@@ -0,0 +1,240 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from json import dump
+from typing import Callable, Dict, Hashable, List, NamedTuple, Tuple
+
+# opcode -> name used in the reports
+OPCODE_NAMES = {
+    1: "add",
+    2: "multiply",
+    3: "save_input",
+    4: "write_output",
+    5: "jump_if_true",
+    6: "jump_if_false",
+    7: "less_than",
+    8: "equals",
+    99: "exit"
+}
+
+# root frame of the collapsed stacks
+ROOT_FRAME = "intcode"
+INPUT_WAIT_FRAME = "input_wait"
+
+################################################################################
+
+class ProfileEntry(NamedTuple):
+    """
+    Number of executions and their cumulative wall time in seconds.
+    """
+
+    count: int
+    time: float
+
+################################################################################
+
+def _to_dict(profile_entry: ProfileEntry) -> Dict:
+    """
+    :param profile_entry: executions and their time
+    :return: JSON compatible dict
+    """
+
+    return {"count": profile_entry.count, "time": profile_entry.time}
+
+################################################################################
+
+class Profiler(object):
+    """
+    Collects execution counts and wall times of the instructions an intcode
+    computer runs, by opcode, by opcode and modes of the input params, and by
+    instruction address, and the time spent waiting for input values. Attach it
+    with IntcodeComputer.enable_profiling; one profiler may collect the runs of
+    several computers running in one thread.
+    """
+
+################################################################################
+
+    def __init__(self):
+        """
+        Creates the profiler with nothing recorded.
+        """
+
+        # (address, opcode, modes) -> [count, time]
+        self._records = {}  # type: Dict[Tuple[int, int, str], List]
+        self._input_wait = [0, 0.0]
+
+################################################################################
+
+    def record(self, address: int, opcode: int, modes: str,
+               time: float) -> None:
+        """
+        Records one execution of an instruction.
+
+        :param address: address of the instruction
+        :param opcode: opcode of the instruction
+        :param modes: modes of the input params
+        :param time: wall time of the execution in seconds
+        """
+
+        key = (address, opcode, modes)
+        record = self._records.get(key)
+        if record is None:
+            self._records[key] = [1, time]
+        else:
+            record[0] += 1
+            record[1] += time
+
+################################################################################
+
+    def record_input_wait(self, time: float) -> None:
+        """
+        Records one wait for an input value.
+
+        :param time: wall time of the wait in seconds
+        """
+
+        self._input_wait[0] += 1
+        self._input_wait[1] += time
+
+################################################################################
+
+    def reset(self) -> None:
+        """
+        Drops everything recorded.
+        """
+
+        self._records = {}
+        self._input_wait = [0, 0.0]
+
+################################################################################
+
+    def get_opcode_stats(self) -> Dict[int, ProfileEntry]:
+        """
+        :return: opcode -> executions of its instructions
+        """
+
+        return self._aggregate(lambda address, opcode, modes: opcode)
+
+################################################################################
+
+    def get_mode_stats(self) -> Dict[Tuple[int, str], ProfileEntry]:
+        """
+        :return: (opcode, modes of the input params) -> executions of its
+        instructions
+        """
+
+        return self._aggregate(lambda address, opcode, modes: (opcode, modes))
+
+################################################################################
+
+    def get_address_stats(self) -> Dict[int, ProfileEntry]:
+        """
+        :return: instruction address -> executions of the instructions on the
+        address (more if the program modified the instruction)
+        """
+
+        return self._aggregate(lambda address, opcode, modes: address)
+
+################################################################################
+
+    def get_input_wait(self) -> ProfileEntry:
+        """
+        :return: waits for an input value that was not loaded yet, their time
+        is not included in the time of the input instructions
+        """
+
+        return ProfileEntry(*self._input_wait)
+
+################################################################################
+
+    def to_dict(self) -> Dict:
+        """
+        :return: the whole report as JSON compatible dict
+        """
+
+        opcode_stats = self.get_opcode_stats()
+        return {
+            "instructions_count": sum([stats.count
+                                       for stats in opcode_stats.values()]),
+            "time": sum([stats.time for stats in opcode_stats.values()]),
+            "input_wait": _to_dict(self.get_input_wait()),
+            "opcodes": {
+                str(opcode): dict(name=OPCODE_NAMES.get(opcode, str(opcode)),
+                                  **_to_dict(stats))
+                for opcode, stats in sorted(opcode_stats.items())},
+            "modes": {
+                "%d/%s" % (opcode, modes): _to_dict(stats)
+                for (opcode, modes), stats
+                in sorted(self.get_mode_stats().items())},
+            "addresses": {
+                str(address): _to_dict(stats)
+                for address, stats
+                in sorted(self.get_address_stats().items())}
+        }
+
+################################################################################
+
+    def save_json(self, path: str) -> None:
+        """
+        Saves the report (see to_dict) as JSON.
+
+        :param path: output file path
+        """
+
+        with open(path, 'w') as f:
+            dump(self.to_dict(), f, indent=2)
+
+################################################################################
+
+    def to_collapsed(self) -> List[str]:
+        """
+        Returns the report as collapsed stacks (one "frame;frame;... value"
+        line per stack, the input of flamegraph.pl and compatible viewers).
+        The stacks are opcode, modes and address, the values are wall times in
+        microseconds.
+
+        :return: collapsed stack lines
+        """
+
+        lines = []
+        for (address, opcode, modes), (count, time) \
+                in sorted(self._records.items()):
+            lines.append("%s;%s;%s;@%d %d" % (
+                ROOT_FRAME, OPCODE_NAMES.get(opcode, str(opcode)),
+                modes or '-', address, round(time * 1e6)))
+        if self._input_wait[0]:
+            lines.append("%s;%s %d" % (
+                ROOT_FRAME, INPUT_WAIT_FRAME,
+                round(self._input_wait[1] * 1e6)))
+        return lines
+
+################################################################################
+
+    def save_collapsed(self, path: str) -> None:
+        """
+        Saves the report as collapsed stacks (see to_collapsed).
+
+        :param path: output file path
+        """
+
+        with open(path, 'w') as f:
+            f.write('\n'.join(self.to_collapsed()) + '\n')
+
+################################################################################
+
+    def _aggregate(self, get_key: Callable[[int, int, str], Hashable]) \
+            -> Dict:
+        """
+        :param get_key: function taking the address, opcode and modes of a
+        record and returning its group
+        :return: group -> executions of its instructions
+        """
+
+        groups = {}
+        for (address, opcode, modes), (count, time) in self._records.items():
+            key = get_key(address, opcode, modes)
+            group = groups.get(key, (0, 0.0))
+            groups[key] = (group[0] + count, group[1] + time)
+        return {key: ProfileEntry(*group) for key, group in groups.items()}
+
+################################################################################
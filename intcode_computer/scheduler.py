@@ -0,0 +1,177 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from typing import Dict, List, Sequence, Union
+from intcode_computer.channel import Channel, ChannelEmpty
+from intcode_computer.computer import IntcodeComputer
+
+################################################################################
+
+class Scheduler(object):
+    """
+    Runs a network of intcode computers (a ring, a chain or any other graph) in
+    the calling thread. Every computer runs until it needs an input value that
+    is not there yet, then its new output values are taken from its output
+    channel and loaded as input values to all the computers connected to it
+    and the next computer runs. The output values of a computer connected to
+    no other one stay in its output channel.
+    """
+
+################################################################################
+
+    def __init__(self):
+        """
+        Creates an empty network.
+        """
+
+        self._computers = []  # type: List[IntcodeComputer]
+        self._destinations = {} \
+            # type: Dict[IntcodeComputer, List[Union[IntcodeComputer, Channel]]]
+
+################################################################################
+
+    def add_computer(self, computer: IntcodeComputer) -> None:
+        """
+        Adds a computer with a loaded program to the network. Computers run in
+        the order they were added.
+
+        :param computer: intcode computer
+        """
+
+        self._computers.append(computer)
+        self._destinations[computer] = []
+
+################################################################################
+
+    def connect(self, source: IntcodeComputer,
+                destination: Union[IntcodeComputer, Channel]) -> None:
+        """
+        Routes all output values the source computer writes from now on to the
+        input of the destination computer, or into the destination channel
+        (e.g. to collect the output of the network). A computer may feed more
+        destinations, every one gets every value, and may be fed by more
+        computers.
+
+        :param source: computer writing the output values
+        :param destination: computer reading them as input values, or channel
+        """
+
+        self._destinations[source].append(destination)
+
+################################################################################
+
+    def connect_ring(self) -> None:
+        """
+        Connects the computers in a ring in the order they were added, the last
+        one feeds the first one.
+        """
+
+        for i in range(len(self._computers)):
+            self.connect(
+                self._computers[i],
+                self._computers[(i + 1) % len(self._computers)])
+
+################################################################################
+
+    def run(self) -> str:
+        """
+        Runs the network until all the computers halt, or until one is stopped
+        or runs out of its budget or time (see IntcodeComputer.set_budget and
+        set_deadline). A computer whose bounded output channel is full runs on
+        once its output values are routed. Raises RuntimeError if the running
+        computers all wait for input values no one will write (or for output
+        channel space no one will make).
+
+        :return: STATUS_HALTED, or the status of the computer that ended the
+        run
+        """
+
+        while not all([computer.is_halted() for computer in self._computers]):
+            routed_count = 0
+            for computer in self._computers:
+                if not computer.is_halted():
+                    status = computer.run_until_input()
+                    routed_count += self._route(computer)
+                    if status not in (IntcodeComputer.STATUS_HALTED,
+                                      IntcodeComputer.STATUS_WAITING_INPUT,
+                                      IntcodeComputer.STATUS_WAITING_OUTPUT):
+                        return status
+
+            if routed_count == 0 \
+                    and not all([computer.is_halted()
+                                 for computer in self._computers]):
+                raise RuntimeError(
+                    "intcode network is deadlocked, computers %s wait for "
+                    "input" % ', '.join([
+                        str(i) for i, computer in enumerate(self._computers)
+                        if not computer.is_halted()]))
+        return IntcodeComputer.STATUS_HALTED
+
+################################################################################
+
+    def _route(self, computer: IntcodeComputer) -> int:
+        """
+        Takes the output values of the given computer from its output channel
+        and loads them to the input of all the computers connected to it.
+
+        :param computer: source computer
+        :return: number of routed output values
+        """
+
+        destinations = self._destinations[computer]
+        if not destinations:
+            return 0
+        channels = [destination.get_input_channel()
+                    if isinstance(destination, IntcodeComputer)
+                    else destination
+                    for destination in destinations]
+        output_channel = computer.get_output_channel()
+        routed_count = 0
+        while True:
+            try:
+                value = output_channel.get(False)
+            except ChannelEmpty:
+                return routed_count
+            for channel in channels:
+                channel.put(value)
+            routed_count += 1
+
+################################################################################
+
+def join_network(computers: Sequence[IntcodeComputer],
+                 poll_interval: float = 0.05) -> None:
+    """
+    Waits until the threads of the started computers of a network (computers
+    sharing channels, see IntcodeComputer.set_input_channel) end. If all the
+    computers still running wait on their channels and none of them moves on
+    for a whole poll interval, the network is deadlocked: the computers are
+    stopped and RuntimeError is raised. The network must be closed, values
+    written into it from outside may come too late.
+
+    :param computers: started computers
+    :param poll_interval: seconds between two deadlock checks
+    """
+
+    last_waits = None
+    while True:
+        running = [computer for computer in computers if computer.is_alive()]
+        if not running:
+            return
+        if all([computer.is_waiting() for computer in running]):
+            waits = [(computer, computer.get_waits_count())
+                     for computer in running]
+            if waits == last_waits:
+                for computer in running:
+                    computer.stop()
+                for computer in running:
+                    computer.join()
+                raise RuntimeError(
+                    "intcode network is deadlocked, computers %s wait"
+                    % ', '.join([str(computers.index(computer))
+                                 for computer in running]))
+        else:
+            waits = None
+        last_waits = waits
+        running[0].join(poll_interval)
+
+################################################################################
@@ -0,0 +1,338 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice, repeat
+from math import ceil, factorial
+from os import cpu_count
+from sys import maxsize
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, \
+    Union
+from intcode_computer.computer import IntcodeComputer, Snapshot
+from intcode_computer.image import ProgramImage
+
+# chunks per worker, more chunks balance the load better, fewer chunks cost
+# less in inter-process traffic
+CHUNKS_PER_WORKER = 4
+# sweeps stop early, smaller chunks waste less work after the stop
+SWEEP_CHUNKS_PER_WORKER = 16
+
+# program of the worker process, sent once when the worker starts
+_worker_program = None
+
+################################################################################
+
+def _init_worker(program: Union[Tuple[int], ProgramImage]) -> None:
+    """
+    Saves the program in the worker process, so the tasks don't have to carry
+    it.
+
+    :param program: tuple of integers, or program image mapped by the worker
+    """
+
+    global _worker_program
+    if isinstance(program, ProgramImage):
+        program = program.get_program()
+    _worker_program = program
+
+################################################################################
+
+def _search_chunk(evaluate: Callable[[Tuple[int], Tuple], int],
+                  chunk: List[Tuple]) -> Tuple[int, Optional[Tuple]]:
+    """
+    Evaluates all the candidates of the chunk in the worker process.
+
+    :param evaluate: module level function taking the program and a candidate
+    and returning its score
+    :param chunk: candidates
+    :return: the best score of the chunk and its candidate
+    """
+
+    best_score = -maxsize - 1
+    best_candidate = None
+    for candidate in chunk:
+        score = evaluate(_worker_program, candidate)
+        if score > best_score:
+            best_score = score
+            best_candidate = candidate
+    return best_score, best_candidate
+
+################################################################################
+
+def _sweep_chunk(evaluate: Callable[[Tuple[int], Tuple], int],
+                 chunk: List[Tuple]) -> List[Tuple[Tuple, int]]:
+    """
+    Evaluates all the candidates of the chunk in the worker process.
+
+    :param evaluate: module level function taking the program and a candidate
+    and returning its score
+    :param chunk: candidates
+    :return: candidates with their scores
+    """
+
+    return [(candidate, evaluate(_worker_program, candidate))
+            for candidate in chunk]
+
+################################################################################
+
+def _chunks(candidates: Sequence[Tuple], size: int) -> Iterator[List[Tuple]]:
+    """
+    Splits the candidates in chunks of the given size.
+
+    :param candidates: candidates
+    :param size: chunk size
+    :return: chunks
+    """
+
+    iterator = iter(candidates)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+################################################################################
+
+def parallel_max_search(program: Union[Tuple[int], ProgramImage],
+                        candidates: Sequence[Tuple],
+                        evaluate: Callable[[Tuple[int], Tuple], int],
+                        max_workers: int = None,
+                        chunk_size: int = None) -> Tuple[int, Tuple]:
+    """
+    Evaluates all the candidates (e.g. amplifier phase settings) in a pool of
+    worker processes and returns the best one. The program is sent to every
+    worker only once, the candidates are sent in chunks. If more candidates
+    share the best score, the first one is returned.
+
+    :param program: tuple of integers, or program image (the workers map
+    it themselves instead of receiving the program)
+    :param candidates: candidates to evaluate
+    :param evaluate: module level function taking the program and a candidate
+    and returning its score
+    :param max_workers: number of worker processes, all CPUs by default
+    :param chunk_size: number of candidates in one task, by default the
+    candidates are split in CHUNKS_PER_WORKER chunks per worker
+    :return: the best score and its candidate
+    """
+
+    if max_workers is None:
+        max_workers = cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(
+            1, ceil(len(candidates) / (max_workers * CHUNKS_PER_WORKER)))
+
+    best_score = -maxsize - 1
+    best_candidate = None
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                             initargs=(program,)) as executor:
+        chunks = _chunks(candidates, chunk_size)
+        # results come in the order of the chunks, the search is deterministic
+        for score, candidate in executor.map(
+                _search_chunk, repeat(evaluate), chunks):
+            if score > best_score:
+                best_score = score
+                best_candidate = candidate
+    return best_score, best_candidate
+
+################################################################################
+
+def parallel_sweep(program: Union[Tuple[int], ProgramImage],
+                   candidates: Sequence[Tuple],
+                   evaluate: Callable[[Tuple[int], Tuple], int],
+                   max_workers: int = None,
+                   chunk_size: int = None) -> Iterator[Tuple[Tuple, int]]:
+    """
+    Evaluates the candidates in a pool of worker processes and yields them
+    with their scores as soon as their chunk is done, so the order follows the
+    workers, not the candidates. Closing the generator (e.g. leaving the loop
+    over it) cancels the chunks that did not start yet.
+
+    :param program: tuple of integers, or program image (the workers map
+    it themselves instead of receiving the program)
+    :param candidates: candidates to evaluate
+    :param evaluate: module level function taking the program and a candidate
+    and returning its score
+    :param max_workers: number of worker processes, all CPUs by default
+    :param chunk_size: number of candidates in one task, by default the
+    candidates are split in SWEEP_CHUNKS_PER_WORKER chunks per worker
+    :return: (candidate, score) pairs
+    """
+
+    if max_workers is None:
+        max_workers = cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(
+            1, ceil(len(candidates) / (max_workers * SWEEP_CHUNKS_PER_WORKER)))
+
+    executor = ProcessPoolExecutor(
+        max_workers, initializer=_init_worker, initargs=(program,))
+    try:
+        futures = [executor.submit(_sweep_chunk, evaluate, chunk)
+                   for chunk in _chunks(candidates, chunk_size)]
+        for future in as_completed(futures):
+            yield from future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+################################################################################
+
+def parallel_find(program: Union[Tuple[int], ProgramImage],
+                  candidates: Sequence[Tuple],
+                  evaluate: Callable[[Tuple[int], Tuple], int], target: int,
+                  max_workers: int = None,
+                  chunk_size: int = None) -> Optional[Tuple]:
+    """
+    Looks for a candidate with the target score in a pool of worker processes.
+    The remaining work is cancelled as soon as one is found. If more candidates
+    match, any of them may be returned.
+
+    :param program: tuple of integers, or program image (the workers map
+    it themselves instead of receiving the program)
+    :param candidates: candidates to evaluate
+    :param evaluate: module level function taking the program and a candidate
+    and returning its score
+    :param target: desired score
+    :param max_workers: number of worker processes, all CPUs by default
+    :param chunk_size: number of candidates in one task
+    :return: matching candidate, None if there is none
+    """
+
+    sweep = parallel_sweep(
+        program, candidates, evaluate, max_workers, chunk_size)
+    try:
+        for candidate, score in sweep:
+            if score == target:
+                return candidate
+    finally:
+        sweep.close()
+    return None
+
+################################################################################
+
+class PermutationChainSearch(object):
+    """
+    Searches all orderings of settings for a chain of computers running the same
+    program, where every computer reads its setting and then the output of the
+    previous computer (e.g. Day 7 amplifiers). The permutations are walked
+    depth-first and the output of every computer is memoized by its setting and
+    input, so permutations sharing a prefix share its runs.
+    """
+
+################################################################################
+
+    def __init__(self, program: Tuple[int], settings: Sequence[int],
+                 input_value: int):
+        """
+        Creates the search.
+
+        :param program: tuple of integers
+        :param settings: settings to order, every computer gets one
+        :param input_value: input of the first computer
+        """
+
+        self._program = program
+        self._settings = tuple(settings)
+        self._input_value = input_value
+        # computer state right after reading its setting
+        self._setting_snapshots = {}  # type: Dict[int, Snapshot]
+        # (setting, input) -> output
+        self._outputs = {}  # type: Dict[Tuple[int, int], int]
+        self._best_output = None
+        self._best_permutation = None
+        # every run restores a snapshot in this computer
+        self._computer = IntcodeComputer()
+
+################################################################################
+
+    def run(self) -> Tuple[int, Tuple[int]]:
+        """
+        Runs the search.
+
+        :return: the highest output of the last computer and the settings
+        permutation producing it
+        """
+
+        self._best_output = -maxsize - 1
+        self._best_permutation = None
+        self._search((), self._input_value)
+        return self._best_output, self._best_permutation
+
+################################################################################
+
+    def get_runs_count(self) -> int:
+        """
+        :return: number of program runs the search did
+        """
+
+        return len(self._outputs)
+
+################################################################################
+
+    def get_brute_force_runs_count(self) -> int:
+        """
+        :return: number of program runs needed to run every permutation from
+        scratch
+        """
+
+        return factorial(len(self._settings)) * len(self._settings)
+
+################################################################################
+
+    def get_saved_runs_count(self) -> int:
+        """
+        :return: number of program runs saved compared with brute force
+        """
+
+        return self.get_brute_force_runs_count() - self.get_runs_count()
+
+################################################################################
+
+    def _search(self, prefix: Tuple[int, ...], input_value: int) -> None:
+        """
+        Tries all the unused settings for the next computer of the chain.
+
+        :param prefix: settings of the computers before
+        :param input_value: output of the last computer of the prefix
+        """
+
+        if len(prefix) == len(self._settings):
+            if input_value > self._best_output:
+                self._best_output = input_value
+                self._best_permutation = prefix
+            return
+
+        for setting in self._settings:
+            if setting not in prefix:
+                self._search(
+                    prefix + (setting,), self._run(setting, input_value))
+
+################################################################################
+
+    def _run(self, setting: int, input_value: int) -> int:
+        """
+        Returns the output of a computer with the given setting and input, runs
+        the program only if this combination was not run yet. The part of the
+        program before the input is read runs only once for every setting.
+
+        :param setting: setting of the computer
+        :param input_value: input of the computer
+        :return: last output of the computer
+        """
+
+        key = (setting, input_value)
+        if key not in self._outputs:
+            computer = self._computer
+            if setting in self._setting_snapshots:
+                computer.restore(self._setting_snapshots[setting])
+            else:
+                computer.load_program(self._program)
+                computer.load_input(setting)
+                computer.run_until_input()
+                # the snapshot runs for every input, fold its arithmetic once
+                computer.optimize()
+                self._setting_snapshots[setting] = computer.snapshot()
+            computer.load_input(input_value)
+            computer.run_sync()
+            self._outputs[key] = computer.get_output()[-1]
+        return self._outputs[key]
+
+################################################################################
@@ -0,0 +1,444 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from itertools import product
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+################################################################################
+
+class SymbolicValueError(Exception):
+    """
+    Raised when the execution depends on a symbolic value (a branch, an
+    address or an instruction heading), so it has to fall back to concrete
+    execution.
+    """
+
+################################################################################
+
+class Polynomial(object):
+    """
+    Polynomial with integer coefficients over named symbols. Operations with
+    constant results return plain integers.
+    """
+
+################################################################################
+
+    def __init__(self, terms: Dict[Tuple[Tuple[str, int], ...], int]):
+        """
+        Creates the polynomial from its terms.
+
+        :param terms: monomial -> coefficient; a monomial is a sorted tuple of
+        (symbol, power) pairs, the constant term has an empty one
+        """
+
+        self._terms = {monomial: coefficient
+                       for monomial, coefficient in terms.items()
+                       if coefficient != 0}
+
+################################################################################
+
+    @staticmethod
+    def symbol(name: str) -> "Polynomial":
+        """
+        :param name: symbol name
+        :return: polynomial of the single symbol
+        """
+
+        return Polynomial({((name, 1),): 1})
+
+################################################################################
+
+    def get_terms(self) -> Dict[Tuple[Tuple[str, int], ...], int]:
+        """
+        :return: monomial -> coefficient
+        """
+
+        return self._terms
+
+################################################################################
+
+    def get_symbols(self) -> List[str]:
+        """
+        :return: names of the symbols in the polynomial, sorted
+        """
+
+        return sorted({name
+                       for monomial in self._terms
+                       for name, _ in monomial})
+
+################################################################################
+
+    def evaluate(self, values: Dict[str, int]) -> int:
+        """
+        :param values: symbol name -> value
+        :return: value of the polynomial
+        """
+
+        result = 0
+        for monomial, coefficient in self._terms.items():
+            for name, power in monomial:
+                coefficient *= values[name] ** power
+            result += coefficient
+        return result
+
+################################################################################
+
+    def __add__(self, other: Union["Polynomial", int]) \
+            -> Union["Polynomial", int]:
+        """
+        :param other: polynomial or integer
+        :return: sum
+        """
+
+        terms = dict(self._terms)
+        for monomial, coefficient in _to_terms(other).items():
+            terms[monomial] = terms.get(monomial, 0) + coefficient
+        return _simplify(terms)
+
+    __radd__ = __add__
+
+################################################################################
+
+    def __mul__(self, other: Union["Polynomial", int]) \
+            -> Union["Polynomial", int]:
+        """
+        :param other: polynomial or integer
+        :return: product
+        """
+
+        terms = {}
+        for monomial_1, coefficient_1 in self._terms.items():
+            for monomial_2, coefficient_2 in _to_terms(other).items():
+                powers = dict(monomial_1)
+                for name, power in monomial_2:
+                    powers[name] = powers.get(name, 0) + power
+                monomial = tuple(sorted(powers.items()))
+                terms[monomial] = terms.get(monomial, 0) \
+                                  + coefficient_1 * coefficient_2
+        return _simplify(terms)
+
+    __rmul__ = __mul__
+
+################################################################################
+
+    def __eq__(self, other) -> bool:
+        """
+        :param other: other polynomial
+        :return: True if both polynomials have the same terms
+        """
+
+        return isinstance(other, Polynomial) and self._terms == other._terms
+
+################################################################################
+
+    def __hash__(self) -> int:
+        """
+        :return: hash of the terms
+        """
+
+        return hash(frozenset(self._terms.items()))
+
+################################################################################
+
+    def __repr__(self) -> str:
+        """
+        :return: polynomial written as a sum of monomials, e.g. 2*noun + verb
+        """
+
+        monomials = []
+        for monomial, coefficient in sorted(
+                self._terms.items(), key=lambda item: (-len(item[0]), item)):
+            factors = ["%s^%d" % (name, power) if power > 1 else name
+                       for name, power in monomial]
+            if coefficient != 1 or not factors:
+                factors.insert(0, str(coefficient))
+            monomials.append('*'.join(factors))
+        return ' + '.join(monomials)
+
+################################################################################
+
+class _Unknown(object):
+    """
+    Value read from a symbolic address. It may be stored and overwritten, but
+    any other use of it stops the analysis.
+    """
+
+    def __repr__(self) -> str:
+        """
+        :return: question mark
+        """
+
+        return "?"
+
+UNKNOWN = _Unknown()
+
+Value = Union[int, Polynomial, _Unknown]
+
+################################################################################
+
+def _to_terms(value: Union[Polynomial, int]) \
+        -> Dict[Tuple[Tuple[str, int], ...], int]:
+    """
+    :param value: polynomial or integer
+    :return: terms of the value
+    """
+
+    if isinstance(value, Polynomial):
+        return value.get_terms()
+    return {(): value}
+
+################################################################################
+
+def _simplify(terms: Dict[Tuple[Tuple[str, int], ...], int]) \
+        -> Union[Polynomial, int]:
+    """
+    :param terms: polynomial terms
+    :return: integer for constant terms, polynomial otherwise
+    """
+
+    polynomial = Polynomial(terms)
+    if not any(polynomial.get_terms()):
+        return polynomial.get_terms().get((), 0)
+    return polynomial
+
+################################################################################
+
+class SymbolicResult(NamedTuple):
+    """
+    Result of a symbolic run: the value of every memory cell and every output
+    value, each an integer, a polynomial of the symbols or UNKNOWN.
+    """
+
+    memory: List[Value]
+    output_values: List[Value]
+
+################################################################################
+
+class SymbolicExecutor(object):
+    """
+    Runs a program with symbols in some memory cells, computing the values
+    derived from them as polynomials. Suits straight-line programs like the
+    Day 2 one; comparisons, jumps, writes or instruction headings depending on
+    a symbol raise SymbolicValueError, and so do addresses out of the memory,
+    unknown instructions and missing input values, so the caller can fall back
+    to concrete runs whatever stops the symbolic one.
+    """
+
+    OPCODE_ADD = 1
+    OPCODE_MULTIPLY = 2
+    OPCODE_SAVE_INPUT = 3
+    OPCODE_WRITE_OUTPUT = 4
+    OPCODE_JUMP_IF_TRUE = 5
+    OPCODE_JUMP_IF_FALSE = 6
+    OPCODE_LESS_THAN = 7
+    OPCODE_EQUALS = 8
+    OPCODE_EXIT = 99
+
+    MODE_POSITION = '0'
+
+    # opcode -> number of params
+    PARAMS_COUNTS = {
+        OPCODE_ADD: 3,
+        OPCODE_MULTIPLY: 3,
+        OPCODE_SAVE_INPUT: 1,
+        OPCODE_WRITE_OUTPUT: 1,
+        OPCODE_JUMP_IF_TRUE: 2,
+        OPCODE_JUMP_IF_FALSE: 2,
+        OPCODE_LESS_THAN: 3,
+        OPCODE_EQUALS: 3,
+        OPCODE_EXIT: 0
+    }
+
+    MAX_STEPS = 1000000
+
+################################################################################
+
+    def __init__(self, memory: Sequence[int], symbols: Dict[int, str],
+                 input_values: Sequence[int] = (), entry: int = 0):
+        """
+        Prepares the run.
+
+        :param memory: memory content
+        :param symbols: address -> name of the symbol placed in the cell
+        :param input_values: concrete input values
+        :param entry: address of the first instruction to run
+        """
+
+        self._memory = list(memory)  # type: List[Value]
+        for address, name in symbols.items():
+            self._memory[address] = Polynomial.symbol(name)
+        self._input_values = list(input_values)
+        self._output_values = []  # type: List[Value]
+        self._entry = entry
+
+################################################################################
+
+    def run(self) -> SymbolicResult:
+        """
+        Runs the program until it halts.
+
+        :return: symbolic memory and output values
+        """
+
+        instruction_pointer = self._entry
+        for _ in range(self.MAX_STEPS):
+            heading = self._concrete(
+                self._load(instruction_pointer), "instruction heading")
+            text = str(heading)
+            opcode = int(text[-2:])
+            if opcode not in self.PARAMS_COUNTS:
+                raise SymbolicValueError(
+                    "unknown instruction %d at address %d"
+                    % (heading, instruction_pointer))
+            params_count = self.PARAMS_COUNTS[opcode]
+            modes = ''.join(reversed(text[:-2])).ljust(
+                params_count, self.MODE_POSITION)
+            next_address = instruction_pointer + params_count + 1
+
+            if opcode == self.OPCODE_EXIT:
+                return SymbolicResult(self._memory, self._output_values)
+            elif opcode in (self.OPCODE_ADD, self.OPCODE_MULTIPLY,
+                            self.OPCODE_LESS_THAN, self.OPCODE_EQUALS):
+                a = self._read(instruction_pointer + 1, modes[0])
+                b = self._read(instruction_pointer + 2, modes[1])
+                if opcode == self.OPCODE_ADD:
+                    value = a + b if UNKNOWN not in (a, b) else UNKNOWN
+                elif opcode == self.OPCODE_MULTIPLY:
+                    value = a * b if UNKNOWN not in (a, b) else UNKNOWN
+                else:
+                    a = self._concrete(a, "comparison")
+                    b = self._concrete(b, "comparison")
+                    if opcode == self.OPCODE_LESS_THAN:
+                        value = 1 if a < b else 0
+                    else:
+                        value = 1 if a == b else 0
+                self._write(instruction_pointer + 3, value)
+            elif opcode == self.OPCODE_SAVE_INPUT:
+                if not self._input_values:
+                    raise SymbolicValueError(
+                        "program reads an input value that was not given")
+                self._write(instruction_pointer + 1, self._input_values.pop(0))
+            elif opcode == self.OPCODE_WRITE_OUTPUT:
+                self._output_values.append(
+                    self._read(instruction_pointer + 1, modes[0]))
+            else:
+                condition = self._concrete(
+                    self._read(instruction_pointer + 1, modes[0]), "jump")
+                if (condition != 0) == (opcode == self.OPCODE_JUMP_IF_TRUE):
+                    next_address = self._concrete(
+                        self._read(instruction_pointer + 2, modes[1]),
+                        "jump target")
+            instruction_pointer = next_address
+        raise SymbolicValueError("program did not halt")
+
+################################################################################
+
+    def _read(self, address: int, mode: str) -> Value:
+        """
+        :param address: address of the param
+        :param mode: param mode
+        :return: param value, UNKNOWN if its address is symbolic
+        """
+
+        value = self._load(address)
+        if mode == self.MODE_POSITION:
+            if not isinstance(value, int):
+                return UNKNOWN
+            value = self._load(value)
+        return value
+
+################################################################################
+
+    def _write(self, address: int, value: Value) -> None:
+        """
+        :param address: address of the output param
+        :param value: value to write
+        """
+
+        target = self._concrete(self._load(address), "write address")
+        self._load(target)  # out of the memory raises SymbolicValueError
+        self._memory[target] = value
+
+################################################################################
+
+    def _load(self, address: int) -> Value:
+        """
+        :param address: address of a cell
+        :return: value of the cell
+        """
+
+        if not 0 <= address < len(self._memory):
+            raise SymbolicValueError(
+                "address %d is out of the memory" % address)
+        return self._memory[address]
+
+################################################################################
+
+    @staticmethod
+    def _concrete(value: Value, usage: str) -> int:
+        """
+        :param value: value
+        :param usage: what the value is used for
+        :return: the value if it is an integer
+        """
+
+        if not isinstance(value, int):
+            raise SymbolicValueError("%s depends on a symbol: %s"
+                                     % (usage, value))
+        return value
+
+################################################################################
+
+def solve(expression: Value, target: int,
+          domains: Dict[str, range]) -> Optional[Dict[str, int]]:
+    """
+    Finds the symbol values for which the expression equals the target. If the
+    expression is affine in its last symbol (like Day 2 results), only the
+    other symbols are enumerated and the last one is computed; otherwise all
+    of them are enumerated. No program runs either way. Solutions are tried
+    in the order of the domains.
+
+    :param expression: result of a symbolic run
+    :param target: desired value
+    :param domains: symbol name -> values to try, in the order of enumeration
+    :return: symbol name -> value, None if there is no solution
+    """
+
+    if expression is UNKNOWN:
+        raise SymbolicValueError("the expression is unknown")
+    if not isinstance(expression, Polynomial):
+        expression = Polynomial({(): expression})
+
+    names = list(domains)
+    last = names[-1]
+    terms = expression.get_terms()
+    affine = all([dict(monomial).get(last, 0) <= 1 for monomial in terms])
+    # expression = slope * last + offset, both polynomials of the others
+    slope = Polynomial({tuple([(name, power) for name, power in monomial
+                               if name != last]): coefficient
+                        for monomial, coefficient in terms.items()
+                        if dict(monomial).get(last, 0) == 1})
+    offset = Polynomial({monomial: coefficient
+                         for monomial, coefficient in terms.items()
+                         if last not in dict(monomial)})
+
+    for values in product(*[domains[name] for name in names[:-1]]):
+        solution = dict(zip(names[:-1], values))
+        if affine:
+            a = slope.evaluate(solution)
+            b = offset.evaluate(solution)
+            if a == 0:
+                candidates = domains[last] if b == target else []
+            elif (target - b) % a == 0 and (target - b) // a in domains[last]:
+                candidates = [(target - b) // a]
+            else:
+                candidates = []
+        else:
+            candidates = domains[last]
+        for value in candidates:
+            solution[last] = value
+            if expression.evaluate(solution) == target:
+                return solution
+    return None
+
+################################################################################
@@ -3,12 +3,52 @@ __email__ = "tofugangsw@gmail.com"
 
 from unittest import TestCase, main
 from intcode_computer.computer import IntcodeComputer, Condition
-from day_02.day_02 import _set_and_run, NOUN, NOUN_RANGE, VERB, VERB_RANGE, \
-    GRAVITY_ASSIST_GOAL
+from intcode_computer.memory import PagedMemory
+from intcode_computer.cache import RunCache
+from intcode_computer.batch import BatchComputer
+from intcode_computer.symbolic import Polynomial, SymbolicValueError, solve
+from intcode_computer.analyzer import Loop, analyze_program, optimize_program
+from intcode_computer.profiler import Profiler
+from intcode_computer.tracer import Tracer, read_trace
+from intcode_computer.channel import Channel, ChannelEmpty, ChannelFull
+from intcode_computer.pool import Job, MachinePool
+from intcode_computer.checkpoint import Checkpointer, read_checkpoint
+from intcode_computer.benchmark import compare_results, create_cases, \
+    create_self_modifying_program, load_results, main as benchmark_main, \
+    run_benchmarks, save_results
+from intcode_computer.image import ProgramImage, convert_text_to_image, \
+    is_image, open_image, parse_program, read_program, write_image
+from intcode_computer.asynchronous import AsyncChannel, AsyncIntcodeComputer, \
+    AsyncScheduler
+from io import StringIO
+from contextlib import redirect_stdout
+from json import load
+from pickle import dumps, loads
+from time import sleep
+from threading import Thread
+from asyncio import gather, run
+from tempfile import TemporaryDirectory
+from array import array
+from os.path import getsize, join
+from intcode_computer.scheduler import Scheduler, join_network
+from intcode_computer.search import parallel_max_search, parallel_sweep, \
+    PermutationChainSearch
+from day_02.day_02 import _set_and_run, _find_noun_verb, _run_combination, \
+    _solve_noun_verb, NOUN, NOUN_RANGE, VERB, VERB_RANGE, GRAVITY_ASSIST_GOAL
+from day_05.day_05 import _run_diagnostics, AIR_CONDITIONER_ID, \
+    THERMAL_RADIATOR_ID
+from day_07.day_07 import _amplify, _amplify_feedback_loop, PHASE_SETTINGS, \
+    PHASE_SETTINGS_FEEDBACK_LOOP, INPUT_SIGNAL
 
 ################################################################################
 
 class TestStringMethods(TestCase):
+    ENGINES = [
+        IntcodeComputer.ENGINE_INTERPRETER, IntcodeComputer.ENGINE_COMPILER,
+        IntcodeComputer.ENGINE_FUSED]
+    MEMORY_TYPES = [IntcodeComputer.MEMORY_LIST, IntcodeComputer.MEMORY_PAGED,
+                    IntcodeComputer.MEMORY_ARRAY]
+
     KEY_FILE_PATH = "FILE_PATH"
     KEY_EXPECTED_RESULT = "EXPECTED_RESULT"
 
@@ -36,6 +76,11 @@ class TestStringMethods(TestCase):
     }, {
         KEY_FILE_PATH: "tests/test_05_03.txt",
         KEY_EXPECTED_RESULT: [1101, 100, -1, 4, 99]
+    }, {
+        KEY_FILE_PATH: "tests/test_self_modifying_01.txt",
+        KEY_EXPECTED_RESULT: [
+            2, 20, 21, 22, 1101, 0, 2, 0, 1005, 23, 19, 1101, 0, 1, 23, 1105,
+            1, 0, 0, 99, 3, 4, 12, 1]
     }]
 
     KEY_INPUT = "INPUT"
@@ -164,12 +209,14 @@ class TestStringMethods(TestCase):
             with open(test[self.KEY_FILE_PATH], 'r') as f:
                 program = tuple([
                     int(data.strip()) for data in f.read().strip().split(',')])
-                computer = IntcodeComputer()
-                computer.load_program(program)
-                computer.start()
-                computer.join()
-                self.assertEqual(
-                    computer._memory, test[self.KEY_EXPECTED_RESULT])
+                for engine in self.ENGINES:
+                    for memory in self.MEMORY_TYPES:
+                        computer = IntcodeComputer(engine=engine, memory=memory)
+                        computer.load_program(program)
+                        computer.start()
+                        computer.join()
+                        self.assertEqual(list(computer._memory),
+                                         test[self.KEY_EXPECTED_RESULT])
 
 ################################################################################
 
@@ -178,16 +225,18 @@ class TestStringMethods(TestCase):
             with open(test[self.KEY_FILE_PATH], 'r') as f:
                 program = tuple([
                     int(data.strip()) for data in f.read().strip().split(',')])
-                computer = IntcodeComputer()
-                computer.load_program(program)
-                [computer.load_input(value) for value in test[self.KEY_INPUT]]
-                computer.start()
-                computer.join()
-                self.assertTrue(
-                    len(test[self.KEY_OUTPUT]) == len(computer.get_output()))
-                self.assertTrue(
-                    all([computer.get_output()[i] == test[self.KEY_OUTPUT][i]
-                         for i in range(len(computer.get_output()))]))
+                for engine in self.ENGINES:
+                    computer = IntcodeComputer(engine=engine)
+                    computer.load_program(program)
+                    [computer.load_input(value)
+                     for value in test[self.KEY_INPUT]]
+                    computer.start()
+                    computer.join()
+                    self.assertTrue(len(test[self.KEY_OUTPUT])
+                                    == len(computer.get_output()))
+                    self.assertTrue(all([
+                        computer.get_output()[i] == test[self.KEY_OUTPUT][i]
+                        for i in range(len(computer.get_output()))]))
 
 ################################################################################
 
@@ -239,52 +288,1409 @@ class TestStringMethods(TestCase):
 
 ################################################################################
 
-    def test_day_02_puzzle_1(self):
+    def test_sync_run(self):
+        for test in self.TESTS_OUTPUT:
+            with open(test[self.KEY_FILE_PATH], 'r') as f:
+                program = tuple([
+                    int(data.strip()) for data in f.read().strip().split(',')])
+                for engine in self.ENGINES:
+                    computer = IntcodeComputer(engine=engine)
+                    computer.load_program(program)
+                    self.assertRaises(RuntimeError, computer.run_sync)
+                    [computer.load_input(value)
+                     for value in test[self.KEY_INPUT]]
+                    self.assertEqual(
+                        computer.run_sync(), IntcodeComputer.STATUS_HALTED)
+                    self.assertEqual(
+                        computer.get_output(), test[self.KEY_OUTPUT])
+
+################################################################################
+
+    def test_resumable_run(self):
+        for test in self.TESTS_AMPLIFIERS_FEEDBACK_LOOP:
+            with open(test[self.KEY_FILE_PATH], 'r') as f:
+                program = tuple([
+                    int(data.strip()) for data in f.read().strip().split(',')])
+                for engine in self.ENGINES:
+                    input_signal = test[self.KEY_INPUT]
+                    phase_settings = test[self.KEY_PHASE_SETTINGS_SEQUENCE]
+                    computers = [IntcodeComputer(engine=engine)
+                                 for _ in range(len(phase_settings))]
+                    for computer, setting in zip(computers, phase_settings):
+                        computer.load_program(program)
+                        computer.load_input(setting)
+                        self.assertEqual(computer.run_until_input(),
+                                         IntcodeComputer.STATUS_WAITING_INPUT)
+
+                    while not computers[-1].is_halted():
+                        for computer in computers:
+                            computer.load_input(input_signal)
+                            if computer.run_until_output() \
+                                    == IntcodeComputer.STATUS_OUTPUT:
+                                input_signal = computer.get_output()[-1]
+
+                    self.assertEqual(computers[-1].get_output()[-1],
+                                     test[self.KEY_THRUSTER_SIGNAL])
+
+################################################################################
+
+    def test_scheduler(self):
+        for tests, ring in [(self.TESTS_AMPLIFIERS, False),
+                            (self.TESTS_AMPLIFIERS_FEEDBACK_LOOP, True)]:
+            for test in tests:
+                with open(test[self.KEY_FILE_PATH], 'r') as f:
+                    program = tuple([int(data.strip())
+                                     for data in f.read().strip().split(',')])
+                    for engine in self.ENGINES:
+                        phase_settings = test[self.KEY_PHASE_SETTINGS_SEQUENCE]
+                        computers = [IntcodeComputer(engine=engine)
+                                     for _ in range(len(phase_settings))]
+                        scheduler = Scheduler()
+                        for computer, setting in zip(
+                                computers, phase_settings):
+                            computer.load_program(program)
+                            computer.load_input(setting)
+                            scheduler.add_computer(computer)
+                        if ring:
+                            scheduler.connect_ring()
+                            # the routed values are taken from the output
+                            # channel of the last amplifier
+                            thrusters = Channel()
+                            scheduler.connect(computers[-1], thrusters)
+                        else:
+                            for i in range(len(computers) - 1):
+                                scheduler.connect(computers[i],
+                                                  computers[i + 1])
+                            thrusters = computers[-1].get_output_channel()
+                        computers[0].load_input(test[self.KEY_INPUT])
+                        scheduler.run()
+                        self.assertEqual(thrusters.get_values()[-1],
+                                         test[self.KEY_THRUSTER_SIGNAL])
+                        self.assertEqual(
+                            [len(computer.get_output())
+                             for computer in computers[:-1]],
+                            [0] * (len(computers) - 1))
+
+        # both computers wait for each other
+        computers = [IntcodeComputer(), IntcodeComputer()]
+        scheduler = Scheduler()
+        for computer in computers:
+            computer.load_program((3, 0, 4, 0, 99))
+            scheduler.add_computer(computer)
+        scheduler.connect_ring()
+        self.assertRaises(RuntimeError, scheduler.run)
+
+        # the producer waits for output channel space until its values are
+        # routed to the consumer
+        producer = IntcodeComputer()
+        producer.load_program((104, 1, 104, 2, 104, 3, 104, 4, 104, 5, 99))
+        producer.set_output_channel(Channel(capacity=1))
+        consumer = IntcodeComputer()
+        consumer.load_program((3, 21, 4, 21) * 5 + (99, 0))
+        scheduler = Scheduler()
+        scheduler.add_computer(producer)
+        scheduler.add_computer(consumer)
+        scheduler.connect(producer, consumer)
+        self.assertEqual(scheduler.run(), IntcodeComputer.STATUS_HALTED)
+        self.assertEqual(consumer.get_output(), [1, 2, 3, 4, 5])
+
+################################################################################
+
+    def test_parallel_search(self):
+        with open("../day_07/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+            self.assertEqual(
+                parallel_max_search(
+                    program, PHASE_SETTINGS, _amplify, max_workers=2),
+                (14902, (3, 1, 2, 0, 4)))
+            self.assertEqual(
+                parallel_max_search(
+                    program, PHASE_SETTINGS_FEEDBACK_LOOP,
+                    _amplify_feedback_loop, max_workers=2, chunk_size=7),
+                (6489132, (9, 6, 7, 5, 8)))
+
+################################################################################
+
+    def test_fork(self):
+        with open("../day_07/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+            for engine in self.ENGINES:
+                for memory in self.MEMORY_TYPES:
+                    computer = IntcodeComputer(engine=engine, memory=memory)
+                    computer.load_program(program)
+                    computer.load_input(3)
+                    # the phase setting is read, the input signal is not yet
+                    computer.run_until_input()
+                    snapshot = computer.snapshot()
+
+                    for input_signal in [0, 1, 42]:
+                        fork = computer.fork()
+                        fork.load_input(input_signal)
+                        fork.run_sync()
+                        expected = IntcodeComputer()
+                        expected.load_program(program)
+                        expected.load_input(3)
+                        expected.load_input(input_signal)
+                        expected.run_sync()
+                        self.assertEqual(fork.get_output(),
+                                         expected.get_output())
+                        self.assertEqual(list(fork._memory),
+                                         expected._memory)
+
+                    # the forks did not touch the original computer
+                    self.assertFalse(computer.is_halted())
+                    computer.load_input(0)
+                    computer.run_sync()
+                    restored = IntcodeComputer(engine=engine, memory=memory)
+                    restored.restore(snapshot)
+                    restored.load_input(0)
+                    restored.run_sync()
+                    self.assertEqual(
+                        restored.get_output(), computer.get_output())
+
+        memory = PagedMemory(range(3 * PagedMemory.PAGE_SIZE))
+        snapshot = memory.snapshot()
+        self.assertEqual(memory.get_owned_pages_count(), 0)
+        memory[PagedMemory.PAGE_SIZE] = -1
+        # only the written page was copied
+        self.assertEqual(memory.get_owned_pages_count(), 1)
+        self.assertEqual(snapshot[PagedMemory.PAGE_SIZE], PagedMemory.PAGE_SIZE)
+        self.assertEqual(memory[PagedMemory.PAGE_SIZE], -1)
+
+################################################################################
+
+    def test_permutation_chain_search(self):
+        for test in self.TESTS_AMPLIFIERS:
+            with open(test[self.KEY_FILE_PATH], 'r') as f:
+                program = tuple([int(data.strip())
+                                 for data in f.read().strip().split(',')])
+                phase_settings = test[self.KEY_PHASE_SETTINGS_SEQUENCE]
+                search = PermutationChainSearch(
+                    program, range(len(phase_settings)), test[self.KEY_INPUT])
+                self.assertEqual(
+                    search.run(),
+                    (test[self.KEY_THRUSTER_SIGNAL], tuple(phase_settings)))
+                self.assertEqual(search.get_brute_force_runs_count(), 600)
+                self.assertEqual(
+                    search.get_runs_count() + search.get_saved_runs_count(),
+                    600)
+                self.assertGreater(search.get_saved_runs_count(), 0)
+
+################################################################################
+
+    def test_run_cache(self):
+        with open("../day_05/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+            with TemporaryDirectory() as directory:
+                path = join(directory, "runs")
+                cache = RunCache(max_size=1, path=path)
+                result = cache.run(program, [5])
+                self.assertEqual(result.output_values, (4655956,))
+                self.assertEqual(cache.run(program, [5]), result)
+                self.assertEqual(cache.run(program, [1]).output_values[-1],
+                                 14522484)
+                # dropped from memory, found in the file
+                self.assertEqual(cache.run(program, [5]), result)
+                self.assertEqual(cache.get_hits_count(), 2)
+                self.assertEqual(cache.get_misses_count(), 2)
+                cache.close()
+
+                cache = RunCache(path=path)
+                self.assertEqual(cache.run(program, [5]), result)
+                patched = cache.run(program, [5], {677: 0})
+                self.assertNotEqual(
+                    patched.memory_digest, result.memory_digest)
+                self.assertEqual(cache.get_hits_count(), 1)
+                self.assertEqual(cache.get_misses_count(), 1)
+                cache.close()
+
+################################################################################
+
+    def test_array_memory_overflow(self):
+        program = (1102, 2 ** 32, 2 ** 32, 7, 4, 7, 99, 0)
+        for engine in self.ENGINES:
+            computer = IntcodeComputer(
+                engine=engine, memory=IntcodeComputer.MEMORY_ARRAY)
+            computer.load_program(program)
+            self.assertIsInstance(computer._memory, array)
+            computer.run_sync()
+            self.assertEqual(computer.get_output(), [2 ** 64])
+            self.assertEqual(computer.get_data(7), 2 ** 64)
+
+        computer = IntcodeComputer(memory=IntcodeComputer.MEMORY_ARRAY)
+        computer.load_program((4, 3, 99, 2 ** 70))
+        computer.run_sync()
+        self.assertEqual(computer.get_output(), [2 ** 70])
+
+################################################################################
+
+    def test_paged_memory_growth(self):
+        program = (1101, 5, 6, 10000, 4, 10000, 4, 20000, 99)
+        for engine in self.ENGINES:
+            computer = IntcodeComputer(
+                engine=engine, memory=IntcodeComputer.MEMORY_PAGED)
+            computer.load_program(program)
+            computer.run_sync()
+            self.assertEqual(computer.get_output(), [11, 0])
+            self.assertEqual(computer.get_data(10000), 11)
+            self.assertEqual(computer.get_data(30000), 0)
+            # the program page and the written page, the read one is not
+            # allocated
+            self.assertEqual(computer._memory.get_resident_pages_count(), 2)
+            computer.set_data(40000, 1)
+            self.assertEqual(computer._memory.get_resident_pages_count(), 3)
+            self.assertEqual(len(computer._memory), 40001)
+            # only the written page is allocated, however far it is
+            computer.set_data(10 ** 15, 2)
+            self.assertEqual(computer._memory.get_resident_pages_count(), 4)
+            self.assertEqual(computer.get_data(10 ** 15), 2)
+            self.assertEqual(computer.get_data(10 ** 15 - 1), 0)
+            self.assertEqual(len(computer._memory), 10 ** 15 + 1)
+            # an address that is not an integer is not read as an unwritten
+            # cell
+            self.assertRaises(TypeError, computer.get_data, 10000.0)
+            self.assertRaises(TypeError, computer.get_data, 30000.0)
+
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            self.assertRaises(IndexError, computer.run_sync)
+
+################################################################################
+
+    def test_batch(self):
         with open("../day_02/input.txt", 'r') as f:
             program = tuple([int(data.strip())
                              for data in f.read().strip().split(',')])
-            self.assertEqual(_set_and_run(program, NOUN, VERB), 3654868)
+            combinations = [(noun, verb)
+                            for noun in range(0, NOUN_RANGE, 7)
+                            for verb in range(0, VERB_RANGE, 3)]
+            batch = BatchComputer()
+            batch.load_program(program, len(combinations))
+            batch.set_data(1, [noun for noun, _ in combinations])
+            batch.set_data(2, [verb for _, verb in combinations])
+            batch.run()
+            self.assertEqual(
+                batch.get_data(0),
+                [_set_and_run(program, noun, verb)
+                 for noun, verb in combinations])
+            self.assertFalse(any(batch.get_errors()))
+
+        for test in self.TESTS_OUTPUT:
+            with open(test[self.KEY_FILE_PATH], 'r') as f:
+                program = tuple([
+                    int(data.strip()) for data in f.read().strip().split(',')])
+                batch = BatchComputer()
+                batch.load_program(program, 2)
+                for value in test[self.KEY_INPUT]:
+                    batch.load_input(0, value)
+                batch.run()
+                self.assertEqual(batch.get_output(0), test[self.KEY_OUTPUT])
+                # no input for the second lane
+                self.assertIsInstance(batch.get_errors()[1], RuntimeError)
+
+        # negative addresses count from the memory end in the lanes run
+        # together and in the lanes run one by one, like in the computer
+        program = (1101, 0, 7, -1, 4, -1, 99, 0)
+        addresses = [-1, -2, -8, 7, -9]
+        batch = BatchComputer()
+        batch.load_program(program, len(addresses))
+        batch.set_data(3, addresses)
+        batch.run()
+        for lane, address in enumerate(addresses):
+            computer = IntcodeComputer()
+            computer.load_program(program[:3] + (address,) + program[4:])
+            try:
+                computer.run_sync()
+            except IndexError:
+                self.assertIsInstance(batch.get_errors()[lane], IndexError)
+            else:
+                self.assertIsNone(batch.get_errors()[lane])
+                self.assertEqual(batch.get_output(lane), computer.get_output())
 
 ################################################################################
 
-    def test_day_02_puzzle_2(self):
+    def test_parallel_sweep(self):
         with open("../day_02/input.txt", 'r') as f:
             program = tuple([int(data.strip())
                              for data in f.read().strip().split(',')])
-            combination = [
-                (noun, verb)
-                for noun in range(NOUN_RANGE)
-                for verb in range(VERB_RANGE)
-                if _set_and_run(program, noun, verb) == GRAVITY_ASSIST_GOAL][0]
-            self.assertEqual(100 * combination[0] + combination[1], 7014)
+            self.assertEqual(
+                _find_noun_verb(program, max_workers=2), (70, 14))
+            self.assertEqual(
+                _find_noun_verb(program, _set_and_run(program, 3, 4),
+                                range(5), range(5), 2),
+                (3, 4))
+            self.assertIsNone(
+                _find_noun_verb(program, -1, range(5), range(5), 2))
+            combinations = [(noun, 0) for noun in range(10)]
+            self.assertEqual(
+                sorted(parallel_sweep(program, combinations, _run_combination,
+                                      max_workers=2, chunk_size=3)),
+                [(combination, _set_and_run(program, *combination))
+                 for combination in combinations])
 
 ################################################################################
 
-    def test_day_05_puzzle_1(self):
-        with open("../day_05/input.txt", 'r') as f:
+    def test_symbolic_analysis(self):
+        with open("../day_02/input.txt", 'r') as f:
             program = tuple([int(data.strip())
                              for data in f.read().strip().split(',')])
             computer = IntcodeComputer()
             computer.load_program(program)
-            computer.load_input(1)
-            computer.start()
-            computer.join()
-            output = computer.get_output()
-            self.assertTrue(all([value == 0 for value in output[:-1]]))
-            self.assertEqual(output[-1], 14522484)
+            result = computer.analyze({1: "noun", 2: "verb"})
+            for noun, verb in [(0, 0), (12, 2), (70, 14), (99, 99)]:
+                self.assertEqual(
+                    result.memory[0].evaluate({"noun": noun, "verb": verb}),
+                    _set_and_run(program, noun, verb))
+            self.assertEqual(_solve_noun_verb(program), (70, 14))
+            self.assertIsNone(
+                _solve_noun_verb(program, -1, range(5), range(5)))
+
+        # the output depends on the input through a comparison
+        with open("tests/test_05_04.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+            computer = IntcodeComputer()
+            computer.load_program(program)
+            computer.load_input(8)
+            self.assertRaises(
+                SymbolicValueError, computer.analyze, {10: "x"})
+
+        # the analysis goes on from where the computer stopped
+        computer = IntcodeComputer()
+        computer.load_program((1101, 1, 1, 13, 1, 13, 14, 15, 4, 15, 99,
+                               0, 0, 0, 0, 0))
+        computer.set_budget(1)
+        computer.run_sync()
+        self.assertEqual(computer.analyze({14: "x"}).output_values,
+                         [Polynomial.symbol("x") + 2])
+
+        # reads out of the memory and missing input values
+        computer = IntcodeComputer()
+        computer.load_program((4, 50, 99))
+        self.assertRaises(SymbolicValueError, computer.analyze, {})
+        computer = IntcodeComputer()
+        computer.load_program((3, 0, 99))
+        self.assertRaises(SymbolicValueError, computer.analyze, {})
+
+        x = Polynomial.symbol("x")
+        y = Polynomial.symbol("y")
+        self.assertEqual(x * x + -1 * x * x, 0)
+        self.assertEqual(
+            solve(x * y + 3, 15, {"x": range(10), "y": range(10)}),
+            {"x": 2, "y": 6})
+        self.assertEqual(
+            solve(y * y + x, 27, {"x": range(10), "y": range(10)}),
+            {"x": 2, "y": 5})
 
 ################################################################################
 
-    def test_day_05_puzzle_2(self):
-        with open("../day_05/input.txt", 'r') as f:
+    def test_optimizer(self):
+        # x = 3; do { y = ((y * 2 + 3) * 2) + 1; x -= 1 } while x; output y
+        program = (1101, 0, 3, 40,
+                   1002, 41, 2, 41,
+                   1001, 41, 3, 41,
+                   1002, 41, 2, 41,
+                   1001, 41, 1, 41,
+                   1001, 40, -1, 40,
+                   1005, 40, 4,
+                   4, 41,
+                   99) + (0,) * 10 + (0, 1)
+        analysis = analyze_program(program)
+        self.assertTrue(analysis.is_static())
+        self.assertEqual(sorted(analysis.blocks), [0, 4, 27])
+        self.assertEqual(analysis.blocks[4].successors, (4, 27))
+        self.assertEqual(analysis.loops, (Loop(4, (4,)),))
+        self.assertEqual(analysis.written_cells, {40, 41})
+        optimized, report = optimize_program(program)
+        self.assertEqual(report.folded_chains, ((4, 20),))
+        self.assertEqual(report.removed_instructions_count, 1)
+        for engine in self.ENGINES:
+            outputs = []
+            for memory in (program, optimized):
+                computer = IntcodeComputer(engine=engine)
+                computer.load_program(memory)
+                computer.run_sync()
+                outputs.append(computer.get_output())
+            self.assertEqual(outputs[0], outputs[1])
+
+        # the Day 7 program jumps through a cell it writes, but once the
+        # phase setting is read, the rest of it is static
+        with open("../day_07/input.txt", 'r') as f:
             program = tuple([int(data.strip())
                              for data in f.read().strip().split(',')])
+            self.assertEqual(
+                analyze_program(program).modified_code_cells, {8})
             computer = IntcodeComputer()
             computer.load_program(program)
+            computer.load_input(4)
+            computer.run_until_input()
+            snapshot = computer.snapshot()
+            report = computer.optimize()
+            self.assertTrue(report.analysis.is_static())
+            self.assertGreater(report.removed_instructions_count, 0)
+            for input_value in range(-50, 50):
+                outputs = []
+                for optimize in (False, True):
+                    computer.restore(snapshot)
+                    if optimize:
+                        computer.optimize()
+                    computer.load_input(input_value)
+                    computer.run_sync()
+                    outputs.append(computer.get_output())
+                self.assertEqual(outputs[0], outputs[1])
+
+        # Day 5 patches its own instruction with the input, it stays as it is
+        with open("../day_05/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+            optimized, report = optimize_program(program)
+            self.assertFalse(report.analysis.is_static())
+            self.assertEqual(optimized, program)
+
+################################################################################
+
+    def test_fusion(self):
+        # x = 0; do { x += 1; y = x < 10 } while y; output x
+        program = (1101, 0, 0, 20,
+                   1001, 20, 1, 20,
+                   1007, 20, 10, 21,
+                   1005, 21, 4,
+                   4, 20,
+                   99, 0, 0, 0, 0)
+        computer = IntcodeComputer(engine=IntcodeComputer.ENGINE_FUSED)
+        computer.load_program(program)
+        computer.run_sync()
+        self.assertEqual(computer.get_output(), [10])
+        report = computer.get_fusion_report()
+        # the first pass runs 1101 + 1001 + 1007 + 1005 from the start
+        self.assertEqual(report.fires, {(1, 1, 7, 5): 1, (1, 7, 5): 9})
+        self.assertEqual(report.saved_dispatches_count, 3 + 9 * 2)
+        self.assertEqual(
+            IntcodeComputer().get_fusion_report().saved_dispatches_count, 0)
+
+        # the loop patches the increment of its own superinstruction
+        program = (1101, 0, 0, 22,
+                   1001, 22, 1, 22,
+                   1007, 22, 11, 23,
+                   1101, 0, 3, 6,
+                   1005, 23, 4,
+                   4, 22,
+                   99, 0, 0)
+        outputs = []
+        for engine in self.ENGINES:
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            computer.run_sync()
+            outputs.append(computer.get_output())
+        self.assertEqual(outputs, [[13]] * len(self.ENGINES))
+
+        # the superinstruction writes an invalid heading into the instruction
+        # that ended it, the instruction must not stay decoded
+        program = (101, 10, 10, 8, 1, 8, 6, 0, 1001, 9, 7, 3, 3, 2, 6, 5, 0,
+                   99)
+        for engine in self.ENGINES:
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            self.assertRaises(KeyError, computer.run_sync)
+
+        # the value overflows the array memory and lands in an operand of
+        # another superinstruction, which must be dropped all the same
+        program = (1001, 30, 0, 32, 1001, 32, 0, 32, 4, 31,
+                   1002, 33, 2 ** 62, 1, 1001, 31, 1, 31, 1105, 1, 0)
+        program += (0,) * (30 - len(program)) + (7, 0, 0, 2)
+        for engine in self.ENGINES:
+            computer = IntcodeComputer(
+                engine=engine, memory=IntcodeComputer.MEMORY_ARRAY)
+            computer.load_program(program)
+            self.assertRaises(IndexError, computer.run_sync)
+            self.assertEqual(computer.get_output(), [0])
+
+################################################################################
+
+    def test_profiler(self):
+        with open("../day_05/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+        for engine in self.ENGINES:
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
             computer.load_input(5)
-            computer.start()
+            profiler = computer.enable_profiling()
+            computer.run_sync()
+            self.assertEqual(computer.get_output(), [4655956])
+            opcode_stats = profiler.get_opcode_stats()
+            self.assertEqual(opcode_stats[3].count, 1)
+            self.assertEqual(opcode_stats[4].count, 1)
+            self.assertEqual(opcode_stats[99].count, 1)
+            self.assertEqual(profiler.get_address_stats()[0].count, 1)
+            self.assertEqual(
+                sum([stats.count for stats in opcode_stats.values()]),
+                sum([stats.count
+                     for stats in profiler.get_mode_stats().values()]))
+            self.assertIs(computer.disable_profiling(), profiler)
+
+        with TemporaryDirectory() as directory:
+            profiler.save_json(join(directory, "profile.json"))
+            with open(join(directory, "profile.json"), 'r') as f:
+                report = load(f)
+            self.assertEqual(report["opcodes"]["3"],
+                             {"name": "save_input", "count": 1,
+                              "time": opcode_stats[3].time})
+            self.assertEqual(report["instructions_count"], sum(
+                [stats.count for stats in opcode_stats.values()]))
+            profiler.save_collapsed(join(directory, "profile.folded"))
+            with open(join(directory, "profile.folded"), 'r') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), len(profiler.to_collapsed()))
+            self.assertTrue(lines[0].startswith("intcode;save_input;-;@0 "))
+
+        # a computer waiting for its input in a thread
+        computer = IntcodeComputer()
+        computer.load_program(program)
+        profiler = computer.enable_profiling(Profiler())
+        computer.start()
+        sleep(0.05)
+        computer.load_input(1)
+        computer.join()
+        self.assertEqual(profiler.get_input_wait().count, 1)
+        self.assertGreater(profiler.get_input_wait().time, 0.01)
+        self.assertLess(profiler.get_opcode_stats()[3].time,
+                        profiler.get_input_wait().time)
+        self.assertTrue(profiler.to_collapsed()[-1].startswith(
+            "intcode;input_wait "))
+
+################################################################################
+
+    def test_tracer(self):
+        with open("../day_05/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+        with TemporaryDirectory() as directory:
+            path = join(directory, "trace.bin")
+            stream = StringIO()
+            computer = IntcodeComputer(engine=IntcodeComputer.ENGINE_COMPILER)
+            computer.load_program(program)
+            computer.load_input(5)
+            tracer = computer.enable_tracing(
+                Tracer(8, path, dump_on_halt=True, stream=stream))
+            computer.run_sync()
+            tracer.close()
+            self.assertEqual(computer.get_output(), [4655956])
+
+            records = tracer.get_records()
+            self.assertEqual(len(records), 8)
+            self.assertEqual(records[-1].opcode, 99)
+            self.assertEqual(records[-1].step, tracer.get_steps_count() - 1)
+            self.assertEqual([record.step for record in records],
+                             list(range(records[0].step,
+                                        tracer.get_steps_count())))
+            self.assertEqual(stream.getvalue().splitlines(),
+                             [str(record) for record in records])
+
+            # the file holds the whole trace
+            streamed = list(read_trace(path))
+            self.assertEqual([record.step for record in streamed],
+                             list(range(tracer.get_steps_count())))
+            self.assertEqual(streamed[-8:], records)
+            self.assertEqual(streamed[0].opcode, 3)
+            self.assertEqual(streamed[0].write, (225, 5))
+
+        # the value does not fit in 64 bits, the failing write is dumped
+        stream = StringIO()
+        computer = IntcodeComputer()
+        computer.load_program((1102, 1 << 62, 4, 9, 1101, 0, 0, 100, 99, 0))
+        tracer = computer.enable_tracing(Tracer(4, stream=stream))
+        self.assertRaises(IndexError, computer.run_sync)
+        self.assertEqual(tracer.get_records()[0].write, (9, 1 << 64))
+        self.assertIn("failed at 4", stream.getvalue())
+        self.assertIs(computer.disable_tracing(), tracer)
+
+################################################################################
+
+    def test_channels(self):
+        channel = Channel([1], capacity=2)
+        channel.put(2)
+        self.assertTrue(channel.is_full())
+        self.assertRaises(ChannelFull, channel.put, 3, False)
+        self.assertRaises(ChannelFull, channel.put, 3, True, 0.01)
+        self.assertEqual([channel.get(), channel.get()], [1, 2])
+        self.assertRaises(ChannelEmpty, channel.get, False)
+        self.assertRaises(ChannelEmpty, channel.get, True, 0.01)
+
+        # the output channel of every amplifier is the input channel of the
+        # next one, the amplifiers run in their own threads
+        with open("../day_07/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+        phase_settings = PHASE_SETTINGS_FEEDBACK_LOOP[7]
+        channels = [Channel([setting]) for setting in phase_settings]
+        channels[0].put(INPUT_SIGNAL)
+        computers = []
+        for i in range(len(phase_settings)):
+            computer = IntcodeComputer()
+            computer.load_program(program)
+            computer.set_input_channel(channels[i])
+            computer.set_output_channel(channels[(i + 1) % len(channels)])
+            computers.append(computer)
+        [computer.start() for computer in computers]
+        [computer.join() for computer in computers]
+        self.assertIs(computers[0].get_input_channel(), channels[0])
+        self.assertIs(computers[-1].get_output_channel(), channels[0])
+        self.assertEqual(channels[0].get_values(),
+                         [_amplify_feedback_loop(program, phase_settings)])
+
+        # backpressure: the program stops while its output channel is full
+        program = (104, 1, 104, 2, 104, 3, 99)
+        for engine in self.ENGINES:
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            computer.set_output_channel(Channel(capacity=1))
+            self.assertEqual(computer.run_until_input(),
+                             IntcodeComputer.STATUS_WAITING_OUTPUT)
+            values = [computer.get_output_channel().get()]
+            while computer.run_until_input() \
+                    != IntcodeComputer.STATUS_HALTED:
+                values.append(computer.get_output_channel().get())
+            values += computer.get_output()
+            self.assertEqual(values, [1, 2, 3])
+            computer.load_program(program)
+            computer.set_output_channel(Channel(capacity=2))
+            self.assertRaises(RuntimeError, computer.run_sync)
+
+################################################################################
+
+    def test_async(self):
+        with open("../day_07/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+
+        # Day 7 ring, the last amplifier also feeds the thrusters
+        for engine in self.ENGINES:
+            for phase_settings in PHASE_SETTINGS_FEEDBACK_LOOP[:10]:
+                computers = [AsyncIntcodeComputer(engine=engine)
+                             for _ in phase_settings]
+                scheduler = AsyncScheduler()
+                thrusters = AsyncChannel()
+                for computer, setting in zip(computers, phase_settings):
+                    computer.load_program(program)
+                    computer.load_input(setting)
+                    scheduler.add_computer(computer)
+                scheduler.connect_ring()
+                scheduler.connect(computers[-1], thrusters)
+                computers[0].load_input(INPUT_SIGNAL)
+                scheduler.run()
+                self.assertEqual(
+                    thrusters.get_values()[-1],
+                    _amplify_feedback_loop(program, phase_settings))
+
+        # long chain of mostly idle computers incrementing the value
+        computers = [AsyncIntcodeComputer() for _ in range(1000)]
+        scheduler = AsyncScheduler()
+        for computer in computers:
+            computer.load_program((3, 9, 1001, 9, 1, 9, 4, 9, 99, 0))
+            scheduler.add_computer(computer)
+        for source, destination in zip(computers, computers[1:]):
+            scheduler.connect(source, destination)
+        computers[0].load_input(0)
+        scheduler.run()
+        self.assertEqual(computers[-1].get_output(), [1000])
+
+        # fan-in
+        sources = [AsyncIntcodeComputer() for _ in range(2)]
+        adder = AsyncIntcodeComputer()
+        sources[0].load_program((104, 1, 99))
+        sources[1].load_program((104, 2, 99))
+        adder.load_program((3, 11, 3, 12, 1, 11, 12, 13, 4, 13, 99, 0, 0, 0))
+        scheduler = AsyncScheduler()
+        for computer in sources + [adder]:
+            scheduler.add_computer(computer)
+        for source in sources:
+            scheduler.connect(source, adder)
+        scheduler.run()
+        self.assertEqual(adder.get_output(), [3])
+
+        # deadlock
+        computers = [AsyncIntcodeComputer() for _ in range(2)]
+        scheduler = AsyncScheduler()
+        for computer in computers:
+            computer.load_program((3, 0, 4, 0, 99))
+            scheduler.add_computer(computer)
+        scheduler.connect_ring()
+        self.assertRaises(RuntimeError, scheduler.run)
+
+        # one computer awaiting an input value loaded by another thread and a
+        # bounded output channel read by another coroutine
+        async def consume(channel: AsyncChannel) -> list:
+            return [await channel.get_async() for _ in range(3)]
+
+        async def run_computer() -> list:
+            computer = AsyncIntcodeComputer()
+            computer.load_program((3, 0, 4, 0, 4, 0, 4, 0, 99))
+            computer.set_output_channel(AsyncChannel(capacity=1))
+            Thread(target=lambda: (sleep(0.05), computer.load_input(7))).start()
+            status, values = await gather(
+                computer.run_async(),
+                consume(computer.get_output_channel()))
+            self.assertEqual(status, IntcodeComputer.STATUS_HALTED)
+            return values
+
+        self.assertEqual(run(run_computer()), [7, 7, 7])
+
+################################################################################
+
+    def test_output_sink(self):
+        with open("../day_05/input.txt", 'r') as f:
+            program = tuple([int(data.strip())
+                             for data in f.read().strip().split(',')])
+
+        for engine in self.ENGINES:
+            # function
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            computer.load_input(AIR_CONDITIONER_ID)
+            output = []
+            computer.set_output_sink(output.append)
+            self.assertEqual(computer.run_sync(),
+                             IntcodeComputer.STATUS_HALTED)
+            self.assertEqual(output, [0] * 9 + [14522484])
+            self.assertEqual(computer.get_output(), [])
+
+            # generator returning after three values stops the program, it
+            # resumes where it stopped
+            def take_three():
+                for _ in range(3):
+                    output.append((yield))
+
+            output = []
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            computer.load_input(AIR_CONDITIONER_ID)
+            computer.set_output_sink(take_three())
+            self.assertEqual(computer.run_sync(),
+                             IntcodeComputer.STATUS_STOPPED)
+            self.assertFalse(computer.is_halted())
+            self.assertEqual(output, [0, 0, 0])
+            computer.set_output_sink(None)
+            self.assertEqual(computer.run_sync(),
+                             IntcodeComputer.STATUS_HALTED)
+            self.assertEqual(computer.get_output(), [0] * 6 + [14522484])
+
+            # a stop between the runs does not halt the program, it stops the
+            # next run before its first instruction
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            computer.load_input(AIR_CONDITIONER_ID)
+            computer.stop()
+            self.assertFalse(computer.is_halted())
+            self.assertEqual(computer.run_sync(),
+                             IntcodeComputer.STATUS_STOPPED)
+            self.assertEqual(computer.get_output(), [])
+            self.assertEqual(computer.run_sync(),
+                             IntcodeComputer.STATUS_HALTED)
+            computer.stop()
+            self.assertTrue(computer.is_halted())
+            self.assertEqual(computer.run_sync(),
+                             IntcodeComputer.STATUS_HALTED)
+
+            # removing the sink keeps notifying the output condition
+            condition = Condition()
+            computer = IntcodeComputer(condition, engine)
+            computer.load_program(program)
+            computer.load_input(AIR_CONDITIONER_ID)
+            computer.set_output_sink(output.append)
+            computer.set_output_sink(None)
+            with condition:
+                computer.start()
+                self.assertTrue(condition.wait(5))
             computer.join()
-            self.assertEqual(computer.get_output()[0], 4655956)
+            self.assertEqual(computer.get_output(), [0] * 9 + [14522484])
+
+            # channel
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            computer.load_input(THERMAL_RADIATOR_ID)
+            channel = Channel()
+            computer.set_output_sink(channel)
+            computer.run_sync()
+            self.assertEqual(channel.get_values(), [4655956])
+
+            # no one waits on the channels, no lock is taken
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(program)
+            computer.load_input(AIR_CONDITIONER_ID)
+            computer.get_input_channel()._condition = None
+            computer.get_output_channel()._condition = None
+            computer.run_sync()
+            self.assertEqual(len(computer.get_output_channel()), 10)
+
+        self.assertEqual(_run_diagnostics(program, AIR_CONDITIONER_ID),
+                         14522484)
+        self.assertEqual(_run_diagnostics(program, THERMAL_RADIATOR_ID),
+                         4655956)
+        # a failed test, no diagnostic code
+        self.assertRaises(RuntimeError, _run_diagnostics,
+                          (104, 7, 104, 0, 99), AIR_CONDITIONER_ID)
+        self.assertRaises(RuntimeError, _run_diagnostics,
+                          (104, 0, 99), AIR_CONDITIONER_ID)
+
+################################################################################
+
+    def test_pool(self):
+        programs = []
+        for path in ("../day_02/input.txt", "../day_05/input.txt",
+                     "../day_07/input.txt"):
+            with open(path, 'r') as f:
+                programs.append(tuple([
+                    int(data.strip())
+                    for data in f.read().strip().split(',')]))
+        day_02, day_05, day_07 = programs
+        jobs = [Job(day_02, ((1, noun), (2, verb)), read_addresses=(0,))
+                for noun in range(0, 100, 19) for verb in range(0, 100, 23)]
+        jobs += [Job(day_05, inputs=(AIR_CONDITIONER_ID,)),
+                 Job(day_05, inputs=(THERMAL_RADIATOR_ID,)),
+                 # fails, the input is missing
+                 Job(day_07, inputs=(0,)),
+                 Job(day_07, inputs=(3, 14))]
+
+        for engine in self.ENGINES:
+            for memory in self.MEMORY_TYPES:
+                pool = MachinePool(2, engine, memory)
+                results = pool.run_batch(jobs)
+                self.assertEqual(len(results), len(jobs))
+                for job, result in zip(jobs, results):
+                    computer = IntcodeComputer(engine=engine, memory=memory)
+                    computer.load_program(job.program)
+                    for address, value in job.patches:
+                        computer.set_data(address, value)
+                    for input_value in job.inputs:
+                        computer.load_input(input_value)
+                    try:
+                        computer.run_sync()
+                        self.assertIsNone(result.error)
+                        self.assertEqual(result.status,
+                                         IntcodeComputer.STATUS_HALTED)
+                    except (IndexError, KeyError, RuntimeError) as error:
+                        self.assertEqual(type(result.error), type(error))
+                        self.assertIsNone(result.status)
+                    self.assertEqual(list(result.output),
+                                     computer.get_output())
+                    self.assertEqual(
+                        list(result.data),
+                        [computer.get_data(address)
+                         for address in job.read_addresses])
+                self.assertEqual(results[-4].output[-1], 14522484)
+                self.assertIsInstance(results[-2].error, RuntimeError)
+
+        # the computers are reused, threads share the pool
+        pool = MachinePool(2)
+        computers = [pool.acquire(), pool.acquire()]
+        [pool.release(computer) for computer in computers]
+        outputs = []
+        threads = [Thread(target=lambda: outputs.append(
+            pool.run_batch([Job(day_07, inputs=(4, 0))] * 50)))
+            for _ in range(4)]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+        self.assertEqual(len(outputs), 4)
+        self.assertTrue(all([result.output == outputs[0][0].output
+                             for results in outputs for result in results]))
+        self.assertIn(pool.acquire(), computers)
+
+        # a stop requested after the last job does not stop the next one
+        pool = MachinePool()
+        computer = pool.acquire()
+        computer.load_program(day_05)
+        computer.load_input(THERMAL_RADIATOR_ID)
+        computer.run_sync()
+        computer.stop()
+        pool.release(computer)
+        result = pool.run(Job(day_07, inputs=(4, 0), budget=10))
+        self.assertEqual(result.status,
+                         IntcodeComputer.STATUS_BUDGET_EXHAUSTED)
+        computer = pool.acquire()
+        computer.stop()
+        pool.release(computer)
+        result = pool.run(Job(day_07, inputs=(0,)))
+        self.assertIsInstance(result.error, RuntimeError)
+        result = pool.run(Job(day_07, inputs=(4, 0)))
+        self.assertEqual(result.status, IntcodeComputer.STATUS_HALTED)
+        self.assertEqual(result.output, outputs[0][0].output)
+
+################################################################################
+
+    def test_limits(self):
+        # jumps to itself forever
+        program = (1105, 1, 0)
+        for engine in self.ENGINES:
+            for memory in self.MEMORY_TYPES:
+                computer = IntcodeComputer(engine=engine, memory=memory)
+                computer.load_program(program)
+                computer.set_budget(1000)
+                self.assertEqual(computer.run_sync(),
+                                 IntcodeComputer.STATUS_BUDGET_EXHAUSTED)
+                steps_count = computer.get_steps_count()
+                self.assertTrue(0 < steps_count <= 1000)
+                computer.set_budget(500)
+                self.assertEqual(computer.run_until_output(),
+                                 IntcodeComputer.STATUS_BUDGET_EXHAUSTED)
+                self.assertTrue(
+                    steps_count < computer.get_steps_count()
+                    <= steps_count + 500)
+                computer.set_budget(None)
+                computer.set_deadline(0.01)
+                self.assertEqual(computer.run_sync(),
+                                 IntcodeComputer.STATUS_DEADLINE_EXCEEDED)
+                computer.load_program(program)
+                self.assertEqual(computer.get_steps_count(), 0)
+
+        # a program stopped by its budget resumes where it stopped
+        with open("../day_05/input.txt", 'r') as f:
+            day_05 = tuple([int(data.strip())
+                            for data in f.read().strip().split(',')])
+        for engine in self.ENGINES:
+            computer = IntcodeComputer(engine=engine)
+            computer.load_program(day_05)
+            computer.load_input(THERMAL_RADIATOR_ID)
+            computer.set_budget(50)
+            self.assertEqual(computer.run_sync(),
+                             IntcodeComputer.STATUS_BUDGET_EXHAUSTED)
+            self.assertLessEqual(computer.get_steps_count(), 50)
+            computer.set_budget(None)
+            self.assertEqual(computer.run_sync(),
+                             IntcodeComputer.STATUS_HALTED)
+            self.assertEqual(computer.get_output(), [4655956])
+
+        # every engine counts the instructions of self-modifying programs alike
+        day_02 = read_program("../day_02/input.txt")
+        self_modifying = read_program("tests/test_self_modifying_01.txt")
+        for loaded, inputs, steps_count in ((day_02, (), 45),
+                                            (day_05, (1,), 62),
+                                            (day_05, (5,), 103),
+                                            (self_modifying, (), 9)):
+            for engine in self.ENGINES:
+                for memory in self.MEMORY_TYPES:
+                    computer = IntcodeComputer(engine=engine, memory=memory)
+                    for budget in (steps_count, 2 * steps_count, None):
+                        computer.load_program(loaded)
+                        for input_value in inputs:
+                            computer.load_input(input_value)
+                        computer.set_budget(budget)
+                        self.assertEqual(computer.run_sync(),
+                                         IntcodeComputer.STATUS_HALTED)
+                        self.assertEqual(computer.get_steps_count(),
+                                         steps_count)
+                    computer.load_program(loaded)
+                    for input_value in inputs:
+                        computer.load_input(input_value)
+                    computer.set_budget(steps_count - 1)
+                    self.assertEqual(computer.run_sync(),
+                                     IntcodeComputer.STATUS_BUDGET_EXHAUSTED)
+                    self.assertLess(computer.get_steps_count(), steps_count)
+                    computer.set_budget(None)
+                    self.assertEqual(computer.run_sync(),
+                                     IntcodeComputer.STATUS_HALTED)
+                    self.assertEqual(computer.get_steps_count(), steps_count)
+
+        # a thread waiting for an input value gives up at the deadline, or
+        # when it is stopped
+        for stop in (False, True):
+            computer = IntcodeComputer()
+            computer.load_program((3, 0, 4, 0, 99))
+            if not stop:
+                computer.set_deadline(0.1)
+            computer.start()
+            sleep(0.01)
+            self.assertTrue(computer.is_waiting())
+            if stop:
+                computer.stop()
+            computer.join(5)
+            self.assertFalse(computer.is_alive())
+            self.assertFalse(computer.is_halted())
+            self.assertFalse(computer.is_waiting())
+
+        # two computers waiting for each other
+        channels = [Channel(), Channel()]
+        computers = []
+        for i in range(2):
+            computer = IntcodeComputer()
+            computer.load_program((3, 0, 4, 0, 99))
+            computer.set_input_channel(channels[i])
+            computer.set_output_channel(channels[1 - i])
+            computers.append(computer)
+        [computer.start() for computer in computers]
+        self.assertRaises(RuntimeError, join_network, computers)
+        self.assertFalse(any([computer.is_alive() for computer in computers]))
+        channels = [Channel([7]), Channel()]
+        computers = []
+        for i in range(2):
+            computer = IntcodeComputer()
+            computer.load_program((3, 0, 4, 0, 99))
+            computer.set_input_channel(channels[i])
+            computer.set_output_channel(channels[1 - i])
+            computers.append(computer)
+        [computer.start() for computer in computers]
+        join_network(computers)
+        self.assertEqual(channels[0].get_values(), [7])
+
+        # the scheduler and the pool pass the status on
+        scheduler = Scheduler()
+        for _ in range(2):
+            computer = IntcodeComputer()
+            computer.load_program(program)
+            computer.set_budget(100)
+            scheduler.add_computer(computer)
+        scheduler.connect_ring()
+        self.assertEqual(scheduler.run(),
+                         IntcodeComputer.STATUS_BUDGET_EXHAUSTED)
+        pool = MachinePool()
+        result = pool.run(Job(program, budget=100))
+        self.assertEqual(result.status,
+                         IntcodeComputer.STATUS_BUDGET_EXHAUSTED)
+        self.assertIsNone(result.error)
+        result = pool.run(Job(program, timeout=0.01))
+        self.assertEqual(result.status,
+                         IntcodeComputer.STATUS_DEADLINE_EXCEEDED)
+        self.assertEqual(pool.run(Job(day_05, inputs=(1,), budget=10 ** 6))
+                         .output[-1], 14522484)
+
+################################################################################
+
+    def test_program_image(self):
+        with TemporaryDirectory() as directory:
+            for day in ("02", "05", "07"):
+                text_path = "../day_%s/input.txt" % day
+                image_path = join(directory, "day_%s.bin" % day)
+                with open(text_path, 'r') as f:
+                    program = parse_program(f.read())
+                self.assertEqual(
+                    convert_text_to_image(text_path, image_path), len(program))
+                self.assertTrue(is_image(image_path))
+                self.assertFalse(is_image(text_path))
+                self.assertEqual(read_program(image_path), program)
+                self.assertIs(read_program(text_path), read_program(text_path))
+
+                # one mapping, one program tuple
+                image = open_image(image_path)
+                self.assertIs(open_image(image_path), image)
+                self.assertIs(read_program(image_path), image.get_program())
+                self.assertEqual(len(image), len(program))
+                self.assertTrue(image.get_cells().readonly)
+                self.assertEqual(image.get_cells().tolist(), list(program))
+                self.assertIs(loads(dumps(image)), image)
+                inputs = {"02": (), "05": (THERMAL_RADIATOR_ID,),
+                          "07": (3, INPUT_SIGNAL)}[day]
+                for engine in self.ENGINES:
+                    for memory in self.MEMORY_TYPES:
+                        computers = []
+                        for loaded in (image.get_program(), program):
+                            computer = IntcodeComputer(engine=engine,
+                                                       memory=memory)
+                            computer.load_program(loaded)
+                            if day == "02":
+                                computer.set_data(1, NOUN)
+                                computer.set_data(2, VERB)
+                            for input_value in inputs:
+                                computer.load_input(input_value)
+                            computer.run_sync()
+                            computers.append(computer)
+                        self.assertEqual(computers[0].get_output(),
+                                         computers[1].get_output())
+                        self.assertEqual(list(computers[0]._memory),
+                                         list(computers[1]._memory))
+                        # the image stays as it was
+                        self.assertEqual(image.get_cells().tolist(),
+                                         list(program))
+
+            self.assertEqual(_set_and_run(read_program(
+                join(directory, "day_02.bin")), NOUN, VERB), 3654868)
+
+            # the workers map the image themselves
+            image = open_image(join(directory, "day_07.bin"))
+            self.assertEqual(
+                parallel_max_search(image, PHASE_SETTINGS_FEEDBACK_LOOP,
+                                    _amplify_feedback_loop, 2)[0],
+                6489132)
+
+            # a changed file is read again
+            write_image((1101, 1, 2, 0, 99), join(directory, "day_02.bin"))
+            self.assertEqual(read_program(join(directory, "day_02.bin")),
+                             (1101, 1, 2, 0, 99))
+            with open(join(directory, "text.bin"), 'wb') as f:
+                f.write(b"1,0,0,0,99")
+            self.assertRaises(ValueError, ProgramImage,
+                              join(directory, "text.bin"))
+            self.assertRaises(OverflowError, write_image, (2 ** 64,),
+                              join(directory, "big.bin"))
+
+################################################################################
+
+    def test_checkpoint(self):
+        program = read_program("../day_05/input.txt")
+        with TemporaryDirectory() as directory:
+            path = join(directory, "checkpoint.bin")
+            for engine in self.ENGINES:
+                for memory in self.MEMORY_TYPES:
+                    for max_increments in (2, 64):
+                        expected = IntcodeComputer(engine=engine,
+                                                   memory=memory)
+                        expected.load_program(program)
+                        expected.load_input(THERMAL_RADIATOR_ID)
+                        expected.run_sync()
+
+                        computer = IntcodeComputer(engine=engine,
+                                                   memory=memory)
+                        computer.load_program(program)
+                        computer.load_input(THERMAL_RADIATOR_ID)
+                        checkpointer = Checkpointer(
+                            computer, path, max_increments)
+                        pages_counts = []
+                        snapshots = []
+                        status = None
+                        while status != IntcodeComputer.STATUS_HALTED:
+                            computer.set_budget(10)
+                            status = computer.run_sync()
+                            pages_counts.append(checkpointer.checkpoint())
+                            snapshots.append(computer.snapshot())
+                            if len(snapshots) == 5:
+                                # a new computer continues where this one is
+                                restored = IntcodeComputer(engine=engine,
+                                                           memory=memory)
+                                restored.restore(read_checkpoint(path))
+                                restored.run_sync()
+                                self.assertEqual(restored.get_output(),
+                                                 expected.get_output())
+                                self.assertEqual(list(restored._memory),
+                                                 list(expected._memory))
+                        self.assertEqual(
+                            checkpointer.get_checkpoints_count(),
+                            len(snapshots))
+                        # the first checkpoint writes all three pages, the
+                        # others only the pages written in between
+                        self.assertEqual(pages_counts[0], 3)
+                        self.assertLess(sum(pages_counts[1:]),
+                                        3 * (len(pages_counts) - 1))
+                        snapshot = read_checkpoint(path)
+                        self.assertEqual(snapshot.program, program)
+                        self.assertEqual(list(snapshot.memory),
+                                         list(expected._memory))
+                        self.assertEqual(snapshot.output_values,
+                                         tuple(expected.get_output()))
+                        self.assertEqual(snapshot.instruction_pointer,
+                                         expected._instruction_pointer)
+                        self.assertTrue(snapshot.exit_flag)
+
+                        # the last record is cut short, the one before counts
+                        if len(snapshots) % (max_increments + 1) != 1:
+                            with open(path, 'rb+') as f:
+                                f.truncate(getsize(path) - 1)
+                            snapshot = read_checkpoint(path)
+                            self.assertEqual(list(snapshot.memory),
+                                             list(snapshots[-2].memory))
+                            self.assertEqual(
+                                snapshot.instruction_pointer,
+                                snapshots[-2].instruction_pointer)
+                            self.assertEqual(snapshot.output_values,
+                                             snapshots[-2].output_values)
+
+            # values not fitting in 64 bits, pending input values
+            computer = IntcodeComputer()
+            computer.load_program((1102, 2 ** 40, 2 ** 40, 9, 3, 10, 99, 0, 0,
+                                   0, 0))
+            computer.load_input(-1)
+            computer.load_input(2 ** 70)
+            checkpointer = Checkpointer(computer, path)
+            checkpointer.checkpoint()
+            computer.set_budget(1)
+            computer.run_sync()
+            self.assertEqual(checkpointer.checkpoint(), 1)
+            restored = IntcodeComputer()
+            restored.restore(read_checkpoint(path))
+            self.assertEqual(restored.get_data(9), 2 ** 80)
+            self.assertEqual(list(restored.get_input_channel()),
+                             [-1, 2 ** 70])
+            restored.run_sync()
+            self.assertEqual(restored.get_data(10), -1)
+
+            # a restore drops the pages written since its snapshot (and then
+            # shrinks the memory as well), the next checkpoint is full
+            computer = IntcodeComputer(memory=IntcodeComputer.MEMORY_PAGED)
+            computer.load_program(program)
+            computer.set_data(3000, 5)
+            before = computer.snapshot()
+            checkpointer = Checkpointer(computer, path)
+            for address in (2000, 4000):
+                computer.set_data(address, 7)
+                checkpointer.checkpoint()
+                computer.restore(before)
+                checkpointer.checkpoint()
+                snapshot = read_checkpoint(path)
+                self.assertEqual(list(snapshot.memory), list(before.memory))
+
+            # a memory created from the pages of another one shares them
+            # copy-on-write
+            pages = snapshot.memory.get_pages()
+            memory = PagedMemory.from_pages(pages, len(snapshot.memory))
+            memory[0] = 1
+            memory[3000] = 1
+            self.assertEqual(snapshot.memory[0], program[0])
+            self.assertEqual(snapshot.memory[3000], 5)
+            self.assertIs(snapshot.memory.get_pages()[0], pages[0])
+
+            with open(path, 'wb') as f:
+                f.write(b"1,0,0,0,99")
+            self.assertRaises(ValueError, read_checkpoint, path)
+
+################################################################################
+
+    def test_benchmark(self):
+        cases = create_cases("..", 200)
+        results = run_benchmarks(cases, repeat=3)
+        self.assertEqual(len(results), len(cases) * len(self.ENGINES))
+        for result in results:
+            self.assertGreater(result.instructions, 0)
+            self.assertGreater(result.instructions_per_second, 0)
+            self.assertLessEqual(result.latency_p50, result.latency_p90)
+            self.assertLessEqual(result.latency_p90, result.latency_p99)
+            self.assertGreater(result.peak_memory, 0)
+        # the engines are rated by the instructions the interpreter counts
+        for name in cases:
+            self.assertEqual(len(set([result.instructions
+                                      for result in results
+                                      if result.case == name])), 1)
+        self.assertEqual(
+            [result.instructions for result in results
+             if result.case == "loop"], [401] * len(self.ENGINES))
+
+        with TemporaryDirectory() as directory:
+            path = join(directory, "baseline.json")
+            save_results(results, path)
+            self.assertEqual(load_results(path), results)
+            self.assertEqual(compare_results(results, results), [])
+            slower = [result._replace(
+                instructions_per_second=result.instructions_per_second / 2,
+                latency_p50=result.latency_p50 * 2)
+                for result in results]
+            regressions = compare_results(results, slower, 1.5)
+            self.assertEqual(regressions, [])
+            regressions = compare_results(results, slower, 0.2)
+            self.assertEqual(len(regressions), 2 * len(results))
+            self.assertEqual(
+                set([regression.metric for regression in regressions]),
+                {"instructions_per_second", "latency_p50"})
+            # getting faster is no regression
+            self.assertEqual(compare_results(slower, results, 0.2), [])
+
+            # the command line fails on a regression
+            save_results(
+                [result._replace(instructions_per_second=10 ** 12)
+                 for result in results], path)
+            arguments = ["--root", "..", "--cases", "loop", "--iterations",
+                         "100", "--repeat", "1", "--compare", path]
+            output = StringIO()
+            with redirect_stdout(output):
+                self.assertEqual(benchmark_main(arguments), 1)
+                self.assertEqual(benchmark_main(arguments[:-2]), 0)
+            self.assertIn("REGRESSION loop/", output.getvalue())
+
+################################################################################
+
+    def test_compiler_reuse(self):
+        # the loops compiled in the first run are kept by the reloads, the
+        # block modified by the phase setting is interpreted in every run
+        program = read_program("../day_07/input.txt")
+        interpreter = IntcodeComputer()
+        compiler = IntcodeComputer(engine=IntcodeComputer.ENGINE_COMPILER)
+        for setting in PHASE_SETTINGS_FEEDBACK_LOOP[0] * 3:
+            outputs = []
+            for computer in (interpreter, compiler):
+                computer.load_program(program)
+                computer.load_input(setting)
+                computer.load_input(7)
+                scheduler = Scheduler()
+                scheduler.add_computer(computer)
+                scheduler.connect_ring()
+                outputs.append(Channel())
+                scheduler.connect(computer, outputs[-1])
+                scheduler.run()
+            self.assertEqual(outputs[1].get_values(), outputs[0].get_values())
+            self.assertGreater(len(outputs[0]), 1)
+            self.assertEqual(compiler.get_steps_count(),
+                             interpreter.get_steps_count())
+
+        # the loop modifies its own first block in every iteration, the block
+        # is interpreted once it was dropped too many times
+        program = create_self_modifying_program(50)
+        for computer in (interpreter, compiler):
+            for _ in range(2):
+                computer.load_program(program)
+                computer.run_sync()
+        self.assertEqual(list(compiler._memory), list(interpreter._memory))
+        self.assertEqual(compiler.get_steps_count(),
+                         interpreter.get_steps_count())
+
+################################################################################
+
+    def test_day_02_puzzle_1(self):
+        program = read_program("../day_02/input.txt")
+        self.assertEqual(_set_and_run(program, NOUN, VERB), 3654868)
+
+################################################################################
+
+    def test_day_02_puzzle_2(self):
+        program = read_program("../day_02/input.txt")
+        combination = [
+            (noun, verb)
+            for noun in range(NOUN_RANGE)
+            for verb in range(VERB_RANGE)
+            if _set_and_run(program, noun, verb) == GRAVITY_ASSIST_GOAL][0]
+        self.assertEqual(100 * combination[0] + combination[1], 7014)
+
+################################################################################
+
+    def test_day_05_puzzle_1(self):
+        program = read_program("../day_05/input.txt")
+        computer = IntcodeComputer()
+        computer.load_program(program)
+        computer.load_input(1)
+        computer.start()
+        computer.join()
+        output = computer.get_output()
+        self.assertTrue(all([value == 0 for value in output[:-1]]))
+        self.assertEqual(output[-1], 14522484)
+
+################################################################################
+
+    def test_day_05_puzzle_2(self):
+        program = read_program("../day_05/input.txt")
+        computer = IntcodeComputer()
+        computer.load_program(program)
+        computer.load_input(5)
+        computer.start()
+        computer.join()
+        self.assertEqual(computer.get_output()[0], 4655956)
+
+################################################################################
+
+    def test_compiler_engine(self):
+        program = read_program("../day_05/input.txt")
+        for input_value in [1, 5]:
+            computers = [IntcodeComputer(engine=engine)
+                         for engine in self.ENGINES]
+            for computer in computers:
+                computer.load_program(program)
+                computer.load_input(input_value)
+                computer.start()
+                computer.join()
+            # every engine against the interpreter
+            for computer in computers[1:]:
+                self.assertEqual(
+                    computer.get_output(), computers[0].get_output())
+                self.assertEqual(computer._memory, computers[0]._memory)
+                self.assertEqual(computer._instruction_pointer,
+                                 computers[0]._instruction_pointer)
 
 ################################################################################
 
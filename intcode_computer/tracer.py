@@ -0,0 +1,285 @@
+__author__ = "Tofu Gang"
+__email__ = "tofugangsw@gmail.com"
+
+from array import array
+from struct import Struct
+from sys import stderr
+from typing import IO, Iterator, List, MutableSequence, NamedTuple, \
+    Optional, Tuple
+from zlib import compress, decompress
+from intcode_computer.memory import ARRAY_TYPE_CODE
+
+################################################################################
+
+class TraceRecord(NamedTuple):
+    """
+    One executed instruction: its step number, address, heading, operand
+    cells and the (address, value) it wrote, if any.
+    """
+
+    step: int
+    instruction_pointer: int
+    heading: int
+    operands: Tuple[int, ...]
+    write: Optional[Tuple[int, int]]
+
+    @property
+    def opcode(self) -> int:
+        """
+        :return: opcode of the instruction
+        """
+
+        return self.heading % 100
+
+    def __str__(self) -> str:
+        """
+        :return: record as one line of a trace dump
+        """
+
+        line = "%8d %6d: %5d %s" % (
+            self.step, self.instruction_pointer, self.heading,
+            ','.join([str(operand) for operand in self.operands]))
+        if self.write is not None:
+            line += " -> [%d] = %d" % self.write
+        return line
+
+################################################################################
+
+# step, instruction pointer, heading, operands count, 3 operands, 1 if the
+# instruction wrote, written value (the write address is the last operand)
+RECORD_WIDTH = 9
+MAX_OPERANDS_COUNT = 3
+
+# length prefix of the compressed chunks in the trace file
+_CHUNK_HEADER = Struct("<I")
+
+################################################################################
+
+def _create_buffer(size: int) -> MutableSequence[int]:
+    """
+    :param size: number of cells
+    :return: zeroed array of 64-bit integers
+    """
+
+    return array(ARRAY_TYPE_CODE, [0]) * size
+
+################################################################################
+
+def _to_records(cells: MutableSequence[int]) -> Iterator[TraceRecord]:
+    """
+    :param cells: buffer cells of whole records
+    :return: the records
+    """
+
+    for i in range(0, len(cells), RECORD_WIDTH):
+        step, instruction_pointer, heading, operands_count, \
+            operand_1, operand_2, operand_3, written, value \
+            = cells[i:i + RECORD_WIDTH]
+        operands = (operand_1, operand_2, operand_3)[:operands_count]
+        yield TraceRecord(
+            step, instruction_pointer, heading, operands,
+            (operands[-1], value) if written else None)
+
+################################################################################
+
+def read_trace(path: str) -> Iterator[TraceRecord]:
+    """
+    Reads a trace streamed by a Tracer.
+
+    :param path: trace file path
+    :return: all the records, in the order they were executed
+    """
+
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_CHUNK_HEADER.size)
+            if not header:
+                break
+            chunk = decompress(f.read(_CHUNK_HEADER.unpack(header)[0]))
+            yield from _to_records(
+                [int(cell) for cell in chunk.decode().split(',')])
+
+################################################################################
+
+class Tracer(object):
+    """
+    Records the last executed instructions in a circular buffer allocated once
+    (an array of 64-bit integers, or a list if a value does not fit), so the
+    memory stays the same however long the program runs. Attach it with
+    IntcodeComputer.enable_tracing. The buffer can be dumped on demand, when
+    the program halts or when it fails; with a path, every full buffer is also
+    compressed and appended to the file, so the file holds the whole trace.
+    """
+
+    DEFAULT_CAPACITY = 4096
+
+################################################################################
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, path: str = None,
+                 dump_on_halt: bool = False, dump_on_error: bool = True,
+                 stream: IO = None):
+        """
+        Creates the tracer.
+
+        :param capacity: number of records the buffer holds
+        :param path: file the compressed trace chunks are streamed to, None for
+        none
+        :param dump_on_halt: dump the buffer when the program halts
+        :param dump_on_error: dump the buffer when the program fails
+        :param stream: text stream the buffer is dumped to, stderr by default
+        """
+
+        self._capacity = capacity
+        self._buffer = _create_buffer(capacity * RECORD_WIDTH)
+        # index of the next record, number of records ever recorded
+        self._index = 0
+        self._steps_count = 0
+        # records of the buffer before this index are already in the file
+        self._streamed_index = 0
+        self._file = open(path, 'wb') if path is not None else None
+        self._dump_on_halt = dump_on_halt
+        self._dump_on_error = dump_on_error
+        self._stream = stream
+
+################################################################################
+
+    def record(self, instruction_pointer: int, heading: int,
+               operands: MutableSequence[int],
+               write: Optional[Tuple[int, int]]) -> None:
+        """
+        Records one executed instruction.
+
+        :param instruction_pointer: address of the instruction
+        :param heading: instruction heading
+        :param operands: operand cells
+        :param write: (address, value) the instruction wrote, None if none
+        """
+
+        cells = [self._steps_count, instruction_pointer, heading,
+                 len(operands)] \
+            + list(operands) + [0] * (MAX_OPERANDS_COUNT - len(operands)) \
+            + ([1, write[1]] if write is not None else [0, 0])
+        start = self._index * RECORD_WIDTH
+        try:
+            self._buffer[start:start + RECORD_WIDTH] = array(
+                ARRAY_TYPE_CODE, cells) \
+                if isinstance(self._buffer, array) else cells
+        except OverflowError:
+            self._buffer = list(self._buffer)
+            self._buffer[start:start + RECORD_WIDTH] = cells
+        self._steps_count += 1
+        self._index += 1
+        if self._index == self._capacity:
+            if self._file is not None:
+                self._write_chunk(
+                    self._buffer[self._streamed_index * RECORD_WIDTH:])
+            self._index = 0
+            self._streamed_index = 0
+
+################################################################################
+
+    def get_steps_count(self) -> int:
+        """
+        :return: number of instructions recorded since the tracer was created
+        """
+
+        return self._steps_count
+
+################################################################################
+
+    def get_records(self) -> List[TraceRecord]:
+        """
+        :return: records in the buffer, the oldest first
+        """
+
+        start = self._index * RECORD_WIDTH
+        if self._steps_count < self._capacity:
+            cells = self._buffer[:start]
+        else:
+            cells = self._buffer[start:] + self._buffer[:start]
+        return list(_to_records(cells))
+
+################################################################################
+
+    def dump(self, stream: IO = None) -> None:
+        """
+        Writes the records in the buffer, one line each.
+
+        :param stream: text stream, the stream of the tracer by default
+        """
+
+        stream = stream or self._stream or stderr
+        for record in self.get_records():
+            stream.write(str(record) + "\n")
+        stream.flush()
+
+################################################################################
+
+    def on_halt(self) -> None:
+        """
+        Called by the computer when its program halts.
+        """
+
+        self.flush()
+        if self._dump_on_halt:
+            self.dump()
+
+################################################################################
+
+    def on_error(self, error: Exception, instruction_pointer: int) -> None:
+        """
+        Called by the computer when its program fails.
+
+        :param error: the error
+        :param instruction_pointer: address of the failed instruction
+        """
+
+        self.flush()
+        if self._dump_on_error:
+            stream = self._stream or stderr
+            stream.write(
+                "intcode program failed at %d: %r, last %d steps:\n"
+                % (instruction_pointer, error, len(self.get_records())))
+            self.dump(stream)
+
+################################################################################
+
+    def flush(self) -> None:
+        """
+        Streams the records recorded since the last full buffer to the file.
+        Call it before reading the file of a tracer that is still in use.
+        """
+
+        if self._file is not None and self._index > self._streamed_index:
+            self._write_chunk(self._buffer[
+                self._streamed_index * RECORD_WIDTH:
+                self._index * RECORD_WIDTH])
+            self._streamed_index = self._index
+            self._file.flush()
+
+################################################################################
+
+    def close(self) -> None:
+        """
+        Streams the rest of the records and closes the file.
+        """
+
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+################################################################################
+
+    def _write_chunk(self, cells: MutableSequence[int]) -> None:
+        """
+        Compresses the cells and appends them to the file.
+
+        :param cells: buffer cells of whole records
+        """
+
+        chunk = compress(','.join([str(cell) for cell in cells]).encode())
+        self._file.write(_CHUNK_HEADER.pack(len(chunk)))
+        self._file.write(chunk)
+
+################################################################################